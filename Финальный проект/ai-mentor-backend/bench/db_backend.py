@@ -0,0 +1,80 @@
+"""StudentRepo.get_by_id на двух значениях DB_BACKEND: PG (SQLAlchemy) и RawPG (asyncpg).
+
+Подключение берется из тех же переменных BACKEND_POSTGRES_*, что и у сервиса, схема
+должна быть уже применена (python main.py migrate). Без --student-id создается временный
+аккаунт со студентом и удаляется в конце.
+
+    python -m bench.db_backend --queries 3000 --concurrency 1 20
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from infrastructure.pg.pg import PG
+from infrastructure.pg.raw_pg import RawPG
+from internal import interface
+from internal.repo.account.repo import AccountRepo
+from internal.repo.edu.student.repo import StudentRepo
+from .telemetry import NoopTelemetry
+
+WARMUP_QUERIES = 50
+
+
+async def measure(db: interface.IDB, student_id: int, queries: int, concurrency: int) -> float:
+    """Среднее время одного запроса в микросекундах"""
+    student_repo = StudentRepo(NoopTelemetry(), db)
+
+    async def worker(count: int):
+        for _ in range(count):
+            await student_repo.get_by_id(student_id)
+
+    # Прогрев: соединения пула открыты, подготовленные выражения закэшированы
+    await asyncio.gather(*(worker(WARMUP_QUERIES) for _ in range(concurrency)))
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(worker(queries // concurrency) for _ in range(concurrency)))
+    return (time.perf_counter() - start_time) / (queries // concurrency * concurrency) * 1e6
+
+
+async def run(args: argparse.Namespace):
+    tel = NoopTelemetry()
+    connection = (args.user, args.password, args.host, args.port, args.db_name)
+    backends = {
+        "sqlalchemy": PG(tel, *connection, pool_size=args.pool_size),
+        "asyncpg": RawPG(tel, *connection, pool_size=args.pool_size),
+    }
+
+    student_id = args.student_id
+    account_id = None
+    if student_id is None:
+        account_id = await AccountRepo(tel, backends["sqlalchemy"]).create_account(f"bench-{uuid.uuid4()}", "-")
+        student_id = await StudentRepo(tel, backends["sqlalchemy"]).create_student(account_id)
+
+    try:
+        for concurrency in args.concurrency:
+            results = [
+                f"{name} {await measure(db, student_id, args.queries, concurrency):.0f} us/query"
+                for name, db in backends.items()
+            ]
+            print(f"concurrency {concurrency:<4}" + ", ".join(results))
+    finally:
+        if account_id is not None:
+            await backends["sqlalchemy"].delete("DELETE FROM accounts WHERE id = :id", {"id": account_id})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=os.environ.get("BACKEND_POSTGRES_HOST", "localhost"))
+    parser.add_argument("--port", default=os.environ.get("BACKEND_POSTGRES_PORT", "5432"))
+    parser.add_argument("--user", default=os.environ.get("BACKEND_POSTGRES_USER", "postgres"))
+    parser.add_argument("--password", default=os.environ.get("BACKEND_POSTGRES_PASSWORD", ""))
+    parser.add_argument("--db-name", default=os.environ.get("BACKEND_POSTGRES_DB_NAME", "postgres"))
+    parser.add_argument("--pool-size", type=int, default=15)
+    parser.add_argument("--student-id", type=int)
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 20])
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
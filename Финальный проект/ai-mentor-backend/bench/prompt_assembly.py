@@ -0,0 +1,92 @@
+"""Сборка промпта учителя последовательно и параллельно с сохранением сообщения студента.
+
+Задержки БД и хранилища синтетические, поэтому замер показывает только выигрыш
+от перекрытия ввода-вывода в ChatService._prepare_turn, а не скорость конкретного окружения.
+
+    python -m bench.prompt_assembly --runs 30 --insert-ms 15 --content-ms 40
+"""
+import argparse
+import asyncio
+import time
+
+from internal import common, interface, model
+from internal.service.chat.prompt import PromptGenerator
+from .telemetry import NoopTelemetry
+
+
+class SlowCatalog(interface.IEduCatalog):
+    async def get_content_metadata(self) -> str:
+        return "КАТАЛОГ"
+
+    def invalidate(self):
+        pass
+
+
+class SlowContentStore(interface.IContentStore):
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    async def select(
+            self,
+            content_file: common.ContentFile,
+            query: str,
+            token_budget: int
+    ) -> list[model.ContentSection]:
+        await asyncio.sleep(self.delay)
+        return []
+
+
+def turn_context() -> model.TurnContext:
+    student = model.Student(
+        id=1,
+        account_id=1,
+        current_expert=common.Experts.teacher,
+        current_topic={"1": "Тема"},
+        current_block={"2": "Блок"},
+        current_chapter={"3": "Глава"},
+    )
+    return model.TurnContext(
+        student=student,
+        chat=model.Chat(id=1, student_id=1),
+        current_block=model.Block(id=2, topic_id=1, name="Блок", content_file_id="1,01"),
+        current_chapter=model.Chapter(id=3, topic_id=1, block_id=2, name="Глава", content_file_id="1,02"),
+        query="Что такое замыкание?",
+    )
+
+
+async def run(runs: int, insert_delay: float, content_delay: float):
+    prompt_generator = PromptGenerator(
+        NoopTelemetry(),
+        None,
+        SlowCatalog(),
+        SlowContentStore(content_delay),
+        fetch_timeout=5,
+        content_token_budget=2000,
+    )
+    context = turn_context()
+
+    async def insert_message():
+        await asyncio.sleep(insert_delay)
+
+    async def sequential():
+        await insert_message()
+        await prompt_generator.get_teacher_prompt(context)
+
+    async def concurrent():
+        await asyncio.gather(insert_message(), prompt_generator.get_teacher_prompt(context))
+
+    for name, turn in (("sequential", sequential), ("concurrent", concurrent)):
+        start_time = time.perf_counter()
+        for _ in range(runs):
+            await turn()
+        print(f"{name:<12}{(time.perf_counter() - start_time) / runs * 1000:8.1f} ms per turn")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--insert-ms", type=float, default=15)
+    parser.add_argument("--content-ms", type=float, default=40)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.runs, args.insert_ms / 1000, args.content_ms / 1000))
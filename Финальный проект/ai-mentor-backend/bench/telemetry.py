@@ -0,0 +1,32 @@
+from opentelemetry import metrics, trace
+from opentelemetry.metrics import Meter
+from opentelemetry.trace import Tracer
+
+from internal import interface
+
+
+class NoopLogger(interface.IOtelLogger):
+    def debug(self, message: str, fields: dict = None) -> None:
+        pass
+
+    def info(self, message: str, fields: dict = None) -> None:
+        pass
+
+    def warning(self, message: str, fields: dict = None) -> None:
+        pass
+
+    def error(self, message: str, fields: dict = None) -> None:
+        pass
+
+
+class NoopTelemetry(interface.ITelemetry):
+    """Телеметрия без экспорта: бенчмарки не должны мерить отправку спанов и метрик"""
+
+    def tracer(self) -> Tracer:
+        return trace.get_tracer("bench")
+
+    def meter(self) -> Meter:
+        return metrics.get_meter("bench")
+
+    def logger(self) -> interface.IOtelLogger:
+        return NoopLogger()
@@ -1,10 +1,17 @@
-from typing import Any, Sequence
+import asyncio
+import time
+from contextlib import asynccontextmanager, AsyncExitStack, AbstractContextManager
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence
 
+from opentelemetry.metrics import CallbackOptions, Observation
 from opentelemetry.trace import Status, StatusCode, SpanKind
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
 from internal import interface
+from internal import common
+from .routing import PRIMARY, REPLICA, ReadRouter, consistency_scope, pin_primary
+from .unit_of_work import UnitOfWork, active_unit_of_work, bind_unit_of_work, release_unit_of_work
 
 
 def NewPool(
@@ -12,15 +19,35 @@ def NewPool(
         db_pass,
         db_host
         , db_port,
-        db_name
-):
+        db_name,
+        pool_size: int = 15,
+        max_overflow: int = 15,
+        pool_recycle: int = 300,
+        pool_timeout: float = 30,
+        pool_pre_ping: bool = True,
+        statement_timeout: int = 30000,
+        prepared_statement_cache_size: int = 100,
+        read_only: bool = False,
+) -> tuple[AsyncEngine, async_sessionmaker]:
+    server_settings = {"statement_timeout": str(statement_timeout)}
+    if read_only:
+        # Пул реплики: запись через него падает на сервере, а не тихо уходит не туда
+        server_settings["default_transaction_read_only"] = "on"
+
     async_engine = create_async_engine(
-        f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}",
+        f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+        f"?prepared_statement_cache_size={prepared_statement_cache_size}",
         echo=False,
         future=True,
-        pool_size=15,
-        max_overflow=15,
-        pool_recycle=300
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=pool_pre_ping,
+        connect_args={
+            # Ограничение на каждый запрос задается на сервере для всей сессии, 0 отключает его
+            "server_settings": server_settings,
+        },
     )
 
     pool = async_sessionmaker(
@@ -29,14 +56,208 @@ def NewPool(
         autoflush=False,
         expire_on_commit=False
     )
-    return pool
+    return async_engine, pool
 
 
 class PG(interface.IDB):
+    """IDB поверх AsyncSession.
+
+    Если задан replica_host, select идет в пул реплики, пока текущий запрос ничего не записал
+    (см. routing.consistency_scope), и при недоступной реплике откатывается на primary.
+    Все чтения выполняются в READ ONLY транзакциях.
+    Внутри transaction() все методы идут через одну сессию и фиксируются одним commit.
+    """
 
-    def __init__(self, tel: interface.ITelemetry, db_user, db_pass, db_host, db_port, db_name):
-        self.pool = NewPool(db_user, db_pass, db_host, db_port, db_name)
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            pool_size: int = 15,
+            max_overflow: int = 15,
+            pool_recycle: int = 300,
+            pool_timeout: float = 30,
+            pool_pre_ping: bool = True,
+            statement_timeout: int = 30000,
+            prepared_statement_cache_size: int = 100,
+            replica_host: str = "",
+            replica_port: str = "5432",
+            replica_retry_interval: float = 30,
+    ):
+        self.engine, self.pool = NewPool(
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            pool_size,
+            max_overflow,
+            pool_recycle,
+            pool_timeout,
+            pool_pre_ping,
+            statement_timeout,
+            prepared_statement_cache_size
+        )
+        self.engines = {PRIMARY: (self.engine, self.pool)}
+        if replica_host:
+            self.engines[REPLICA] = NewPool(
+                db_user,
+                db_pass,
+                replica_host,
+                replica_port,
+                db_name,
+                pool_size,
+                max_overflow,
+                pool_recycle,
+                pool_timeout,
+                pool_pre_ping,
+                statement_timeout,
+                prepared_statement_cache_size,
+                read_only=True
+            )
+        self.router = ReadRouter(bool(replica_host), replica_retry_interval)
         self.tracer = tel.tracer()
+        self.logger = tel.logger()
+
+        meter = tel.meter()
+        meter.create_observable_gauge(
+            name=common.DB_POOL_CHECKED_OUT_METRIC,
+            callbacks=[self._observe_checked_out],
+            description="Number of connections checked out from the PG pool",
+            unit="1"
+        )
+        meter.create_observable_gauge(
+            name=common.DB_POOL_OVERFLOW_METRIC,
+            callbacks=[self._observe_overflow],
+            description="Number of PG connections opened above pool_size",
+            unit="1"
+        )
+        self.checkout_wait = meter.create_histogram(
+            name=common.DB_POOL_CHECKOUT_WAIT_METRIC,
+            description="Time spent waiting for a connection from the PG pool",
+            unit="s"
+        )
+        self.operation_duration = meter.create_histogram(
+            name=common.DB_OPERATION_DURATION_METRIC,
+            description="Duration of PG operations by pool",
+            unit="s"
+        )
+
+    def consistency_scope(self) -> AbstractContextManager:
+        return consistency_scope()
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """Единица работы: вызовы IDB в этом контексте идут в одной транзакции на primary.
+
+        Вложенный transaction() присоединяется к внешней, commit делает самая внешняя.
+        """
+        if active_unit_of_work(self) is not None:
+            yield
+            return
+
+        pin_primary()
+        async with self._session() as session:
+            unit_of_work = UnitOfWork(self, session)
+            token = bind_unit_of_work(unit_of_work)
+            try:
+                try:
+                    yield
+                except BaseException:
+                    async with unit_of_work.lock:
+                        await session.rollback()
+                    raise
+                # Commit не должен пересечься с запросом еще не завершенной дочерней задачи
+                async with unit_of_work.lock:
+                    await session.commit()
+            finally:
+                unit_of_work.closed = True
+                release_unit_of_work(token)
+
+        await unit_of_work.run_on_commit(self.logger)
+
+    async def on_commit(self, callback: Callable[[], Awaitable[None]]):
+        unit_of_work = active_unit_of_work(self)
+        if unit_of_work is None:
+            await callback()
+        else:
+            unit_of_work.add_on_commit(callback)
+
+    @asynccontextmanager
+    async def _session(self, pool_name: str = PRIMARY, read_only: bool = False) -> AsyncIterator[AsyncSession]:
+        """Сессия с уже полученным соединением, время ожидания пула пишется в гистограмму"""
+        _, pool = self.engines[pool_name]
+        async with pool() as session:
+            start_time = time.perf_counter()
+            if read_only:
+                # BEGIN READ ONLY: характеристика снимается при возврате соединения в пул
+                await session.connection(execution_options={"postgresql_readonly": True})
+            else:
+                await session.connection()
+            self.checkout_wait.record(time.perf_counter() - start_time, {"db.pool": pool_name})
+            yield session
+
+    @asynccontextmanager
+    async def _write_session(self) -> AsyncIterator[AsyncSession]:
+        """Общая сессия единицы работы или своя, которая фиксируется после запроса"""
+        unit_of_work = active_unit_of_work(self)
+        if unit_of_work is not None:
+            async with unit_of_work.lock:
+                yield unit_of_work.handle
+            return
+
+        async with self._session() as session:
+            yield session
+            await session.commit()
+
+    @asynccontextmanager
+    async def _read_session(self) -> AsyncIterator[tuple[str, AsyncSession]]:
+        unit_of_work = active_unit_of_work(self)
+        if unit_of_work is not None:
+            # Внутри транзакции читаем на ее соединении, чтобы видеть еще не зафиксированные записи
+            async with unit_of_work.lock:
+                yield PRIMARY, unit_of_work.handle
+            return
+
+        async with AsyncExitStack() as stack:
+            pool_name = self.router.read_pool()
+            # Как у RawPG: READ ONLY на primary нужен, только если часть чтений уходит на реплику
+            read_only = self.router.has_replica
+            try:
+                session = await stack.enter_async_context(self._session(pool_name, read_only=read_only))
+            except Exception as err:
+                # Откатываемся только при ошибке получения соединения, ошибки самого запроса не повторяем
+                if pool_name == PRIMARY:
+                    raise err
+                self.router.replica_failed()
+                self.logger.warning("Реплика PG недоступна, чтения временно идут на primary", {
+                    "error": str(err),
+                })
+                pool_name = PRIMARY
+                session = await stack.enter_async_context(self._session(pool_name, read_only=read_only))
+            yield pool_name, session
+
+    def _record_duration(self, start_time: float, pool_name: str, operation: str):
+        self.operation_duration.record(
+            time.perf_counter() - start_time,
+            {"db.pool": pool_name, "db.operation": operation}
+        )
+
+    def _observe_checked_out(self, options: CallbackOptions) -> list[Observation]:
+        return [
+            Observation(engine.pool.checkedout(), {"db.pool": pool_name})
+            for pool_name, (engine, _) in self.engines.items()
+        ]
+
+    def _observe_overflow(self, options: CallbackOptions) -> list[Observation]:
+        # До заполнения pool_size значение отрицательное: столько соединений еще можно открыть без overflow
+        return [
+            Observation(max(engine.pool.overflow(), 0), {"db.pool": pool_name})
+            for pool_name, (engine, _) in self.engines.items()
+        ]
 
     async def insert(self, query: str, query_params: dict) -> int:
         with self.tracer.start_as_current_span(
@@ -44,12 +265,15 @@ class PG(interface.IDB):
                 kind=SpanKind.CLIENT,
         ) as span:
             try:
-                async with self.pool() as session:
+                # Дальнейшие чтения запроса должны видеть эту запись, реплика может отставать
+                pin_primary()
+                start_time = time.perf_counter()
+                async with self._write_session() as session:
                     result = await session.execute(text(query), query_params)
                     rows = result.all()
-                    await session.commit()
-                    span.set_status(Status(StatusCode.OK))
-                    return rows[0][0]
+                self._record_duration(start_time, PRIMARY, "insert")
+                span.set_status(Status(StatusCode.OK))
+                return rows[0][0]
 
             except Exception as err:
                 span.record_exception(err)
@@ -62,10 +286,12 @@ class PG(interface.IDB):
                 kind=SpanKind.CLIENT,
         ) as span:
             try:
-                async with self.pool() as session:
+                pin_primary()
+                start_time = time.perf_counter()
+                async with self._write_session() as session:
                     await session.execute(text(query), query_params)
-                    await session.commit()
-                    span.set_status(Status(StatusCode.OK))
+                self._record_duration(start_time, PRIMARY, "delete")
+                span.set_status(Status(StatusCode.OK))
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(Status(StatusCode.ERROR, str(err)))
@@ -77,10 +303,12 @@ class PG(interface.IDB):
                 kind=SpanKind.CLIENT,
         ) as span:
             try:
-                async with self.pool() as session:
+                pin_primary()
+                start_time = time.perf_counter()
+                async with self._write_session() as session:
                     await session.execute(text(query), query_params)
-                    await session.commit()
-                    span.set_status(Status(StatusCode.OK))
+                self._record_duration(start_time, PRIMARY, "update")
+                span.set_status(Status(StatusCode.OK))
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(Status(StatusCode.ERROR, str(err)))
@@ -92,12 +320,15 @@ class PG(interface.IDB):
                 kind=SpanKind.CLIENT,
         ) as span:
             try:
-                async with self.pool() as session:
+                start_time = time.perf_counter()
+                # Транзакция только читает, при закрытии сессии она завершается без отдельного commit
+                async with self._read_session() as (pool_name, session):
                     result = await session.execute(text(query), query_params)
-                    await session.commit()
                     rows = result.all()
-                    span.set_status(Status(StatusCode.OK))
-                    return rows
+                self._record_duration(start_time, pool_name, "select")
+                span.set_attribute("db.pool", pool_name)
+                span.set_status(Status(StatusCode.OK))
+                return rows
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(Status(StatusCode.ERROR, str(err)))
@@ -107,8 +338,51 @@ class PG(interface.IDB):
             self,
             queries: list[str]
     ) -> None:
-        async with self.pool() as session:
+        pin_primary()
+        async with self._write_session() as session:
             for query in queries:
                 await session.execute(text(query))
-            await session.commit()
         return None
+
+    async def execute_outside_transaction(self, query: str, statement_timeout: int | None = None) -> None:
+        """Выражение в autocommit, например CREATE INDEX CONCURRENTLY; statement_timeout в мс, 0 — без лимита"""
+        with self.tracer.start_as_current_span(
+                "PG.execute_outside_transaction",
+                kind=SpanKind.CLIENT,
+        ) as span:
+            try:
+                if active_unit_of_work(self) is not None:
+                    raise RuntimeError("Выражение вне транзакции нельзя выполнить внутри IDB.transaction()")
+
+                pin_primary()
+                async with self.engine.connect() as connection:
+                    connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+                    if statement_timeout is not None:
+                        await connection.execute(text(f"SET statement_timeout = {int(statement_timeout)}"))
+                    try:
+                        await connection.execute(text(query))
+                    finally:
+                        if statement_timeout is not None:
+                            # Возвращаем значение из параметров подключения, соединение уходит обратно в пул
+                            await connection.execute(text("RESET statement_timeout"))
+                span.set_status(Status(StatusCode.OK))
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    @asynccontextmanager
+    async def advisory_lock(self, key: int, poll_interval: float = 1) -> AsyncIterator[None]:
+        """Сессионный advisory lock на отдельном соединении вне транзакции.
+
+        Ожидание идет опросом pg_try_advisory_lock: заблокированный pg_advisory_lock держит снимок,
+        и CREATE INDEX CONCURRENTLY у владельца блокировки ждал бы его до statement_timeout.
+        """
+        async with self.engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            while not (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})).scalar():
+                await asyncio.sleep(poll_interval)
+            try:
+                yield
+            finally:
+                await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
@@ -0,0 +1,386 @@
+import asyncio
+import json
+import re
+import time
+from contextlib import asynccontextmanager, AsyncExitStack, AbstractContextManager
+from typing import Any, AsyncIterator, Awaitable, Callable, Sequence
+
+import asyncpg
+from opentelemetry.metrics import CallbackOptions, Observation
+from opentelemetry.trace import Status, StatusCode, SpanKind
+
+from internal import interface
+from internal import common
+from .routing import PRIMARY, REPLICA, ReadRouter, consistency_scope, pin_primary
+from .unit_of_work import UnitOfWork, active_unit_of_work, bind_unit_of_work, release_unit_of_work
+
+# :name, но не ::type
+_PARAM_PATTERN = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+
+class Row(asyncpg.Record):
+    """Запись asyncpg с доступом к колонкам через атрибуты, как у Row из SQLAlchemy"""
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def compile_query(query: str) -> tuple[str, list[str]]:
+    """Переводит :name параметры в позиционные $n, возвращает запрос и порядок имен"""
+    names: list[str] = []
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PARAM_PATTERN.sub(replace, query), names
+
+
+def _encode_json(value: Any) -> str:
+    # Запросы передают json уже строкой, как и через SQLAlchemy
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+class RawPG(interface.IDB):
+    """IDB напрямую поверх пула asyncpg, без AsyncSession и text().
+
+    Запросы с :name один раз переводятся в $n и кэшируются, asyncpg держит для них
+    подготовленные выражения на каждом соединении. Без реплики чтения идут без транзакции и commit,
+    строки приходят объектами Row, которые model.*.serialize читает так же, как Row SQLAlchemy.
+    Маршрутизация чтений на реплику и единица работы transaction() такие же, как у PG.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db_user,
+            db_pass,
+            db_host,
+            db_port,
+            db_name,
+            pool_size: int = 15,
+            max_overflow: int = 15,
+            pool_recycle: int = 300,
+            pool_timeout: float = 30,
+            statement_timeout: int = 30000,
+            prepared_statement_cache_size: int = 100,
+            replica_host: str = "",
+            replica_port: str = "5432",
+            replica_retry_interval: float = 30,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.dsns = {PRIMARY: f"postgresql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"}
+        if replica_host:
+            self.dsns[REPLICA] = f"postgresql://{db_user}:{db_pass}@{replica_host}:{replica_port}/{db_name}"
+        self.router = ReadRouter(bool(replica_host), replica_retry_interval)
+        self.min_size = pool_size
+        self.max_size = pool_size + max_overflow
+        self.pool_recycle = pool_recycle
+        self.pool_timeout = pool_timeout
+        self.statement_timeout = statement_timeout
+        self.prepared_statement_cache_size = prepared_statement_cache_size
+
+        # Пулы создаются при первом запросе: конструктор вызывается вне event loop
+        self.pools: dict[str, asyncpg.Pool] = {}
+        self._pool_lock = asyncio.Lock()
+        self._compiled: dict[str, tuple[str, list[str]]] = {}
+
+        meter = tel.meter()
+        meter.create_observable_gauge(
+            name=common.DB_POOL_CHECKED_OUT_METRIC,
+            callbacks=[self._observe_checked_out],
+            description="Number of connections checked out from the PG pool",
+            unit="1"
+        )
+        meter.create_observable_gauge(
+            name=common.DB_POOL_OVERFLOW_METRIC,
+            callbacks=[self._observe_overflow],
+            description="Number of PG connections opened above pool_size",
+            unit="1"
+        )
+        self.checkout_wait = meter.create_histogram(
+            name=common.DB_POOL_CHECKOUT_WAIT_METRIC,
+            description="Time spent waiting for a connection from the PG pool",
+            unit="s"
+        )
+        self.operation_duration = meter.create_histogram(
+            name=common.DB_OPERATION_DURATION_METRIC,
+            description="Duration of PG operations by pool",
+            unit="s"
+        )
+
+    def consistency_scope(self) -> AbstractContextManager:
+        return consistency_scope()
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        if active_unit_of_work(self) is not None:
+            yield
+            return
+
+        pin_primary()
+        async with self._connection() as connection:
+            unit_of_work = UnitOfWork(self, connection)
+            token = bind_unit_of_work(unit_of_work)
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                try:
+                    yield
+                except BaseException:
+                    async with unit_of_work.lock:
+                        await transaction.rollback()
+                    raise
+                # Commit не должен пересечься с запросом еще не завершенной дочерней задачи
+                async with unit_of_work.lock:
+                    await transaction.commit()
+            finally:
+                unit_of_work.closed = True
+                release_unit_of_work(token)
+
+        await unit_of_work.run_on_commit(self.logger)
+
+    async def on_commit(self, callback: Callable[[], Awaitable[None]]):
+        unit_of_work = active_unit_of_work(self)
+        if unit_of_work is None:
+            await callback()
+        else:
+            unit_of_work.add_on_commit(callback)
+
+    async def insert(self, query: str, query_params: dict) -> int:
+        with self.tracer.start_as_current_span(
+                "RawPG.insert",
+                kind=SpanKind.CLIENT,
+        ) as span:
+            try:
+                sql, args = self._prepare(query, query_params)
+                pin_primary()
+                start_time = time.perf_counter()
+                async with self._write_connection() as connection:
+                    result = await connection.fetchval(sql, *args)
+                self._record_duration(start_time, PRIMARY, "insert")
+                span.set_status(Status(StatusCode.OK))
+                return result
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def delete(self, query: str, query_params: dict) -> None:
+        with self.tracer.start_as_current_span(
+                "RawPG.delete",
+                kind=SpanKind.CLIENT,
+        ) as span:
+            try:
+                sql, args = self._prepare(query, query_params)
+                pin_primary()
+                start_time = time.perf_counter()
+                async with self._write_connection() as connection:
+                    await connection.execute(sql, *args)
+                self._record_duration(start_time, PRIMARY, "delete")
+                span.set_status(Status(StatusCode.OK))
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def update(self, query: str, query_params: dict) -> None:
+        with self.tracer.start_as_current_span(
+                "RawPG.update",
+                kind=SpanKind.CLIENT,
+        ) as span:
+            try:
+                sql, args = self._prepare(query, query_params)
+                pin_primary()
+                start_time = time.perf_counter()
+                async with self._write_connection() as connection:
+                    await connection.execute(sql, *args)
+                self._record_duration(start_time, PRIMARY, "update")
+                span.set_status(Status(StatusCode.OK))
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def select(self, query: str, query_params: dict) -> Sequence[Any]:
+        with self.tracer.start_as_current_span(
+                "RawPG.select",
+                kind=SpanKind.CLIENT,
+        ) as span:
+            try:
+                sql, args = self._prepare(query, query_params)
+                start_time = time.perf_counter()
+                async with self._read_connection() as (pool_name, connection):
+                    rows = await connection.fetch(sql, *args)
+                self._record_duration(start_time, pool_name, "select")
+                span.set_attribute("db.pool", pool_name)
+                span.set_status(Status(StatusCode.OK))
+                return rows
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def multi_query(
+            self,
+            queries: list[str]
+    ) -> None:
+        pin_primary()
+        async with self._write_connection() as connection:
+            async with connection.transaction():
+                for query in queries:
+                    await connection.execute(query)
+        return None
+
+    async def execute_outside_transaction(self, query: str, statement_timeout: int | None = None) -> None:
+        """Выражение в autocommit, например CREATE INDEX CONCURRENTLY; statement_timeout в мс, 0 — без лимита"""
+        with self.tracer.start_as_current_span(
+                "RawPG.execute_outside_transaction",
+                kind=SpanKind.CLIENT,
+        ) as span:
+            try:
+                if active_unit_of_work(self) is not None:
+                    raise RuntimeError("Выражение вне транзакции нельзя выполнить внутри IDB.transaction()")
+
+                pin_primary()
+                # Без параметров asyncpg отправляет простой запрос, вне явной транзакции он идет в autocommit
+                async with self._connection() as connection:
+                    if statement_timeout is not None:
+                        await connection.execute(f"SET statement_timeout = {int(statement_timeout)}")
+                    try:
+                        await connection.execute(query)
+                    finally:
+                        if statement_timeout is not None:
+                            # Возвращаем значение из параметров подключения, соединение уходит обратно в пул
+                            await connection.execute("RESET statement_timeout")
+                span.set_status(Status(StatusCode.OK))
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    @asynccontextmanager
+    async def advisory_lock(self, key: int, poll_interval: float = 1) -> AsyncIterator[None]:
+        async with self._connection() as connection:
+            # Опросом, как в PG.advisory_lock: ожидающий pg_advisory_lock держал бы снимок
+            while not await connection.fetchval("SELECT pg_try_advisory_lock($1)", key):
+                await asyncio.sleep(poll_interval)
+            try:
+                yield
+            finally:
+                await connection.execute("SELECT pg_advisory_unlock($1)", key)
+
+    def _prepare(self, query: str, query_params: dict) -> tuple[str, list[Any]]:
+        compiled = self._compiled.get(query)
+        if compiled is None:
+            compiled = compile_query(query)
+            self._compiled[query] = compiled
+
+        sql, names = compiled
+        return sql, [query_params[name] for name in names]
+
+    @asynccontextmanager
+    async def _connection(self, pool_name: str = PRIMARY) -> AsyncIterator[asyncpg.Connection]:
+        pool = self.pools.get(pool_name) or await self._create_pool(pool_name)
+
+        start_time = time.perf_counter()
+        async with pool.acquire(timeout=self.pool_timeout) as connection:
+            self.checkout_wait.record(time.perf_counter() - start_time, {"db.pool": pool_name})
+            yield connection
+
+    @asynccontextmanager
+    async def _write_connection(self) -> AsyncIterator[asyncpg.Connection]:
+        """Соединение единицы работы или свое в режиме autocommit"""
+        unit_of_work = active_unit_of_work(self)
+        if unit_of_work is not None:
+            async with unit_of_work.lock:
+                yield unit_of_work.handle
+            return
+
+        async with self._connection() as connection:
+            yield connection
+
+    @asynccontextmanager
+    async def _read_connection(self) -> AsyncIterator[tuple[str, asyncpg.Connection]]:
+        unit_of_work = active_unit_of_work(self)
+        if unit_of_work is not None:
+            # Внутри транзакции читаем на ее соединении, чтобы видеть еще не зафиксированные записи
+            async with unit_of_work.lock:
+                yield PRIMARY, unit_of_work.handle
+            return
+
+        async with AsyncExitStack() as stack:
+            pool_name = self.router.read_pool()
+            try:
+                connection = await stack.enter_async_context(self._connection(pool_name))
+            except Exception as err:
+                # Откатываемся только при ошибке получения соединения, ошибки самого запроса не повторяем
+                if pool_name == PRIMARY:
+                    raise err
+                self.router.replica_failed()
+                self.logger.warning("Реплика PG недоступна, чтения временно идут на primary", {
+                    "error": str(err),
+                })
+                pool_name = PRIMARY
+                connection = await stack.enter_async_context(self._connection(pool_name))
+
+            # На реплике каждая неявная транзакция уже READ ONLY (default_transaction_read_only).
+            # На primary READ ONLY задается явной транзакцией, только если реплика настроена: запись через
+            # select должна падать одинаково на обоих пулах. Без реплики это лишние BEGIN/COMMIT на каждое чтение
+            if pool_name == PRIMARY and self.router.has_replica:
+                await stack.enter_async_context(connection.transaction(readonly=True))
+            yield pool_name, connection
+
+    async def _create_pool(self, pool_name: str) -> asyncpg.Pool:
+        async with self._pool_lock:
+            if pool_name not in self.pools:
+                server_settings = {"statement_timeout": str(self.statement_timeout)}
+                if pool_name == REPLICA:
+                    server_settings["default_transaction_read_only"] = "on"
+
+                self.pools[pool_name] = await asyncpg.create_pool(
+                    self.dsns[pool_name],
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    max_inactive_connection_lifetime=self.pool_recycle,
+                    statement_cache_size=self.prepared_statement_cache_size,
+                    server_settings=server_settings,
+                    record_class=Row,
+                    init=self._init_connection,
+                )
+        return self.pools[pool_name]
+
+    def _record_duration(self, start_time: float, pool_name: str, operation: str):
+        self.operation_duration.record(
+            time.perf_counter() - start_time,
+            {"db.pool": pool_name, "db.operation": operation}
+        )
+
+    @staticmethod
+    async def _init_connection(connection: asyncpg.Connection):
+        # json/jsonb отдаются объектами Python, как в диалекте asyncpg у SQLAlchemy
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name,
+                encoder=_encode_json,
+                decoder=json.loads,
+                schema="pg_catalog",
+            )
+
+    def _observe_checked_out(self, options: CallbackOptions) -> list[Observation]:
+        return [
+            Observation(pool.get_size() - pool.get_idle_size(), {"db.pool": pool_name})
+            for pool_name, pool in self.pools.items()
+        ]
+
+    def _observe_overflow(self, options: CallbackOptions) -> list[Observation]:
+        return [
+            Observation(max(pool.get_size() - self.min_size, 0), {"db.pool": pool_name})
+            for pool_name, pool in self.pools.items()
+        ]
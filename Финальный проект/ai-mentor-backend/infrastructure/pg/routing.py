@@ -0,0 +1,64 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+@dataclass
+class _RouteState:
+    pinned_to_primary: bool = False
+
+
+# Состояние общее для запроса: задачи из asyncio.gather получают копию контекста
+# с тем же объектом, поэтому запись в любой из них закрепляет за primary весь запрос
+_route_state: ContextVar[_RouteState | None] = ContextVar("pg_route_state", default=None)
+
+
+@contextmanager
+def consistency_scope() -> Iterator[None]:
+    """Область read-your-writes: после первой записи чтения внутри нее идут на primary"""
+    token = _route_state.set(_RouteState())
+    try:
+        yield
+    finally:
+        _route_state.reset(token)
+
+
+def pin_primary():
+    state = _route_state.get()
+    if state is None:
+        # Вне consistency_scope закрепляется только текущая задача и ее будущие дочерние
+        _route_state.set(_RouteState(pinned_to_primary=True))
+    else:
+        state.pinned_to_primary = True
+
+
+def is_pinned_to_primary() -> bool:
+    state = _route_state.get()
+    return state is not None and state.pinned_to_primary
+
+
+class ReadRouter:
+    """Выбирает пул для чтения: реплика, если она настроена, доступна и запрос не писал"""
+
+    def __init__(self, has_replica: bool, replica_retry_interval: float):
+        self.has_replica = has_replica
+        self.replica_retry_interval = replica_retry_interval
+        self._replica_down_until = 0.0
+
+    def read_pool(self) -> str:
+        if (
+                not self.has_replica
+                or is_pinned_to_primary()
+                or time.monotonic() < self._replica_down_until
+        ):
+            return PRIMARY
+        return REPLICA
+
+    def replica_failed(self):
+        # Недоступную реплику не пробуем replica_retry_interval секунд, чтения идут на primary
+        self._replica_down_until = time.monotonic() + self.replica_retry_interval
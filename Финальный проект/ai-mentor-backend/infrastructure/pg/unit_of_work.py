@@ -0,0 +1,51 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from internal import interface
+
+
+class UnitOfWork:
+    """Открытая транзакция на primary, к которой присоединяются все вызовы IDB в ее контексте.
+
+    Задачи из asyncio.gather видят ту же единицу работы, поэтому запросы на общем
+    соединении идут строго по очереди под lock.
+    """
+
+    def __init__(self, owner: Any, handle: Any):
+        self.owner = owner
+        # AsyncSession у PG, asyncpg.Connection у RawPG
+        self.handle = handle
+        self.lock = asyncio.Lock()
+        self.closed = False
+        self._on_commit: list[Callable[[], Awaitable[None]]] = []
+
+    def add_on_commit(self, callback: Callable[[], Awaitable[None]]):
+        self._on_commit.append(callback)
+
+    async def run_on_commit(self, logger: interface.IOtelLogger):
+        # Транзакция уже зафиксирована: ошибка хука не должна превращать успешный запрос в ошибку
+        for callback in self._on_commit:
+            try:
+                await callback()
+            except Exception as err:
+                logger.warning(f"Ошибка хука после commit: {err}")
+
+
+_current_unit_of_work: ContextVar[UnitOfWork | None] = ContextVar("pg_unit_of_work", default=None)
+
+
+def active_unit_of_work(owner: Any) -> UnitOfWork | None:
+    unit_of_work = _current_unit_of_work.get()
+    # Фоновая задача, созданная внутри транзакции, может пережить ее и не должна в нее писать
+    if unit_of_work is None or unit_of_work.owner is not owner or unit_of_work.closed:
+        return None
+    return unit_of_work
+
+
+def bind_unit_of_work(unit_of_work: UnitOfWork):
+    return _current_unit_of_work.set(unit_of_work)
+
+
+def release_unit_of_work(token):
+    _current_unit_of_work.reset(token)
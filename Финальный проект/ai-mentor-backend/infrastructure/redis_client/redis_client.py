@@ -1,5 +1,6 @@
 import redis.asyncio as aioredis
 from redis.connection import ConnectionPool
+from redis.exceptions import WatchError
 from typing import Any
 import json
 import asyncio
@@ -57,6 +58,84 @@ class RedisClient(interface.IRedis):
         except Exception as e:
             return default
 
+    async def list_get(self, key: str) -> list[Any] | None:
+        client = await self.get_async_client()
+        values = await client.lrange(key, 0, -1)
+        if not values:
+            return None
+        return [self._deserialize_value(value) for value in values]
+
+    async def list_set(self, key: str, values: list[Any], ttl: int = None):
+        client = await self.get_async_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            if values:
+                pipe.rpush(key, *[self._serialize_value(value) for value in values])
+                if ttl:
+                    pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def list_set_if_version(
+            self,
+            key: str,
+            values: list[Any],
+            version_key: str,
+            version: int,
+            ttl: int = None
+    ) -> bool:
+        """Заменяет список, только если счетчик version_key не менялся с момента чтения version"""
+        client = await self.get_async_client()
+        async with client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(version_key)
+                if int(await pipe.get(version_key) or 0) != version:
+                    return False
+
+                pipe.multi()
+                pipe.delete(key)
+                if values:
+                    pipe.rpush(key, *[self._serialize_value(value) for value in values])
+                    if ttl:
+                        pipe.expire(key, ttl)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def list_append(
+            self,
+            key: str,
+            value: Any,
+            max_len: int = None,
+            ttl: int = None,
+            version_key: str = None
+    ) -> bool:
+        """Добавляет элемент в конец списка, только если список уже существует.
+
+        Счетчик version_key увеличивается всегда, даже если списка нет.
+        """
+        client = await self.get_async_client()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.rpushx(key, self._serialize_value(value))
+            if max_len:
+                pipe.ltrim(key, -max_len, -1)
+            if ttl:
+                pipe.expire(key, ttl)
+            if version_key:
+                pipe.incr(version_key)
+                if ttl:
+                    pipe.expire(version_key, ttl)
+            length, *_ = await pipe.execute()
+        return length > 0
+
+    async def get_int(self, key: str) -> int:
+        client = await self.get_async_client()
+        return int(await client.get(key) or 0)
+
+    async def delete(self, key: str):
+        client = await self.get_async_client()
+        await client.delete(key)
+
     async def get_async_client(self) -> aioredis.Redis:
         if self.async_client is None:
             self.async_pool = aioredis.ConnectionPool.from_url(
@@ -0,0 +1,384 @@
+import asyncio
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from opentelemetry.trace import Status, StatusCode, SpanKind
+
+from internal import interface
+from internal import common
+
+# Файл кэша: 4 байта длины заголовка, JSON заголовок с метаданными, затем содержимое
+_HEADER_LENGTH = struct.Struct(">I")
+_TMP_SUFFIX = ".tmp"
+
+
+@dataclass
+class _CacheEntry:
+    path: str
+    offset: int
+    size: int
+    content_type: str | None
+    etag: str | None
+
+
+class DiskCachedStorage(interface.IStorage):
+    """Кэш файлов хранилища на локальном диске.
+
+    Файлы по fid неизменяемы до update/delete, поэтому содержимое кладется на диск
+    при первом чтении и дальше отдается через mmap без похода на volume сервер.
+    Запись атомарная (временный файл + os.replace), размер кэша ограничен max_bytes,
+    при превышении вытесняются давно не читанные файлы.
+    Инвалидация при update/delete видна только этому процессу: остальные воркеры
+    с тем же каталогом заметят ее, когда файл пропадет с диска.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            storage: interface.IStorage,
+            cache_dir: str,
+            max_bytes: int,
+            max_file_bytes: int,
+            chunk_size: int = 64 * 1024,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.storage = storage
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.chunk_size = chunk_size
+
+        meter = tel.meter()
+        self.hit_counter = meter.create_counter(
+            name=common.STORAGE_DISK_CACHE_HIT_METRIC,
+            description="Total count of storage reads served from local disk cache",
+            unit="1"
+        )
+        self.miss_counter = meter.create_counter(
+            name=common.STORAGE_DISK_CACHE_MISS_METRIC,
+            description="Total count of storage reads served from volume server",
+            unit="1"
+        )
+        self.eviction_counter = meter.create_counter(
+            name=common.STORAGE_DISK_CACHE_EVICTION_METRIC,
+            description="Total count of files evicted from local disk cache",
+            unit="1"
+        )
+
+        # fid -> запись, порядок от давно читанных к недавним
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    async def delete(self, fid: str, name: str):
+        self._drop(fid)
+        await self.storage.delete(fid, name)
+
+    async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
+        with self.tracer.start_as_current_span(
+                "DiskCachedStorage.download",
+                kind=SpanKind.INTERNAL,
+                attributes={"fid": fid}
+        ) as span:
+            try:
+                cached = self._open_cached(fid)
+                if cached is not None:
+                    entry, file, mm = cached
+                    try:
+                        content = mm[entry.offset:entry.offset + entry.size]
+                    finally:
+                        mm.close()
+                        file.close()
+
+                    self.hit_counter.add(1)
+                    span.set_attribute("cache.hit", True)
+                    span.set_status(Status(StatusCode.OK))
+                    return io.BytesIO(content), entry.content_type
+
+                self.miss_counter.add(1)
+                file, content_type = await self.storage.download(fid, name)
+
+                content = file.getvalue()
+                if len(content) <= self.max_file_bytes:
+                    await self._store(fid, content, content_type, None)
+
+                span.set_attribute("cache.hit", False)
+                span.set_status(Status(StatusCode.OK))
+                return file, content_type
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def open_stream(self, fid: str, name: str, byte_range: str = None) -> common.FileStream:
+        with self.tracer.start_as_current_span(
+                "DiskCachedStorage.open_stream",
+                kind=SpanKind.INTERNAL,
+                attributes={"fid": fid}
+        ) as span:
+            try:
+                bounds = self._parse_range(byte_range) if byte_range else None
+                # Несколько диапазонов в одном запросе отдает volume сервер
+                if byte_range and bounds is None:
+                    span.set_attribute("cache.hit", False)
+                    span.set_status(Status(StatusCode.OK))
+                    return await self.storage.open_stream(fid, name, byte_range)
+
+                cached = self._open_cached(fid)
+                if cached is not None:
+                    self.hit_counter.add(1)
+                    span.set_attribute("cache.hit", True)
+                    span.set_status(Status(StatusCode.OK))
+                    return self._cached_stream(*cached, bounds)
+
+                self.miss_counter.add(1)
+                span.set_attribute("cache.hit", False)
+                file_stream = await self.storage.open_stream(fid, name, byte_range)
+
+                if (
+                        byte_range is None
+                        and file_stream.status_code == 200
+                        and file_stream.content_length is not None
+                        and file_stream.content_length <= self.max_file_bytes
+                ):
+                    file_stream.body = self._tee_to_cache(fid, file_stream.body, file_stream)
+
+                span.set_status(Status(StatusCode.OK))
+                return file_stream
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def upload(self, file: io.BytesIO, name: str) -> common.StoredFile:
+        return await self.storage.upload(file, name)
+
+    async def update(self, file: io.BytesIO, fid: str, name: str) -> common.StoredFile:
+        self._drop(fid)
+        stored_file = await self.storage.update(file, fid, name)
+        # Чтение, начатое до update, могло успеть положить в кэш старое содержимое
+        self._drop(fid)
+        return stored_file
+
+    def _open_cached(self, fid: str) -> tuple[_CacheEntry, io.BufferedReader, mmap.mmap] | None:
+        entry = self._entries.get(fid)
+        if entry is None:
+            return None
+
+        try:
+            file = open(entry.path, "rb")
+        except FileNotFoundError:
+            # Файл удалил другой процесс с тем же каталогом кэша
+            self._forget(fid)
+            return None
+
+        try:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            file.close()
+            raise
+
+        self._entries.move_to_end(fid)
+        return entry, file, mm
+
+    def _cached_stream(
+            self,
+            entry: _CacheEntry,
+            file: io.BufferedReader,
+            mm: mmap.mmap,
+            bounds: tuple[int | None, int | None] | None,
+    ) -> common.FileStream:
+        if bounds is None:
+            return common.FileStream(
+                body=self._iter_mmap(file, mm, entry.offset, entry.offset + entry.size),
+                content_type=entry.content_type,
+                content_length=entry.size,
+                etag=entry.etag,
+            )
+
+        start, end = self._resolve_range(bounds, entry.size)
+        if start is None:
+            return common.FileStream(
+                body=self._iter_mmap(file, mm, 0, 0),
+                content_type=entry.content_type,
+                content_length=0,
+                etag=entry.etag,
+                status_code=416,
+                content_range=f"bytes */{entry.size}",
+            )
+
+        return common.FileStream(
+            body=self._iter_mmap(file, mm, entry.offset + start, entry.offset + end + 1),
+            content_type=entry.content_type,
+            content_length=end - start + 1,
+            etag=entry.etag,
+            status_code=206,
+            content_range=f"bytes {start}-{end}/{entry.size}",
+        )
+
+    async def _iter_mmap(self, file: io.BufferedReader, mm: mmap.mmap, start: int, end: int) -> AsyncIterator[bytes]:
+        try:
+            for position in range(start, end, self.chunk_size):
+                yield mm[position:min(position + self.chunk_size, end)]
+        finally:
+            mm.close()
+            file.close()
+
+    async def _tee_to_cache(
+            self,
+            fid: str,
+            body: AsyncIterator[bytes],
+            file_stream: common.FileStream
+    ) -> AsyncIterator[bytes]:
+        """Отдает тело клиенту и копит его в памяти, файл кэша пишется одним разом в потоке.
+
+        Кэшируются только файлы не больше max_file_bytes, столько и занимает буфер.
+        """
+        chunks = []
+        written = 0
+        async for chunk in body:
+            chunks.append(chunk)
+            written += len(chunk)
+            yield chunk
+
+        # Клиент дочитал файл до конца: публикуем его в кэш
+        if written == file_stream.content_length:
+            await self._store(fid, b"".join(chunks), file_stream.content_type, file_stream.etag)
+
+    async def _store(self, fid: str, content: bytes, content_type: str | None, etag: str | None):
+        # Запись на диск в потоке, индекс меняется только в event loop
+        path, offset = await asyncio.to_thread(self._write_file, fid, content, content_type, etag)
+        self._commit(fid, path, offset, len(content), content_type, etag)
+
+    def _write_file(self, fid: str, content: bytes, content_type: str | None, etag: str | None) -> tuple[str, int]:
+        header = self._header(fid, content_type, etag)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=_TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(header)
+                tmp.write(content)
+
+            path = self._path(fid)
+            os.replace(tmp_path, path)
+        except Exception:
+            self._unlink(tmp_path)
+            raise
+        return path, len(header)
+
+    def _commit(self, fid: str, path: str, offset: int, size: int, content_type: str | None, etag: str | None):
+        self._forget(fid)
+        self._entries[fid] = _CacheEntry(path=path, offset=offset, size=size, content_type=content_type, etag=etag)
+        self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            fid, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            self._unlink(entry.path)
+            self.eviction_counter.add(1)
+
+    def _drop(self, fid: str):
+        entry = self._entries.get(fid)
+        path = entry.path if entry is not None else self._path(fid)
+        self._forget(fid)
+        self._unlink(path)
+
+    def _forget(self, fid: str):
+        entry = self._entries.pop(fid, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+
+    def _load_index(self):
+        """Восстанавливает индекс по файлам, оставшимся от прошлого запуска"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(_TMP_SUFFIX):
+                # Недописанный файл после падения процесса
+                self._unlink(path)
+                continue
+            try:
+                files.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                continue
+
+        for _, path in sorted(files):
+            try:
+                with open(path, "rb") as file:
+                    header_length = _HEADER_LENGTH.unpack(file.read(_HEADER_LENGTH.size))[0]
+                    meta = json.loads(file.read(header_length))
+                    offset = _HEADER_LENGTH.size + header_length
+                    size = os.fstat(file.fileno()).st_size - offset
+            except (OSError, ValueError, struct.error):
+                self._unlink(path)
+                continue
+
+            self._entries[meta["fid"]] = _CacheEntry(
+                path=path,
+                offset=offset,
+                size=size,
+                content_type=meta.get("content_type"),
+                etag=meta.get("etag"),
+            )
+            self._total_bytes += size
+
+        self._evict()
+        self.logger.info("Дисковый кэш хранилища загружен", {
+            "files": len(self._entries),
+            "bytes": self._total_bytes,
+        })
+
+    def _path(self, fid: str) -> str:
+        # fid приходит снаружи, поэтому в имени файла только его хэш
+        return os.path.join(self.cache_dir, hashlib.blake2b(fid.encode(), digest_size=16).hexdigest())
+
+    @staticmethod
+    def _header(fid: str, content_type: str | None, etag: str | None) -> bytes:
+        meta = json.dumps({"fid": fid, "content_type": content_type, "etag": etag}).encode()
+        return _HEADER_LENGTH.pack(len(meta)) + meta
+
+    @staticmethod
+    def _parse_range(byte_range: str) -> tuple[int | None, int | None] | None:
+        unit, _, spec = byte_range.strip().partition("=")
+        if unit.strip().lower() != "bytes" or "," in spec:
+            return None
+
+        start, sep, end = spec.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            return (int(start) if start else None), (int(end) if end else None)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _resolve_range(bounds: tuple[int | None, int | None], size: int) -> tuple[int | None, int | None]:
+        start, end = bounds
+        if start is None:
+            # bytes=-N — последние N байт
+            if not end:
+                return None, None
+            return max(size - end, 0), size - 1
+
+        if start >= size or (end is not None and end < start):
+            return None, None
+        return start, min(end if end is not None else size - 1, size - 1)
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -1,27 +1,217 @@
 import io
-import gzip
-import shutil
+import time
+from typing import AsyncIterator
 
-from weed import operation as op
-from weed.util import WeedOperationResponse
+import httpx
+from opentelemetry.trace import Status, StatusCode, SpanKind
 
 from internal import interface
+from internal import common
 
 
 class Weed(interface.IStorage):
-    def __init__(self, weed_master_host: str, weed_master_port: int):
-        self.storage = op.WeedOperation("http://" + weed_master_host + ":" + str(weed_master_port))
+    """Асинхронный клиент SeaweedFS поверх httpx.
 
-    def delete(self, fid: str, name: str):
-        return self.storage.crud_delete(fid=fid, file_name=name)
+    Соединения с master и volume серверами берутся из общего пула.
+    Адреса volume серверов по volume id кэшируются на location_cache_ttl секунд
+    и сбрасываются, если сервер по закэшированному адресу недоступен.
+    """
 
-    def update(self, file: io.BytesIO, fid: str, name: str):
-        return self.storage.crud_update(fp=file, fid=fid, file_name=name)
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            weed_master_host: str,
+            weed_master_port: int,
+            location_cache_ttl: int = 600,
+            max_connections: int = 50,
+            timeout: float = 30,
+            chunk_size: int = 64 * 1024,
+    ):
+        self.tracer = tel.tracer()
+        self.master_url = "http://" + weed_master_host + ":" + str(weed_master_port)
+        self.location_cache_ttl = location_cache_ttl
+        self.chunk_size = chunk_size
 
-    def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
-        file_data = self.storage.crud_read(fid=fid, file_name=name)
-        file = io.BytesIO(file_data.content)
-        return file, file_data.content_type
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(timeout, connect=5),
+        )
 
-    def upload(self, file: io.BytesIO, name: str) -> WeedOperationResponse:
-        return self.storage.crud_create(fp=file, file_name=name)
\ No newline at end of file
+        # volume id -> (адреса volume серверов, время истечения)
+        self._locations: dict[str, tuple[list[str], float]] = {}
+
+    async def delete(self, fid: str, name: str):
+        with self.tracer.start_as_current_span(
+                "Weed.delete",
+                kind=SpanKind.CLIENT,
+                attributes={"fid": fid}
+        ) as span:
+            try:
+                response = await self._request_volume("DELETE", fid)
+                response.raise_for_status()
+                span.set_status(Status(StatusCode.OK))
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]:
+        with self.tracer.start_as_current_span(
+                "Weed.download",
+                kind=SpanKind.CLIENT,
+                attributes={"fid": fid}
+        ) as span:
+            try:
+                response = await self._request_volume("GET", fid)
+                response.raise_for_status()
+
+                span.set_attribute("size", len(response.content))
+                span.set_status(Status(StatusCode.OK))
+                return io.BytesIO(response.content), response.headers.get("Content-Type")
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def open_stream(self, fid: str, name: str, byte_range: str = None) -> common.FileStream:
+        """Открывает файл на чтение кусками по chunk_size.
+
+        Заголовки приходят сразу, тело читается из сокета по мере потребления,
+        поэтому в памяти держится не больше одного куска независимо от размера файла.
+        byte_range — значение заголовка Range, диапазоны обрабатывает volume сервер.
+        """
+        with self.tracer.start_as_current_span(
+                "Weed.open_stream",
+                kind=SpanKind.CLIENT,
+                attributes={"fid": fid}
+        ) as span:
+            try:
+                url = await self._file_url(fid)
+                # Текст SeaweedFS хранит сжатым и по умолчанию отдает с Content-Encoding: gzip.
+                # aiter_bytes распаковывает тело, и Content-Length сжатого ответа с ним бы не совпал
+                headers = {"Accept-Encoding": "identity"}
+                if byte_range:
+                    headers["Range"] = byte_range
+                response = await self.client.send(self.client.build_request("GET", url, headers=headers), stream=True)
+                if response.is_error and response.status_code != 416:
+                    await response.aclose()
+                    response.raise_for_status()
+
+                content_length = response.headers.get("Content-Length")
+                span.set_status(Status(StatusCode.OK))
+                return common.FileStream(
+                    body=self._iter_body(response),
+                    content_type=response.headers.get("Content-Type"),
+                    content_length=int(content_length) if content_length is not None else None,
+                    etag=response.headers.get("ETag"),
+                    status_code=response.status_code,
+                    content_range=response.headers.get("Content-Range"),
+                )
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def _iter_body(self, response: httpx.Response) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.aiter_bytes(self.chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def upload(self, file: io.BytesIO, name: str) -> common.StoredFile:
+        with self.tracer.start_as_current_span(
+                "Weed.upload",
+                kind=SpanKind.CLIENT,
+                attributes={"name": name}
+        ) as span:
+            try:
+                response = await self.client.get(self.master_url + "/dir/assign")
+                response.raise_for_status()
+                assign = response.json()
+                if "error" in assign:
+                    raise RuntimeError(f"SeaweedFS assign: {assign['error']}")
+
+                fid = assign["fid"]
+                volume_url = "http://" + assign["url"]
+                self._remember_location(fid, [volume_url])
+
+                stored_file = await self._write(volume_url, fid, file, name)
+
+                span.set_attribute("fid", fid)
+                span.set_status(Status(StatusCode.OK))
+                return stored_file
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def update(self, file: io.BytesIO, fid: str, name: str) -> common.StoredFile:
+        with self.tracer.start_as_current_span(
+                "Weed.update",
+                kind=SpanKind.CLIENT,
+                attributes={"fid": fid}
+        ) as span:
+            try:
+                volume_url = (await self._lookup(self._volume_id(fid)))[0]
+                stored_file = await self._write(volume_url, fid, file, name)
+
+                span.set_status(Status(StatusCode.OK))
+                return stored_file
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise err
+
+    async def _write(self, volume_url: str, fid: str, file: io.BytesIO, name: str) -> common.StoredFile:
+        # httpx отправляет multipart из файлового объекта кусками, не копируя его целиком
+        response = await self.client.post(volume_url + "/" + fid, files={"file": (name, file)})
+        response.raise_for_status()
+        result = response.json()
+        if "error" in result:
+            raise RuntimeError(f"SeaweedFS upload: {result['error']}")
+
+        return common.StoredFile(
+            fid=fid,
+            url=volume_url + "/" + fid,
+            name=result.get("name", name),
+            size=result.get("size", 0),
+        )
+
+    async def _request_volume(self, method: str, fid: str) -> httpx.Response:
+        url = await self._file_url(fid)
+        try:
+            return await self.client.request(method, url)
+        except httpx.TransportError:
+            # Volume мог переехать: сбрасываем адрес и пробуем один раз по свежему
+            self._locations.pop(self._volume_id(fid), None)
+            url = await self._file_url(fid)
+            return await self.client.request(method, url)
+
+    async def _file_url(self, fid: str) -> str:
+        return (await self._lookup(self._volume_id(fid)))[0] + "/" + fid
+
+    async def _lookup(self, volume_id: str) -> list[str]:
+        cached = self._locations.get(volume_id)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        response = await self.client.get(self.master_url + "/dir/lookup", params={"volumeId": volume_id})
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("locations"):
+            raise FileNotFoundError(f"SeaweedFS: volume {volume_id} не найден")
+
+        urls = ["http://" + location["url"] for location in result["locations"]]
+        self._locations[volume_id] = (urls, time.monotonic() + self.location_cache_ttl)
+        return urls
+
+    def _remember_location(self, fid: str, urls: list[str]):
+        self._locations[self._volume_id(fid)] = (urls, time.monotonic() + self.location_cache_ttl)
+
+    @staticmethod
+    def _volume_id(fid: str) -> str:
+        return fid.split(",", 1)[0]
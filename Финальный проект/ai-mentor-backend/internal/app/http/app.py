@@ -1,21 +1,30 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from internal import interface
-from internal import model
 
 
 def NewHTTP(
-        db: interface.IDB,
         chat_controller: interface.IChatController,
         edu_student_controller: interface.IEduStudentController,
         edu_topic_controller: interface.IEduTopicController,
         http_middleware: interface.IHttpMiddleware,
+        message_partition_maintainer: interface.IMessagePartitionMaintainer,
         prefix: str
 ):
-    app = FastAPI()
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        maintainer_task = asyncio.create_task(message_partition_maintainer.run())
+        try:
+            yield
+        finally:
+            maintainer_task.cancel()
+
+    app = FastAPI(lifespan=lifespan)
     include_middleware(app, http_middleware)
 
-    include_db_handler(app, db, prefix)
     include_chat_handlers(app, chat_controller, prefix)
     include_edu_student_handlers(app, edu_student_controller, prefix)
     include_edu_topic_handlers(app, edu_topic_controller, prefix)
@@ -27,6 +36,7 @@ def include_middleware(
         app: FastAPI,
         http_middleware: interface.IHttpMiddleware
 ):
+    http_middleware.db_consistency_middleware04(app)
     http_middleware.logger_middleware03(app)
     http_middleware.metrics_middleware02(app)
     http_middleware.trace_middleware01(app)
@@ -45,19 +55,38 @@ def include_chat_handlers(
         description="Отправляет сообщение регистратору"
     )
 
+    app.add_api_route(
+        prefix + "/chat/message/send/stream",
+        chat_controller.send_message_to_expert_stream,
+        methods=["POST"],
+        summary="Отправить сообщение эксперту с потоковым ответом",
+        description="Отдает ответ эксперта через Server-Sent Events: события token по мере генерации, "
+                    "затем событие message с итоговым текстом и командами"
+    )
+
+    app.add_api_route(
+        prefix + "/chat/{chat_id}/messages",
+        chat_controller.get_chat_messages,
+        methods=["GET"],
+        summary="История чата постранично",
+        description="Сообщения чата в хронологическом порядке, по limit штук начиная с последних. "
+                    "next_cursor из ответа передается в cursor для загрузки более старых сообщений"
+    )
+
+
 def include_edu_topic_handlers(
         app: FastAPI,
         edu_topic_controller: interface.IEduTopicController,
         prefix: str
 ):
     app.add_api_route(
-        prefix + "/edu/topic/download/{edu_content_type}/{file_id}",
+        prefix + "/edu/topic/download/{edu_content_type}/{topic_id}",
         edu_topic_controller.download_topic_content,
         methods=["GET"],
     )
 
     app.add_api_route(
-        prefix + "/edu/block/download/{file_id}",
+        prefix + "/edu/block/download/{block_id}",
         edu_topic_controller.download_block_content,
         methods=["GET"],
     )
@@ -73,28 +102,3 @@ def include_edu_student_handlers(
         edu_student_controller.get_by_id,
         methods=["GET"],
     )
-
-
-def include_db_handler(app: FastAPI, db: interface.IDB, prefix: str):
-    app.add_api_route(prefix + "/table/create", create_table_handler(db), methods=["GET"])
-    app.add_api_route(prefix + "/table/drop", drop_table_handler(db), methods=["GET"])
-
-
-def create_table_handler(db: interface.IDB):
-    async def create_table():
-        try:
-            await db.multi_query(model.create_queries)
-        except Exception as err:
-            raise err
-
-    return create_table
-
-
-def drop_table_handler(db: interface.IDB):
-    async def delete_table():
-        try:
-            await db.multi_query(model.drop_queries)
-        except Exception as err:
-            raise err
-
-    return delete_table
@@ -0,0 +1,22 @@
+import asyncio
+
+from internal import interface
+
+
+def RunMigrate(
+        migration_service: interface.IMigrationService,
+        message_partition_maintainer: interface.IMessagePartitionMaintainer
+):
+    async def migrate():
+        applied = await migration_service.migrate()
+        # Партиции впереди текущего id нужны сразу, не дожидаясь первого цикла в HTTP-воркере
+        created, _ = await message_partition_maintainer.maintain()
+        return applied, created
+
+    applied, created = asyncio.run(migrate())
+    if not applied:
+        print("Схема БД актуальна")
+    for migration in applied:
+        print(f"Применена миграция {migration.version}: {migration.name}")
+    for partition in created:
+        print(f"Создана партиция {partition}")
@@ -0,0 +1,12 @@
+import asyncio
+
+from internal import interface
+
+
+def RunParseEduContent(
+        edu_content_ingest_service: interface.IEduContentIngestService,
+        root: str
+):
+    stats = asyncio.run(edu_content_ingest_service.ingest(root))
+    print(f"База знаний {root} загружена")
+    print(stats)
@@ -1,2 +1,5 @@
 from internal.common.model import *
-from internal.common.const import *
\ No newline at end of file
+from internal.common.const import *
+from internal.common.tokens import *
+from internal.common.hashing import *
+from internal.common.cursor import *
@@ -14,6 +14,12 @@ class Experts:
     teacher = "teacher"
     test = "test"
 
+# messages.id — SERIAL (int4), верхняя граница для keyset-выборки без курсора
+MAX_MESSAGE_ID = 2_147_483_647
+
+MESSAGES_PAGE_DEFAULT_LIMIT = 50
+MESSAGES_PAGE_MAX_LIMIT = 500
+
 TRACE_ID_KEY = "trace_id"
 SPAN_ID_KEY = "span_id"
 REQUEST_ID_KEY = "request_id"
@@ -52,5 +58,23 @@ ERROR_JOIN_CHAT_TOTAL_METRIC = "telegram.server.error.join_chat.total"
 MESSAGE_DURATION_METRIC = "telegram.server.message.duration"
 ACTIVE_MESSAGES_METRIC = "telegram.server.active_messages"
 
+CHAT_HISTORY_CACHE_HIT_METRIC = "chat.history.cache.hit.total"
+CHAT_HISTORY_CACHE_MISS_METRIC = "chat.history.cache.miss.total"
+
+CHAT_RESPONSE_CACHE_REQUESTS_METRIC = "chat.response_cache.requests.total"
+
+LLM_IN_FLIGHT_REQUESTS_METRIC = "llm.client.in_flight_requests"
+LLM_QUEUED_REQUESTS_METRIC = "llm.client.queued_requests"
+LLM_QUEUE_WAIT_METRIC = "llm.client.queue_wait.duration"
+
+DB_POOL_CHECKED_OUT_METRIC = "db.client.pool.checked_out"
+DB_POOL_OVERFLOW_METRIC = "db.client.pool.overflow"
+DB_POOL_CHECKOUT_WAIT_METRIC = "db.client.pool.checkout_wait.duration"
+DB_OPERATION_DURATION_METRIC = "db.client.operation.duration"
+
+STORAGE_DISK_CACHE_HIT_METRIC = "storage.disk_cache.hit.total"
+STORAGE_DISK_CACHE_MISS_METRIC = "storage.disk_cache.miss.total"
+STORAGE_DISK_CACHE_EVICTION_METRIC = "storage.disk_cache.eviction.total"
+
 TRACE_ID_HEADER = "X-Trace-ID"
 SPAN_ID_HEADER = "X-Span-ID"
\ No newline at end of file
@@ -0,0 +1,20 @@
+import base64
+import json
+
+
+def encode_cursor(fields: dict) -> str:
+    """Непрозрачный курсор постраничной выборки: поля keyset в base64url без паддинга"""
+    raw = json.dumps(fields, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        fields = json.loads(raw)
+    except (ValueError, UnicodeDecodeError) as err:
+        raise ValueError(f"Некорректный курсор: {cursor}") from err
+
+    if not isinstance(fields, dict):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return fields
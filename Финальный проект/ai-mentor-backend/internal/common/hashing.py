@@ -0,0 +1,8 @@
+import hashlib
+
+# Длина хэша содержимого в байтах, в hex строке вдвое больше
+CONTENT_HASH_SIZE = 16
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=CONTENT_HASH_SIZE).hexdigest()
@@ -1,4 +1,7 @@
+import hashlib
 from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator
 
 
 @dataclass
@@ -13,3 +16,44 @@ class Command:
             "params": self.params,
             "description": self.description
         }
+
+
+@dataclass
+class StreamEvent:
+    event: str
+    data: dict
+
+
+@dataclass
+class StoredFile:
+    """Результат записи файла в хранилище"""
+    fid: str
+    url: str
+    name: str
+    size: int
+
+
+@dataclass
+class FileStream:
+    """Открытый поток чтения файла из хранилища, body нужно дочитать или закрыть"""
+    body: AsyncIterator[bytes]
+    content_type: str | None
+    content_length: int | None
+    etag: str | None
+    # 206 для ответа на Range, 416 для диапазона за пределами файла
+    status_code: int = 200
+    content_range: str | None = None
+
+
+@dataclass
+class ContentFile:
+    """Файл обучающего материала: fid в хранилище и время изменения строки в БД"""
+    fid: str
+    name: str
+    updated_at: datetime
+
+    @property
+    def etag(self) -> str:
+        # Валидатор считается без обращения к хранилищу
+        digest = hashlib.blake2b(f"{self.fid}:{self.updated_at.isoformat()}".encode(), digest_size=12)
+        return f'"{digest.hexdigest()}"'
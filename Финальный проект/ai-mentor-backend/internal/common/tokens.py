@@ -0,0 +1,12 @@
+# Приблизительная оценка числа токенов без токенизатора:
+# для смеси кириллицы, латиницы и кода в среднем ~3 символа на токен
+CHARS_PER_TOKEN = 3
+
+# Накладные расходы на служебную разметку одного сообщения чата
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
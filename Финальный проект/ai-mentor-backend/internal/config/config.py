@@ -6,6 +6,20 @@ class Config:
     db_name: str = os.environ.get('BACKEND_POSTGRES_DB_NAME')
     db_host: str = os.environ.get('BACKEND_POSTGRES_HOST')
     db_port: str = "5432"
+    # sqlalchemy — PG поверх AsyncSession, asyncpg — RawPG напрямую на пуле asyncpg
+    db_backend: str = os.environ.get('DB_BACKEND', 'sqlalchemy')
+    db_pool_size: int = int(os.environ.get('DB_POOL_SIZE', 15))
+    db_max_overflow: int = int(os.environ.get('DB_MAX_OVERFLOW', 15))
+    db_pool_recycle: int = int(os.environ.get('DB_POOL_RECYCLE', 300))
+    db_pool_timeout: float = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    db_pool_pre_ping: bool = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Миллисекунды, 0 — без ограничения
+    db_statement_timeout: int = int(os.environ.get('DB_STATEMENT_TIMEOUT', 30000))
+    db_prepared_statement_cache_size: int = int(os.environ.get('DB_PREPARED_STATEMENT_CACHE_SIZE', 100))
+    # Пустой хост — реплики нет, все чтения идут на primary
+    db_replica_host: str = os.environ.get('BACKEND_POSTGRES_REPLICA_HOST', '')
+    db_replica_port: str = os.environ.get('BACKEND_POSTGRES_REPLICA_PORT', '5432')
+    db_replica_retry_interval: float = float(os.environ.get('DB_REPLICA_RETRY_INTERVAL', 30))
 
     http_port: int = int(os.environ.get('BACKEND_PORT'))
     prefix = os.environ.get('BACKEND_PREFIX')
@@ -18,6 +32,24 @@ class Config:
 
     openai_api_key: str = os.environ.get('OPEN_AI_API_KEY')
 
+    llm_max_connections: int = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))
+    llm_max_keepalive_connections: int = int(os.environ.get('LLM_MAX_KEEPALIVE_CONNECTIONS', 10))
+    llm_keepalive_expiry: float = float(os.environ.get('LLM_KEEPALIVE_EXPIRY', 30))
+    llm_http2: bool = os.environ.get('LLM_HTTP2', 'false').lower() == 'true'
+    llm_connect_timeout: float = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+    llm_read_timeout: float = float(os.environ.get('LLM_READ_TIMEOUT', 60))
+    llm_max_concurrency: int = int(os.environ.get('LLM_MAX_CONCURRENCY', 16))
+    # 0 — без ограничения частоты, только по числу одновременных запросов
+    llm_rate_limit_rps: float = float(os.environ.get('LLM_RATE_LIMIT_RPS', 0))
+    llm_rate_limit_burst: int = int(os.environ.get('LLM_RATE_LIMIT_BURST', 10))
+    llm_queue_timeout: float = float(os.environ.get('LLM_QUEUE_TIMEOUT', 30))
+    llm_retry_attempts: int = int(os.environ.get('LLM_RETRY_ATTEMPTS', 3))
+    llm_retry_base_delay: float = float(os.environ.get('LLM_RETRY_BASE_DELAY', 0.5))
+    llm_retry_max_delay: float = float(os.environ.get('LLM_RETRY_MAX_DELAY', 8))
+    llm_hedging_enabled: bool = os.environ.get('LLM_HEDGING_ENABLED', 'false').lower() == 'true'
+    llm_hedge_quantile: float = float(os.environ.get('LLM_HEDGE_QUANTILE', 0.95))
+    llm_hedge_min_delay: float = float(os.environ.get('LLM_HEDGE_MIN_DELAY', 1))
+
     environment = os.environ.get('ENVIRONMENT')
     log_level = os.environ.get('LOG_LEVEL')
 
@@ -32,4 +64,44 @@ class Config:
     monitoring_redis_password: str = os.environ.get('MONITORING_REDIS_PASSWORD')
 
     weed_master_host: str = os.environ.get('WEED_MASTER_CONTAINER_NAME')
-    weed_master_port: int = int(os.environ.get('WEED_MASTER_PORT'))
\ No newline at end of file
+    weed_master_port: int = int(os.environ.get('WEED_MASTER_PORT'))
+    weed_location_cache_ttl: int = int(os.environ.get('WEED_LOCATION_CACHE_TTL', 600))
+    weed_max_connections: int = int(os.environ.get('WEED_MAX_CONNECTIONS', 50))
+    # Пустой каталог отключает дисковый кэш файлов
+    weed_disk_cache_dir: str = os.environ.get('WEED_DISK_CACHE_DIR', '')
+    weed_disk_cache_max_bytes: int = int(os.environ.get('WEED_DISK_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    weed_disk_cache_max_file_bytes: int = int(os.environ.get('WEED_DISK_CACHE_MAX_FILE_BYTES', 16 * 1024 * 1024))
+
+    edu_content_root: str = os.environ.get('EDU_CONTENT_ROOT', 'pkg/backend_knowledge')
+    edu_content_upload_concurrency: int = int(os.environ.get('EDU_CONTENT_UPLOAD_CONCURRENCY', 8))
+
+    edu_catalog_check_interval: int = int(os.environ.get('EDU_CATALOG_CHECK_INTERVAL', 60))
+    prompt_fetch_timeout: float = float(os.environ.get('PROMPT_FETCH_TIMEOUT', 5))
+    chapter_content_token_budget: int = int(os.environ.get('CHAPTER_CONTENT_TOKEN_BUDGET', 2000))
+    chapter_content_max_documents: int = int(os.environ.get('CHAPTER_CONTENT_MAX_DOCUMENTS', 256))
+
+    chat_history_token_budget: int = int(os.environ.get('CHAT_HISTORY_TOKEN_BUDGET', 6000))
+    chat_history_fetch_limit: int = int(os.environ.get('CHAT_HISTORY_FETCH_LIMIT', 100))
+    chat_summary_refresh_min_messages: int = int(os.environ.get('CHAT_SUMMARY_REFRESH_MIN_MESSAGES', 10))
+
+    # memory — LRU в памяти воркера, redis — общий кэш в Redis
+    chat_history_cache_backend: str = os.environ.get('CHAT_HISTORY_CACHE_BACKEND', 'memory')
+    chat_history_cache_max_messages: int = int(os.environ.get('CHAT_HISTORY_CACHE_MAX_MESSAGES', 200))
+    chat_history_cache_max_chats: int = int(os.environ.get('CHAT_HISTORY_CACHE_MAX_CHATS', 1000))
+    chat_history_cache_ttl: int = int(os.environ.get('CHAT_HISTORY_CACHE_TTL', 3600))
+    chat_history_cache_redis_host: str = os.environ.get('CHAT_HISTORY_CACHE_REDIS_HOST', monitoring_redis_host)
+    chat_history_cache_redis_port: int = int(os.environ.get('CHAT_HISTORY_CACHE_REDIS_PORT', monitoring_redis_port))
+    chat_history_cache_redis_db: int = int(os.environ.get('CHAT_HISTORY_CACHE_REDIS_DB', 1))
+    chat_history_cache_redis_password: str = os.environ.get('CHAT_HISTORY_CACHE_REDIS_PASSWORD', monitoring_redis_password)
+
+    # messages партиционирована по диапазонам id, retention 0 — без архивирования старых партиций
+    messages_partition_size: int = int(os.environ.get('MESSAGES_PARTITION_SIZE', 1_000_000))
+    messages_partitions_ahead: int = int(os.environ.get('MESSAGES_PARTITIONS_AHEAD', 2))
+    messages_retention_days: int = int(os.environ.get('MESSAGES_RETENTION_DAYS', 0))
+    messages_partition_check_interval: int = int(os.environ.get('MESSAGES_PARTITION_CHECK_INTERVAL', 3600))
+
+    chat_response_cache_enabled: bool = os.environ.get('CHAT_RESPONSE_CACHE_ENABLED', 'false').lower() == 'true'
+    chat_response_cache_ttl: int = int(os.environ.get('CHAT_RESPONSE_CACHE_TTL', 86400))
+    chat_response_cache_max_entries: int = int(os.environ.get('CHAT_RESPONSE_CACHE_MAX_ENTRIES', 5000))
+    chat_response_cache_similarity: float = float(os.environ.get('CHAT_RESPONSE_CACHE_SIMILARITY', 0.92))
+    chat_response_cache_min_terms: int = int(os.environ.get('CHAT_RESPONSE_CACHE_MIN_TERMS', 4))
\ No newline at end of file
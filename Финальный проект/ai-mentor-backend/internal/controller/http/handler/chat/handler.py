@@ -1,10 +1,17 @@
-from fastapi import status
-from fastapi.responses import JSONResponse
+import json
+from typing import AsyncIterator
+
+import ujson
+from fastapi import Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from opentelemetry.trace import StatusCode, SpanKind
 
-from internal import interface
+from internal import interface, common, model
 from .model import *
 
+# Страница истории отдается кусками примерно такого размера, а не одной строкой
+MESSAGES_STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class ChatController(interface.IChatController):
     def __init__(
@@ -44,4 +51,101 @@ class ChatController(interface.IChatController):
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(StatusCode.ERROR, str(err))
-                raise err
\ No newline at end of file
+                raise err
+
+    async def send_message_to_expert_stream(self, body: SendMessageToExpert):
+        with self.tracer.start_as_current_span(
+                "EduChatController.send_message_to_expert_stream",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "student_id": body.student_id,
+                    "text": body.text
+                }
+        ) as span:
+            try:
+                events = self.chat_service.send_message_to_expert_stream(
+                    body.student_id,
+                    body.text
+                )
+
+                span.set_status(StatusCode.OK)
+                return StreamingResponse(
+                    content=self._to_sse(events),
+                    media_type="text/event-stream",
+                    headers={
+                        "Cache-Control": "no-cache",
+                        "X-Accel-Buffering": "no",
+                    }
+                )
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def get_chat_messages(
+            self,
+            chat_id: int,
+            limit: int = Query(common.MESSAGES_PAGE_DEFAULT_LIMIT, ge=1, le=common.MESSAGES_PAGE_MAX_LIMIT),
+            cursor: str | None = None
+    ):
+        with self.tracer.start_as_current_span(
+                "EduChatController.get_chat_messages",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "chat_id": chat_id,
+                    "limit": limit,
+                }
+        ) as span:
+            try:
+                try:
+                    page = await self.chat_service.get_messages_page(chat_id, limit, cursor)
+                except ValueError as err:
+                    span.record_exception(err)
+                    span.set_status(StatusCode.ERROR, str(err))
+                    return JSONResponse(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        content={"error": "invalid cursor"},
+                    )
+
+                span.set_status(StatusCode.OK)
+                return StreamingResponse(
+                    content=self._encode_messages_page(page),
+                    media_type="application/json",
+                )
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    @staticmethod
+    async def _encode_messages_page(page: model.MessagePage) -> AsyncIterator[str]:
+        """{"messages": [...], "next_cursor": ...} по частям: сообщения кодируются по одному"""
+        buffer = ['{"messages":[']
+        buffer_size = 0
+        for index, message in enumerate(page.messages):
+            item = ujson.dumps({
+                "id": message.id,
+                "chat_id": message.chat_id,
+                "role": message.role,
+                "text": message.text,
+                "created_at": message.created_at.isoformat(),
+            }, ensure_ascii=False)
+            buffer.append(item if index == 0 else "," + item)
+            buffer_size += len(item) + 1
+
+            if buffer_size >= MESSAGES_STREAM_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer = []
+                buffer_size = 0
+
+        buffer.append(f'],"next_cursor":{ujson.dumps(page.next_cursor)}}}')
+        yield "".join(buffer)
+
+    async def _to_sse(self, events: AsyncIterator[common.StreamEvent]) -> AsyncIterator[str]:
+        try:
+            async for event in events:
+                yield f"event: {event.event}\ndata: {json.dumps(event.data, ensure_ascii=False)}\n\n"
+        except Exception as err:
+            # Заголовки уже отправлены, поэтому об ошибке сообщаем отдельным событием
+            self.logger.error(f"Ошибка потоковой отправки сообщения: {err}")
+            yield f"event: error\ndata: {json.dumps({'message': 'Internal Server Error'})}\n\n"
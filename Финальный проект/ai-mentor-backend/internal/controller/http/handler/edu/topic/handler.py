@@ -1,7 +1,11 @@
-from fastapi.responses import StreamingResponse
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
 from opentelemetry.trace import StatusCode, SpanKind
 
-from internal import interface
+from internal import interface, common
 
 
 class EduTopicController(interface.IEduTopicController):
@@ -14,7 +18,7 @@ class EduTopicController(interface.IEduTopicController):
         self.logger = tel.logger()
         self.edu_topic_service = edu_topic_service
 
-    async def download_topic_content(self, edu_content_type: str, topic_id: int):
+    async def download_topic_content(self, request: Request, edu_content_type: str, topic_id: int):
         with self.tracer.start_as_current_span(
                 "EduChatController.download_topic_content",
                 kind=SpanKind.INTERNAL,
@@ -24,23 +28,17 @@ class EduTopicController(interface.IEduTopicController):
                 }
         ) as span:
             try:
-                file, content_type = await self.edu_topic_service.download_topic_content(
+                content_file = await self.edu_topic_service.get_topic_content_file(
                     edu_content_type,
                     topic_id
                 )
-                headers = {
-                    "Content-Type": content_type,
-                }
-                return StreamingResponse(
-                    content=file,
-                    headers=headers
-                )
+                return await self._serve_content(request, content_file)
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(StatusCode.ERROR, str(err))
                 raise err
 
-    async def download_block_content(self, block_id: int):
+    async def download_block_content(self, request: Request, block_id: int):
         with self.tracer.start_as_current_span(
                 "EduChatController.download_block_content",
                 kind=SpanKind.INTERNAL,
@@ -49,17 +47,91 @@ class EduTopicController(interface.IEduTopicController):
                 }
         ) as span:
             try:
-                file, content_type = await self.edu_topic_service.download_block_content(
+                content_file = await self.edu_topic_service.get_block_content_file(
                     block_id
                 )
-                headers = {
-                    "Content-Type": content_type,
-                }
-                return StreamingResponse(
-                    content=file,
-                    headers=headers
-                )
+                return await self._serve_content(request, content_file)
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(StatusCode.ERROR, str(err))
                 raise err
+
+    async def _serve_content(self, request: Request, content_file: common.ContentFile) -> Response:
+        last_modified = self._last_modified(content_file)
+        headers = {
+            "ETag": content_file.etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Accept-Ranges": "bytes",
+        }
+
+        # Валидаторы берутся из строки БД, поэтому 304 отдается без обращения к хранилищу
+        if self._is_not_modified(request, content_file.etag, last_modified):
+            return Response(status_code=304, headers=headers)
+
+        byte_range = self._requested_range(request, content_file.etag, last_modified)
+        file_stream = await self.edu_topic_service.open_content_stream(content_file, byte_range)
+
+        if file_stream.content_length is not None:
+            headers["Content-Length"] = str(file_stream.content_length)
+        if file_stream.content_range is not None:
+            headers["Content-Range"] = file_stream.content_range
+
+        # Тело отдается клиенту по мере чтения из хранилища
+        return StreamingResponse(
+            content=file_stream.body,
+            status_code=file_stream.status_code,
+            media_type=file_stream.content_type,
+            headers=headers
+        )
+
+    @staticmethod
+    def _last_modified(content_file: common.ContentFile) -> datetime:
+        updated_at = content_file.updated_at
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        # HTTP даты имеют точность до секунды
+        return updated_at.astimezone(timezone.utc).replace(microsecond=0)
+
+    @staticmethod
+    def _parse_http_date(value: str) -> datetime | None:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed
+
+    def _is_not_modified(self, request: Request, etag: str, last_modified: datetime) -> bool:
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            # При наличии If-None-Match заголовок If-Modified-Since игнорируется
+            candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+            return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+        if_modified_since = request.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            since = self._parse_http_date(if_modified_since)
+            return since is not None and last_modified <= since
+
+        return False
+
+    def _requested_range(self, request: Request, etag: str, last_modified: datetime) -> str | None:
+        byte_range = request.headers.get("Range")
+        if not byte_range or not byte_range.strip().lower().startswith("bytes="):
+            return None
+
+        # If-Range: диапазон отдается, только если у клиента та же версия файла, иначе весь файл
+        if_range = request.headers.get("If-Range")
+        if if_range is not None:
+            if_range = if_range.strip()
+            if if_range.startswith('"') or if_range.startswith("W/"):
+                if if_range != etag:
+                    return None
+            else:
+                since = self._parse_http_date(if_range)
+                if since is None or last_modified > since:
+                    return None
+
+        # Разбор диапазонов, в том числе нескольких, выполняет volume сервер
+        return byte_range
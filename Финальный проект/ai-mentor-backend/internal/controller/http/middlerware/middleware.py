@@ -15,8 +15,10 @@ class HttpMiddleware(interface.IHttpMiddleware):
     def __init__(
             self,
             tel: interface.ITelemetry,
+            db: interface.IDB,
             prefix: str,
     ):
+        self.db = db
         self.tracer = tel.tracer()
         self.meter = tel.meter()
         self.logger = tel.logger()
@@ -229,3 +231,13 @@ class HttpMiddleware(interface.IHttpMiddleware):
                 raise
 
         return _logger_middleware03
+
+    def db_consistency_middleware04(self, app: FastAPI):
+        @app.middleware("http")
+        async def _db_consistency_middleware04(request: Request, call_next: Callable):
+            # Обработчик идет в задаче с копией контекста, поэтому запись в нем
+            # закрепляет за primary и чтения, идущие после нее в том же запросе
+            with self.db.consistency_scope():
+                return await call_next(request)
+
+        return _db_consistency_middleware04
@@ -3,4 +3,5 @@ from internal.interface.chat.chat import *
 from internal.interface.edu.topic import *
 from internal.interface.account.account import *
 from internal.interface.general import *
-from internal.interface.client.llm import *
\ No newline at end of file
+from internal.interface.client.llm import *
+from internal.interface.migration.migration import *
@@ -1,5 +1,6 @@
 from abc import abstractmethod
-from typing import Protocol
+from contextlib import AbstractAsyncContextManager
+from typing import Protocol, AsyncIterator
 
 from internal.controller.http.handler.chat.model import *
 from internal import model, common
@@ -8,10 +9,18 @@ from internal import model, common
 class IChatController(Protocol):
     async def send_message_to_expert(self, body: SendMessageToExpert): pass
 
+    async def send_message_to_expert_stream(self, body: SendMessageToExpert): pass
+
+    async def get_chat_messages(self, chat_id: int, limit: int, cursor: str | None): pass
+
 
 class IChatService(Protocol):
     async def send_message_to_expert(self, student_id: int, text: str) -> tuple[str, list[common.Command]]: pass
 
+    def send_message_to_expert_stream(self, student_id: int, text: str) -> AsyncIterator[common.StreamEvent]: pass
+
+    async def get_messages_page(self, chat_id: int, limit: int, cursor: str | None) -> model.MessagePage: pass
+
 
 class IChatRepo(Protocol):
 
@@ -27,16 +36,104 @@ class IChatRepo(Protocol):
     @abstractmethod
     async def get_messages(self, chat_id: int) -> list[model.Message]: pass
 
+    @abstractmethod
+    async def get_recent_messages(self, chat_id: int, limit: int, before_id: int = common.MAX_MESSAGE_ID) -> list[model.Message]: pass
+
+    @abstractmethod
+    async def get_messages_range(
+            self,
+            chat_id: int,
+            after_id: int,
+            before_id: int,
+            limit: int
+    ) -> list[model.Message]: pass
+
+    @abstractmethod
+    async def update_chat_summary(self, chat_id: int, summary: str, summary_until_message_id: int): pass
+
+    @abstractmethod
+    async def get_turn_context(self, student_id: int, history_limit: int) -> model.TurnContext | None: pass
+
+
+class IMessagePartitionRepo(Protocol):
+    @abstractmethod
+    def lock_message_partitions(self) -> AbstractAsyncContextManager: pass
+
+    @abstractmethod
+    async def ensure_message_partitions(self, partition_size: int, partitions_ahead: int) -> list[str]: pass
+
+    @abstractmethod
+    async def archive_message_partitions(self, retention_days: int) -> list[str]: pass
+
+
+class IMessagePartitionMaintainer(Protocol):
+    @abstractmethod
+    async def maintain(self) -> tuple[list[str], list[str]]: pass
+
+    @abstractmethod
+    async def run(self) -> None: pass
+
+
+class IChatHistoryCache(Protocol):
+    @abstractmethod
+    async def get_messages(self, chat_id: int) -> list[model.Message] | None: pass
+
+    @abstractmethod
+    async def get_version(self, chat_id: int) -> int: pass
+
+    @abstractmethod
+    async def set_messages(self, chat_id: int, messages: list[model.Message], version: int) -> bool: pass
+
+    @abstractmethod
+    async def append_message(self, chat_id: int, message: model.Message): pass
+
+    @abstractmethod
+    async def get_chat_id(self, student_id: int) -> int | None: pass
+
+    @abstractmethod
+    async def set_chat_id(self, student_id: int, chat_id: int): pass
+
+
+class IResponseCache(Protocol):
+    @abstractmethod
+    def lookup(self, expert: str, chapter_id: int, question: str) -> str | None: pass
+
+    @abstractmethod
+    def store(self, expert: str, chapter_id: int, question: str, response: str): pass
+
+
+class IContentStore(Protocol):
+    @abstractmethod
+    async def select(
+            self,
+            content_file: common.ContentFile,
+            query: str,
+            token_budget: int
+    ) -> list[model.ContentSection]: pass
+
+
+class ICommandExecutor(Protocol):
+    @abstractmethod
+    async def execute(self, student: model.Student, commands: list[common.Command]): pass
+
+
+class IChatHistoryWindow(Protocol):
+    @abstractmethod
+    def assemble(self, turn_context: model.TurnContext) -> model.HistoryWindow: pass
+
 
 class IPromptGenerator(Protocol):
+    @abstractmethod
+    def get_prefix_hashes(self) -> dict[str, str]: pass
+
     @abstractmethod
     async def get_registrator_prompt(self) -> str: pass
 
     @abstractmethod
-    async def get_interview_expert_prompt(self, student_id: int) -> str: pass
+    async def get_interview_expert_prompt(self, turn_context: model.TurnContext) -> str: pass
 
     @abstractmethod
-    async def get_teacher_prompt(self, student_id: int) -> str: pass
+    async def get_teacher_prompt(self, turn_context: model.TurnContext) -> str: pass
 
     @abstractmethod
-    async def get_test_expert_prompt(self, student_id: int) -> str: pass
\ No newline at end of file
+    async def get_test_expert_prompt(self, turn_context: model.TurnContext) -> str: pass
\ No newline at end of file
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Protocol
+from typing import Protocol, AsyncIterator
 
 from internal import model
 
@@ -11,5 +11,16 @@ class ILLMClient(Protocol):
             system_prompt: str = "",
             temperature: float = 0.5,
             llm_model: str = "gpt-4o-mini",
-            base64img: str = None
+            base64img: str = None,
+            timeout: float = None,
     ) -> str: pass
+
+    @abstractmethod
+    def generate_stream(
+            self,
+            history: list[model.Message],
+            system_prompt: str = "",
+            temperature: float = 0.5,
+            llm_model: str = "gpt-4o-mini",
+            timeout: float = None,
+    ) -> AsyncIterator[str]: pass
@@ -34,3 +34,7 @@ class IStudentRepo(Protocol):
 
     @abstractmethod
     async def add_chapter_to_approved_chapters(self, student_id: int, chapter_id: int, chapter_name: str): pass
+
+
+    @abstractmethod
+    async def update_student_state(self, student_id: int, state: model.StudentStateUpdate): pass
@@ -1,25 +1,31 @@
 import io
 from abc import abstractmethod
+from datetime import datetime
 from typing import Protocol
 
-from internal import model
+from fastapi import Request
+
+from internal import model, common
 from internal.controller.http.handler.edu.topic.model import *
 
 
 class IEduTopicController(Protocol):
     @abstractmethod
-    async def download_topic_content(self, edu_content_type: str, topic_id: int): pass
+    async def download_topic_content(self, request: Request, edu_content_type: str, topic_id: int): pass
 
     @abstractmethod
-    async def download_block_content(self, block_id: int): pass
+    async def download_block_content(self, request: Request, block_id: int): pass
 
 
 class IEduTopicService(Protocol):
     @abstractmethod
-    async def download_topic_content(self, edu_content_type: str, topic_id: int) -> tuple[io.BytesIO, str]: pass
+    async def get_topic_content_file(self, edu_content_type: str, topic_id: int) -> common.ContentFile: pass
+
+    @abstractmethod
+    async def get_block_content_file(self, block_id: int) -> common.ContentFile: pass
 
     @abstractmethod
-    async def download_block_content(self, block_id: int) -> tuple[io.BytesIO, str]: pass
+    async def open_content_stream(self, content_file: common.ContentFile, byte_range: str = None) -> common.FileStream: pass
 
 
 class ITopicRepo(Protocol):
@@ -59,8 +65,36 @@ class ITopicRepo(Protocol):
     @abstractmethod
     async def get_all_chapter(self) -> list[model.Chapter]: pass
 
+    @abstractmethod
+    def get_catalog_version(self) -> int: pass
+
+    @abstractmethod
+    async def get_catalog_high_water_mark(self) -> tuple[datetime, int]: pass
+
+    @abstractmethod
+    async def get_content_sources(self) -> dict[str, tuple[str, str]]: pass
+
+    @abstractmethod
+    async def upsert_content_sources(self, topics: list[model.TopicSource]) -> int: pass
+
     @abstractmethod
     async def upload_file(self, file: io.BytesIO, file_name: str) -> str: pass
 
     @abstractmethod
     async def download_file(self, file_id: str, file_name: str) -> tuple[io.BytesIO, str]: pass
+
+    @abstractmethod
+    async def open_file_stream(self, file_id: str, file_name: str, byte_range: str = None) -> common.FileStream: pass
+
+
+class IEduContentIngestService(Protocol):
+    @abstractmethod
+    async def ingest(self, root: str) -> model.IngestStats: pass
+
+
+class IEduCatalog(Protocol):
+    @abstractmethod
+    async def get_content_metadata(self) -> str: pass
+
+    @abstractmethod
+    def invalidate(self): pass
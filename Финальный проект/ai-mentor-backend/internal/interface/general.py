@@ -1,11 +1,13 @@
 import io
 from abc import abstractmethod
-from typing import Protocol, Sequence, Any
+from contextlib import AbstractContextManager, AbstractAsyncContextManager
+from typing import Protocol, Sequence, Any, Awaitable, Callable
 
 from fastapi import FastAPI
 from opentelemetry.metrics import Meter
 from opentelemetry.trace import Tracer
-from weed.util import WeedOperationResponse
+
+from internal import common
 
 
 class IOtelLogger(Protocol):
@@ -50,6 +52,9 @@ class IHttpMiddleware(Protocol):
     @abstractmethod
     def logger_middleware03(self, app: FastAPI): pass
 
+    @abstractmethod
+    def db_consistency_middleware04(self, app: FastAPI): pass
+
 
 class IRedis(Protocol):
     @abstractmethod
@@ -58,18 +63,53 @@ class IRedis(Protocol):
     @abstractmethod
     async def get(self, key: str, default: Any = None) -> Any: pass
 
+    @abstractmethod
+    async def list_get(self, key: str) -> list[Any] | None: pass
+
+    @abstractmethod
+    async def list_set(self, key: str, values: list[Any], ttl: int = None): pass
+
+    @abstractmethod
+    async def list_set_if_version(
+            self,
+            key: str,
+            values: list[Any],
+            version_key: str,
+            version: int,
+            ttl: int = None
+    ) -> bool: pass
+
+    @abstractmethod
+    async def list_append(
+            self,
+            key: str,
+            value: Any,
+            max_len: int = None,
+            ttl: int = None,
+            version_key: str = None
+    ) -> bool: pass
+
+    @abstractmethod
+    async def get_int(self, key: str) -> int: pass
+
+    @abstractmethod
+    async def delete(self, key: str): pass
+
 class IStorage(Protocol):
     @abstractmethod
-    def delete(self, fid: str, name: str): pass
+    async def delete(self, fid: str, name: str): pass
+
+    @abstractmethod
+    async def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]: pass
 
     @abstractmethod
-    def download(self, fid: str, name: str) -> tuple[io.BytesIO, str]: pass
+    async def open_stream(self, fid: str, name: str, byte_range: str = None) -> common.FileStream: pass
 
     @abstractmethod
-    def upload(self, file: io.BytesIO, name: str) -> WeedOperationResponse: pass
+    async def upload(self, file: io.BytesIO, name: str) -> common.StoredFile: pass
 
     @abstractmethod
-    def update(self, file: io.BytesIO, fid: str, name: str): pass
+    async def update(self, file: io.BytesIO, fid: str, name: str) -> common.StoredFile: pass
 
 
 class IDB(Protocol):
@@ -88,3 +128,18 @@ class IDB(Protocol):
 
     @abstractmethod
     async def multi_query(self, queries: list[str]) -> None: pass
+
+    @abstractmethod
+    async def execute_outside_transaction(self, query: str, statement_timeout: int | None = None) -> None: pass
+
+    @abstractmethod
+    def advisory_lock(self, key: int, poll_interval: float = 1) -> AbstractAsyncContextManager: pass
+
+    @abstractmethod
+    def consistency_scope(self) -> AbstractContextManager: pass
+
+    @abstractmethod
+    def transaction(self) -> AbstractAsyncContextManager: pass
+
+    @abstractmethod
+    async def on_commit(self, callback: Callable[[], Awaitable[None]]) -> None: pass
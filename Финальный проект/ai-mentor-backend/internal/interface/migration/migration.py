@@ -0,0 +1,21 @@
+from abc import abstractmethod
+from contextlib import AbstractAsyncContextManager
+from typing import Protocol
+
+from internal import model
+
+
+class IMigrationRepo(Protocol):
+    @abstractmethod
+    def lock(self) -> AbstractAsyncContextManager: pass
+
+    @abstractmethod
+    async def get_applied_versions(self) -> set[int]: pass
+
+    @abstractmethod
+    async def apply(self, migration: model.Migration) -> None: pass
+
+
+class IMigrationService(Protocol):
+    @abstractmethod
+    async def migrate(self) -> list[model.Migration]: pass
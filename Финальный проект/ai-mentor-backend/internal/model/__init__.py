@@ -1,5 +1,7 @@
 from internal.model.edu.topic import *
 from internal.model.edu.student import *
+from internal.model.edu.ingest import *
 from internal.model.chat.chat import *
 from internal.model.account.account import *
+from internal.model.migration.migration import *
 from internal.model.sql_model import *
\ No newline at end of file
@@ -1,12 +1,19 @@
 from dataclasses import dataclass, field
 from datetime import datetime
 
+from internal.model.edu.student import Student
+from internal.model.edu.topic import Block, Chapter
+
 @dataclass
 class Chat:
     id: int
 
     student_id: int
 
+    # Краткое содержание сообщений с id <= summary_until_message_id
+    summary: str = ""
+    summary_until_message_id: int = 0
+
     created_at: datetime = field(default_factory=datetime.now)
     updated_at: datetime = field(default_factory=datetime.now)
 
@@ -16,6 +23,8 @@ class Chat:
             cls(
                 id=row.id,
                 student_id=row.student_id,
+                summary=row.summary or "",
+                summary_until_message_id=row.summary_until_message_id or 0,
                 created_at=row.created_at,
                 updated_at=row.updated_at,
             )
@@ -46,4 +55,50 @@ class Message:
                 updated_at=row.updated_at,
             )
             for row in rows
-        ]
\ No newline at end of file
+        ]
+
+
+@dataclass
+class MessagePage:
+    """Страница истории чата в хронологическом порядке и курсор на более старые сообщения"""
+    messages: list[Message]
+    next_cursor: str | None = None
+
+
+@dataclass
+class MessagePartition:
+    """Партиция messages по диапазону id, None у границы — MINVALUE/MAXVALUE"""
+    name: str
+    lower: int | None
+    upper: int | None
+    detach_pending: bool = False
+
+
+@dataclass
+class TurnContext:
+    """Все, что нужно для одного хода диалога, загруженное одним запросом к БД"""
+    student: Student
+    chat: Chat
+    current_block: Block | None = None
+    current_chapter: Chapter | None = None
+    messages: list[Message] = field(default_factory=list)
+    # Текст текущего сообщения студента, по нему выбираются разделы главы для промпта
+    query: str = ""
+
+
+@dataclass
+class HistoryWindow:
+    """Ограниченное окно истории, которое уходит в LLM"""
+    messages: list[Message]
+    summary: str = ""
+    token_count: int = 0
+
+
+@dataclass
+class ContentSection:
+    """Раздел markdown документа между заголовками с заранее посчитанными токенами и термами"""
+    position: int
+    heading: str
+    text: str
+    token_count: int
+    terms: frozenset[str]
@@ -0,0 +1,52 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SourceFile:
+    """Файл базы знаний, подготовленный к загрузке"""
+    # Путь относительно корня базы знаний, по нему строки находятся при повторных запусках
+    path: str
+    name: str
+    content: bytes
+    content_hash: str
+    file_id: str | None = None
+
+
+@dataclass
+class BlockSource:
+    path: str
+    name: str
+    content: SourceFile
+    chapters: list[SourceFile] = field(default_factory=list)
+
+
+@dataclass
+class TopicSource:
+    path: str
+    name: str
+    intro: SourceFile
+    edu_plan: SourceFile
+    blocks: list[BlockSource] = field(default_factory=list)
+
+
+@dataclass
+class IngestStats:
+    topics: int = 0
+    blocks: int = 0
+    chapters: int = 0
+    files: int = 0
+    uploaded_files: int = 0
+    skipped_files: int = 0
+    uploaded_bytes: int = 0
+    changed_rows: int = 0
+    duration: float = 0.0
+
+    def __str__(self) -> str:
+        duration = self.duration or 1e-9
+        return (
+            f"Темы: {self.topics}, блоки: {self.blocks}, главы: {self.chapters}\n"
+            f"Файлы: {self.files}, загружено: {self.uploaded_files}, без изменений: {self.skipped_files}\n"
+            f"Изменено строк: {self.changed_rows}\n"
+            f"Время: {self.duration:.2f} с, {self.files / duration:.1f} файлов/с, "
+            f"{self.uploaded_bytes / duration / 1024 / 1024:.2f} МБ/с загрузки"
+        )
@@ -78,3 +78,34 @@ class Student:
             )
             for row in rows
         ]
+
+
+
+@dataclass
+class StudentStateUpdate:
+    """Изменения состояния студента, накопленные за один ответ LLM и применяемые одним UPDATE"""
+    current_expert: str = None
+    # (id, name)
+    current_topic: tuple[int, str] = None
+    current_block: tuple[int, str] = None
+    current_chapter: tuple[int, str] = None
+
+    # Поля из update_student_background, None — не менять
+    background: dict = field(default_factory=dict)
+
+    # {id: name}, дописываются к уже изученным
+    approved_topics: dict[int, str] = field(default_factory=dict)
+    approved_blocks: dict[int, str] = field(default_factory=dict)
+    approved_chapters: dict[int, str] = field(default_factory=dict)
+
+    def is_empty(self) -> bool:
+        return (
+                self.current_expert is None
+                and self.current_topic is None
+                and self.current_block is None
+                and self.current_chapter is None
+                and not self.background
+                and not self.approved_topics
+                and not self.approved_blocks
+                and not self.approved_chapters
+        )
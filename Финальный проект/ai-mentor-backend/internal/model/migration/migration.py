@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    queries: list[str]
+    # CREATE/DROP INDEX CONCURRENTLY нельзя выполнить внутри транзакции: такие миграции
+    # идут по одному выражению в autocommit, поэтому каждое выражение должно быть повторяемым
+    transactional: bool = True
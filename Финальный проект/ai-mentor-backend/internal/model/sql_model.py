@@ -1,4 +1,6 @@
-create_queries = [
+from internal.model.migration.migration import Migration
+
+initial_schema_queries = [
     """
     CREATE TABLE IF NOT EXISTS accounts (
         id SERIAL PRIMARY KEY,
@@ -100,12 +102,147 @@ create_queries = [
     "CREATE INDEX IF NOT EXISTS idx_accounts_login ON accounts(login);"
 ]
 
-drop_queries = [
-    "DROP TABLE IF EXISTS messages CASCADE;",
-    "DROP TABLE IF EXISTS chats CASCADE;",
-    "DROP TABLE IF EXISTS chapters CASCADE;",
-    "DROP TABLE IF EXISTS blocks CASCADE;",
-    "DROP TABLE IF EXISTS topics CASCADE;",
-    "DROP TABLE IF EXISTS students CASCADE;",
-    "DROP TABLE IF EXISTS accounts CASCADE;"
-]
\ No newline at end of file
+chat_summary_queries = [
+    # Краткое содержание истории за пределами окна. В базах, созданных через /table/create,
+    # таблица chats уже есть без этих колонок, поэтому они добавляются отдельно
+    "ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary TEXT DEFAULT '';",
+    "ALTER TABLE chats ADD COLUMN IF NOT EXISTS summary_until_message_id INTEGER DEFAULT 0;",
+]
+
+knowledge_base_source_queries = [
+    # Колонки для повторной загрузки базы знаний. В базах, созданных до миграций, они могут уже быть
+    "ALTER TABLE topics ADD COLUMN IF NOT EXISTS source_path VARCHAR(512);",
+    "ALTER TABLE topics ADD COLUMN IF NOT EXISTS intro_hash VARCHAR(64);",
+    "ALTER TABLE topics ADD COLUMN IF NOT EXISTS edu_plan_hash VARCHAR(64);",
+    "ALTER TABLE blocks ADD COLUMN IF NOT EXISTS source_path VARCHAR(512);",
+    "ALTER TABLE blocks ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);",
+    "ALTER TABLE chapters ADD COLUMN IF NOT EXISTS source_path VARCHAR(512);",
+    "ALTER TABLE chapters ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);",
+    """
+    CREATE TABLE IF NOT EXISTS content_objects (
+        content_hash VARCHAR(64) PRIMARY KEY,
+        file_id VARCHAR(255) NOT NULL,
+        size BIGINT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_topics_source_path ON topics(source_path);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_blocks_source_path ON blocks(source_path);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_chapters_source_path ON chapters(source_path);"
+]
+
+def messages_id_bound_queries(partition_size: int) -> list[str]:
+    """Будущая верхняя граница первой партиции как CHECK, проверенный без блокировки записи.
+
+    Граница берется с запасом в partition_size от текущего значения последовательности:
+    пока не применена следующая миграция, вставки продолжают идти в старую таблицу.
+    """
+    return [
+        f"""
+        DO $$
+        DECLARE
+            upper_bound BIGINT;
+        BEGIN
+            SELECT COALESCE(pg_sequence_last_value('messages_id_seq'), 0) + 1 + {int(partition_size)}
+            INTO upper_bound;
+            ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_p0_id_bound;
+            -- NOT VALID не читает таблицу, блокировка на время добавления ограничения короткая
+            EXECUTE format(
+                'ALTER TABLE messages ADD CONSTRAINT messages_p0_id_bound CHECK (id IS NOT NULL AND id < %s) NOT VALID',
+                upper_bound
+            );
+        END
+        $$;
+        """,
+        # Проверка строк идет под SHARE UPDATE EXCLUSIVE: чтение и запись в messages продолжаются
+        "ALTER TABLE messages VALIDATE CONSTRAINT messages_p0_id_bound;",
+    ]
+
+
+partition_messages_queries = [
+    "LOCK TABLE messages IN ACCESS EXCLUSIVE MODE;",
+    "ALTER TABLE messages RENAME TO messages_p0;",
+    "ALTER INDEX messages_pkey RENAME TO messages_p0_pkey;",
+    "ALTER INDEX idx_messages_chat_id_id RENAME TO messages_p0_chat_id_id_idx;",
+    # Ключ партиционирования — id: все запросы истории идут по (chat_id, id), и диапазоны id
+    # отсекаются keyset-условиями, а порядок партиций совпадает с порядком записи
+    """
+    CREATE TABLE messages (
+        id INTEGER NOT NULL DEFAULT nextval('messages_id_seq'),
+        chat_id INTEGER REFERENCES chats(id) ON DELETE CASCADE,
+        role VARCHAR(50) NOT NULL,
+        text TEXT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        PRIMARY KEY (id),
+        -- Имя как у старой таблицы: ATTACH требует у партиции CHECK с тем же именем
+        CONSTRAINT messages_role_check CHECK (role IN ('user', 'assistant', 'system'))
+    ) PARTITION BY RANGE (id);
+    """,
+    "CREATE INDEX idx_messages_chat_id_id ON messages(chat_id, id);",
+    "ALTER SEQUENCE messages_id_seq OWNED BY messages.id;",
+    # Старая таблица становится первой партицией без копирования: ее индексы совпадают с индексами
+    # родителя и подключаются как есть. Граница берется из проверенного messages_p0_id_bound, поэтому
+    # ATTACH под ACCESS EXCLUSIVE не сканирует таблицу. Запаса до границы хватает на вставки сразу
+    # после миграции, следующие партиции создает ChatRepo.ensure_message_partitions
+    """
+    DO $$
+    DECLARE
+        upper_bound BIGINT;
+    BEGIN
+        SELECT (regexp_match(pg_get_constraintdef(oid), 'id < ([0-9]+)'))[1]::BIGINT INTO upper_bound
+        FROM pg_constraint
+        WHERE conrelid = 'messages_p0'::regclass AND conname = 'messages_p0_id_bound';
+        EXECUTE format(
+            'ALTER TABLE messages ATTACH PARTITION messages_p0 FOR VALUES FROM (MINVALUE) TO (%s)',
+            upper_bound
+        );
+    END
+    $$;
+    """,
+    # После ATTACH то же условие задает граница партиции
+    "ALTER TABLE messages_p0 DROP CONSTRAINT messages_p0_id_bound;",
+]
+
+def build_migrations(messages_partition_size: int) -> list[Migration]:
+    """Миграции схемы, messages_partition_size задает запас первой партиции messages.
+
+    Версии только добавляются: примененную миграцию не меняют, а исправляют следующей.
+    """
+    return [
+        Migration(1, "initial_schema", initial_schema_queries),
+        Migration(2, "legacy_schema_columns", chat_summary_queries + knowledge_base_source_queries),
+        Migration(
+            3,
+            "chat_history_indexes",
+            [
+                # Недостроенный после сбоя CONCURRENTLY индекс остается INVALID, поэтому строим заново
+                "DROP INDEX CONCURRENTLY IF EXISTS idx_chats_student_id_created_at;",
+                # Последний чат студента (get_chat_by_student_id, get_turn_context) без сортировки
+                "CREATE INDEX CONCURRENTLY idx_chats_student_id_created_at ON chats(student_id, created_at DESC);",
+                "DROP INDEX CONCURRENTLY IF EXISTS idx_messages_chat_id_id;",
+                # Keyset-выборки истории по (chat_id, id). messages — самая большая таблица,
+                # обычный CREATE INDEX держал бы запись в нее на все время построения
+                "CREATE INDEX CONCURRENTLY idx_messages_chat_id_id ON messages(chat_id, id);",
+            ],
+            transactional=False
+        ),
+        Migration(
+            4,
+            "drop_redundant_indexes",
+            [
+                # Покрыты префиксом составных индексов и уникальным ограничением accounts.login
+                "DROP INDEX CONCURRENTLY IF EXISTS idx_chats_student_id;",
+                "DROP INDEX CONCURRENTLY IF EXISTS idx_messages_chat_id;",
+                "DROP INDEX CONCURRENTLY IF EXISTS idx_accounts_login;",
+            ],
+            transactional=False
+        ),
+        Migration(
+            5,
+            "messages_p0_id_bound",
+            messages_id_bound_queries(messages_partition_size),
+            transactional=False
+        ),
+        Migration(6, "partition_messages_by_id", partition_messages_queries),
+    ]
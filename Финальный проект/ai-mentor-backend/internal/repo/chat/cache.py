@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from datetime import datetime
+
+from internal import model
+from internal import interface
+
+
+class LRUChatHistoryCache(interface.IChatHistoryCache):
+    """Кэш истории чатов в памяти процесса.
+
+    Для каждого чата хранится не больше max_messages последних сообщений,
+    всего в кэше не больше max_chats чатов, вытесняются давно не использованные.
+    Версия чата — номер его последнего append_message из общего счетчика. У вытесненной
+    версии чата get_version возвращает максимум вытесненных, поэтому версия никогда не откатывается.
+    """
+
+    def __init__(self, max_chats: int, max_messages: int):
+        self.max_chats = max_chats
+        self.max_messages = max_messages
+
+        self._messages: OrderedDict[int, list[model.Message]] = OrderedDict()
+        self._chat_ids: OrderedDict[int, int] = OrderedDict()
+        self._versions: OrderedDict[int, int] = OrderedDict()
+        self._version_seq = 0
+        self._evicted_version = 0
+
+    async def get_messages(self, chat_id: int) -> list[model.Message] | None:
+        messages = self._messages.get(chat_id)
+        if messages is None:
+            return None
+
+        self._messages.move_to_end(chat_id)
+        return list(messages)
+
+    async def get_version(self, chat_id: int) -> int:
+        return self._versions.get(chat_id, self._evicted_version)
+
+    async def set_messages(self, chat_id: int, messages: list[model.Message], version: int) -> bool:
+        # Пока читали снимок из БД, в чат дописали сообщение: снимок его не содержит
+        if await self.get_version(chat_id) != version:
+            return False
+
+        self._messages[chat_id] = list(messages[-self.max_messages:])
+        self._messages.move_to_end(chat_id)
+        self._evict(self._messages)
+        return True
+
+    async def append_message(self, chat_id: int, message: model.Message):
+        self._version_seq += 1
+        self._versions[chat_id] = self._version_seq
+        self._versions.move_to_end(chat_id)
+        while len(self._versions) > self.max_chats:
+            _, evicted_version = self._versions.popitem(last=False)
+            self._evicted_version = max(self._evicted_version, evicted_version)
+
+        # Если истории чата нет в кэше, ее загрузят из БД при следующем чтении
+        messages = self._messages.get(chat_id)
+        if messages is None:
+            return
+
+        messages.append(message)
+        del messages[:-self.max_messages]
+
+    async def get_chat_id(self, student_id: int) -> int | None:
+        chat_id = self._chat_ids.get(student_id)
+        if chat_id is not None:
+            self._chat_ids.move_to_end(student_id)
+        return chat_id
+
+    async def set_chat_id(self, student_id: int, chat_id: int):
+        self._chat_ids[student_id] = chat_id
+        self._chat_ids.move_to_end(student_id)
+        self._evict(self._chat_ids)
+
+    def _evict(self, items: OrderedDict):
+        while len(items) > self.max_chats:
+            items.popitem(last=False)
+
+
+class RedisChatHistoryCache(interface.IChatHistoryCache):
+    """Кэш истории чатов в Redis, общий для всех воркеров.
+
+    История чата хранится списком JSON-сообщений, новые сообщения дописываются RPUSHX,
+    поэтому запись в кэш не создает неполную историю для чата, которого в кэше нет.
+    Каждое дописывание увеличивает счетчик версии чата, снимок из БД заменяет список
+    только при неизменной версии (WATCH).
+    """
+
+    def __init__(self, redis: interface.IRedis, ttl: int, max_messages: int):
+        self.redis = redis
+        self.ttl = ttl
+        self.max_messages = max_messages
+
+    async def get_messages(self, chat_id: int) -> list[model.Message] | None:
+        items = await self.redis.list_get(self._messages_key(chat_id))
+        if items is None:
+            return None
+
+        # Воркеры дописывают сообщения независимо, порядок восстанавливаем по id
+        messages = [self._to_message(item) for item in items]
+        messages.sort(key=lambda message: message.id)
+        return messages
+
+    async def get_version(self, chat_id: int) -> int:
+        return await self.redis.get_int(self._version_key(chat_id))
+
+    async def set_messages(self, chat_id: int, messages: list[model.Message], version: int) -> bool:
+        return await self.redis.list_set_if_version(
+            self._messages_key(chat_id),
+            [self._to_item(message) for message in messages[-self.max_messages:]],
+            self._version_key(chat_id),
+            version,
+            self.ttl
+        )
+
+    async def append_message(self, chat_id: int, message: model.Message):
+        await self.redis.list_append(
+            self._messages_key(chat_id),
+            self._to_item(message),
+            self.max_messages,
+            self.ttl,
+            self._version_key(chat_id)
+        )
+
+    async def get_chat_id(self, student_id: int) -> int | None:
+        chat_id = await self.redis.get(self._chat_id_key(student_id))
+        return int(chat_id) if chat_id is not None else None
+
+    async def set_chat_id(self, student_id: int, chat_id: int):
+        await self.redis.set(self._chat_id_key(student_id), chat_id, self.ttl)
+
+    @staticmethod
+    def _messages_key(chat_id: int) -> str:
+        return f"chat:{chat_id}:messages"
+
+    @staticmethod
+    def _version_key(chat_id: int) -> str:
+        return f"chat:{chat_id}:version"
+
+    @staticmethod
+    def _chat_id_key(student_id: int) -> str:
+        return f"student:{student_id}:chat_id"
+
+    @staticmethod
+    def _to_item(message: model.Message) -> dict:
+        return {
+            "id": message.id,
+            "chat_id": message.chat_id,
+            "text": message.text,
+            "role": message.role,
+            "created_at": message.created_at.isoformat(),
+            "updated_at": message.updated_at.isoformat(),
+        }
+
+    @staticmethod
+    def _to_message(item: dict) -> model.Message:
+        return model.Message(
+            id=item["id"],
+            chat_id=item["chat_id"],
+            text=item["text"],
+            role=item["role"],
+            created_at=datetime.fromisoformat(item["created_at"]),
+            updated_at=datetime.fromisoformat(item["updated_at"]),
+        )
@@ -0,0 +1,255 @@
+from datetime import datetime, timezone
+
+from opentelemetry.trace import SpanKind, StatusCode
+
+from internal import model
+from internal import interface
+from internal import common
+
+
+class CachedChatRepo(interface.IChatRepo):
+    """Write-through кэш истории чатов поверх ChatRepo.
+
+    Источник правды — Postgres: новые сообщения сначала пишутся в БД, затем дописываются в кэш.
+    Внутри IDB.transaction() кэш обновляется только после commit, откаченные записи в него не попадают.
+    В кэше лежат не больше max_messages последних сообщений чата; если их меньше max_messages,
+    значит в кэше вся история и полную выборку тоже можно отдать без БД.
+    Снимок, прочитанный из БД при промахе, кладется в кэш только если версия чата в кэше
+    не изменилась за время чтения: иначе он мог пропустить параллельно дописанное сообщение.
+    Ошибки кэша не ломают запрос, чтение в этом случае идет из Postgres.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            db: interface.IDB,
+            chat_repo: interface.IChatRepo,
+            cache: interface.IChatHistoryCache,
+            max_messages: int,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.db = db
+        self.chat_repo = chat_repo
+        self.cache = cache
+        self.max_messages = max_messages
+
+        meter = tel.meter()
+        self.hit_counter = meter.create_counter(
+            name=common.CHAT_HISTORY_CACHE_HIT_METRIC,
+            description="Total count of chat history reads served from cache",
+            unit="1"
+        )
+        self.miss_counter = meter.create_counter(
+            name=common.CHAT_HISTORY_CACHE_MISS_METRIC,
+            description="Total count of chat history reads served from Postgres",
+            unit="1"
+        )
+
+    async def create_chat(self, student_id: int) -> int:
+        chat_id = await self.chat_repo.create_chat(student_id)
+
+        async def publish_empty_history():
+            # Сообщения той же транзакции допишутся следующими хуками, уже после пустой истории
+            version = await self._safe(self.cache.get_version(chat_id))
+            await self._publish(chat_id, [], version)
+
+        await self.db.on_commit(publish_empty_history)
+        return chat_id
+
+    async def get_chat_by_student_id(self, student_id: int) -> list[model.Chat]:
+        return await self.chat_repo.get_chat_by_student_id(student_id)
+
+    async def create_message(self, chat_id: int, role: str, text: str):
+        message_id = await self.chat_repo.create_message(chat_id, role, text)
+
+        # Время как у строк из БД — с часовым поясом, иначе в истории смешаются два формата
+        now = datetime.now(timezone.utc)
+        message = model.Message(
+            id=message_id,
+            chat_id=chat_id,
+            text=text,
+            role=role,
+            created_at=now,
+            updated_at=now
+        )
+        await self.db.on_commit(lambda: self._safe(self.cache.append_message(chat_id, message)))
+        return message_id
+
+    async def get_messages(self, chat_id: int) -> list[model.Message]:
+        with self.tracer.start_as_current_span(
+                "CachedChatRepo.get_messages",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "chat_id": chat_id,
+                }
+        ) as span:
+            try:
+                cached = await self._get_cached(chat_id)
+                if cached is not None and self._is_complete(cached):
+                    self._hit(span, "get_messages")
+                    return cached
+
+                self._miss(span, "get_messages")
+                version = await self._safe(self.cache.get_version(chat_id))
+                messages = await self.chat_repo.get_messages(chat_id)
+                await self._publish(chat_id, messages, version)
+
+                span.set_status(StatusCode.OK)
+                return messages
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def get_recent_messages(
+            self,
+            chat_id: int,
+            limit: int,
+            before_id: int = common.MAX_MESSAGE_ID
+    ) -> list[model.Message]:
+        with self.tracer.start_as_current_span(
+                "CachedChatRepo.get_recent_messages",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "chat_id": chat_id,
+                    "limit": limit,
+                    "before_id": before_id,
+                }
+        ) as span:
+            try:
+                cached = await self._get_cached(chat_id)
+                if cached is None:
+                    cached = await self._load(chat_id)
+                    self._miss(span, "get_recent_messages")
+                else:
+                    self._hit(span, "get_recent_messages")
+
+                messages = [message for message in cached if message.id < before_id]
+                if len(messages) < limit and not self._is_complete(cached):
+                    # Запрошено глубже, чем хранится в кэше
+                    span.set_status(StatusCode.OK)
+                    return await self.chat_repo.get_recent_messages(chat_id, limit, before_id)
+
+                span.set_status(StatusCode.OK)
+                return messages[-limit:] if limit else []
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def get_messages_range(
+            self,
+            chat_id: int,
+            after_id: int,
+            before_id: int,
+            limit: int
+    ) -> list[model.Message]:
+        with self.tracer.start_as_current_span(
+                "CachedChatRepo.get_messages_range",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "chat_id": chat_id,
+                    "after_id": after_id,
+                    "before_id": before_id,
+                }
+        ) as span:
+            try:
+                cached = await self._get_cached(chat_id)
+                # В кэше непрерывный хвост истории: диапазон в нем целиком, если хвост начинается не позже after_id
+                if cached is not None and (self._is_complete(cached) or cached[0].id <= after_id):
+                    self._hit(span, "get_messages_range")
+                    return [message for message in cached if after_id < message.id < before_id][:limit]
+
+                self._miss(span, "get_messages_range")
+                messages = await self.chat_repo.get_messages_range(chat_id, after_id, before_id, limit)
+
+                span.set_status(StatusCode.OK)
+                return messages
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def update_chat_summary(self, chat_id: int, summary: str, summary_until_message_id: int):
+        await self.chat_repo.update_chat_summary(chat_id, summary, summary_until_message_id)
+
+    async def get_turn_context(self, student_id: int, history_limit: int) -> model.TurnContext | None:
+        with self.tracer.start_as_current_span(
+                "CachedChatRepo.get_turn_context",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "student_id": student_id,
+                    "history_limit": history_limit,
+                }
+        ) as span:
+            try:
+                chat_id = await self._safe(self.cache.get_chat_id(student_id))
+                cached = await self._get_cached(chat_id) if chat_id is not None else None
+                version = await self._safe(self.cache.get_version(chat_id)) if chat_id is not None else None
+
+                if cached is not None and (len(cached) >= history_limit or self._is_complete(cached)):
+                    # История есть в кэше: из БД берем только студента, чат и текущие блок/главу
+                    turn_context = await self.chat_repo.get_turn_context(student_id, 0)
+                    if turn_context is not None and turn_context.chat.id == chat_id:
+                        turn_context.messages = cached[-history_limit:] if history_limit else []
+                        self._hit(span, "get_turn_context")
+                        return turn_context
+
+                self._miss(span, "get_turn_context")
+                # Загружаем с запасом до max_messages, чтобы положить в кэш полный хвост истории
+                turn_context = await self.chat_repo.get_turn_context(
+                    student_id,
+                    max(history_limit, self.max_messages)
+                )
+                if turn_context is None:
+                    span.set_status(StatusCode.OK)
+                    return None
+
+                await self._safe(self.cache.set_chat_id(student_id, turn_context.chat.id))
+                # Версию чата, неизвестного до чтения, взять было не у кого: историю загрузит следующий промах
+                if turn_context.chat.id == chat_id:
+                    await self._publish(chat_id, turn_context.messages, version)
+
+                turn_context.messages = turn_context.messages[-history_limit:] if history_limit else []
+
+                span.set_status(StatusCode.OK)
+                return turn_context
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def _load(self, chat_id: int) -> list[model.Message]:
+        version = await self._safe(self.cache.get_version(chat_id))
+        messages = await self.chat_repo.get_recent_messages(chat_id, self.max_messages)
+        await self._publish(chat_id, messages, version)
+        return messages
+
+    async def _publish(self, chat_id: int, messages: list[model.Message], version: int | None):
+        # Без версии (кэш недоступен) снимок не публикуем: нельзя проверить, что он не устарел
+        if version is not None:
+            await self._safe(self.cache.set_messages(chat_id, messages, version))
+
+    async def _get_cached(self, chat_id: int) -> list[model.Message] | None:
+        return await self._safe(self.cache.get_messages(chat_id))
+
+    def _is_complete(self, cached: list[model.Message]) -> bool:
+        # Хвост обрезается до max_messages, поэтому короткий список — это вся история чата
+        return len(cached) < self.max_messages
+
+    def _hit(self, span, operation: str):
+        span.set_attribute("cache.hit", True)
+        span.set_status(StatusCode.OK)
+        self.hit_counter.add(1, {"operation": operation})
+
+    def _miss(self, span, operation: str):
+        span.set_attribute("cache.hit", False)
+        self.miss_counter.add(1, {"operation": operation})
+
+    async def _safe(self, coro):
+        try:
+            return await coro
+        except Exception as err:
+            self.logger.warning(f"Ошибка кэша истории чата: {err}")
+            return None
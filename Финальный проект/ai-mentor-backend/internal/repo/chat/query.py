@@ -5,7 +5,7 @@ RETURNING id;
 """
 
 get_chat_by_student_id = """
-SELECT id, student_id, created_at, updated_at
+SELECT id, student_id, summary, summary_until_message_id, created_at, updated_at
 FROM chats
 WHERE student_id = :student_id
 ORDER BY created_at DESC
@@ -13,7 +13,7 @@ LIMIT 1;
 """
 
 get_chat_by_id = """
-SELECT id, student_id, created_at, updated_at
+SELECT id, student_id, summary, summary_until_message_id, created_at, updated_at
 FROM chats
 WHERE id = :chat_id;
 """
@@ -28,7 +28,30 @@ get_messages_by_chat_id = """
 SELECT id, chat_id, text, role, created_at, updated_at
 FROM messages
 WHERE chat_id = :chat_id
-ORDER BY created_at ASC;
+ORDER BY id ASC;
+"""
+
+# Keyset-выборка по (chat_id, id): последние :limit сообщений до :before_id
+get_recent_messages = """
+SELECT id, chat_id, text, role, created_at, updated_at
+FROM messages
+WHERE chat_id = :chat_id AND id < :before_id
+ORDER BY id DESC
+LIMIT :limit;
+"""
+
+get_messages_range = """
+SELECT id, chat_id, text, role, created_at, updated_at
+FROM messages
+WHERE chat_id = :chat_id AND id > :after_id AND id < :before_id
+ORDER BY id ASC
+LIMIT :limit;
+"""
+
+update_chat_summary = """
+UPDATE chats
+SET summary = :summary, summary_until_message_id = :summary_until_message_id, updated_at = NOW()
+WHERE id = :chat_id;
 """
 
 get_message_by_id = """
@@ -45,4 +68,120 @@ WHERE id = :chat_id;
 delete_message = """
 DELETE FROM messages
 WHERE id = :message_id;
-"""
\ No newline at end of file
+"""
+
+# Контекст хода диалога за один запрос: студент, последний чат (создается при отсутствии),
+# текущие блок и глава, последние :history_limit сообщений
+get_turn_context = """
+WITH student AS (
+    SELECT
+        id, account_id, current_expert, current_topic, current_block, current_chapter,
+        programming_experience, education_background, learning_goals, career_goals, timeline,
+        learning_style, lesson_duration, preferred_difficulty, recommended_topics, recommended_blocks,
+        approved_topics, approved_blocks, approved_chapters, assessment_score, strong_areas, weak_areas,
+        created_at, updated_at
+    FROM students
+    WHERE id = :student_id
+),
+latest_chat AS (
+    SELECT id, student_id, summary, summary_until_message_id, created_at, updated_at
+    FROM chats
+    WHERE student_id = :student_id
+    ORDER BY created_at DESC
+    LIMIT 1
+),
+new_chat AS (
+    INSERT INTO chats (student_id, created_at, updated_at)
+    SELECT id, NOW(), NOW()
+    FROM student
+    WHERE NOT EXISTS (SELECT 1 FROM latest_chat)
+    RETURNING id, student_id, summary, summary_until_message_id, created_at, updated_at
+),
+chat AS (
+    SELECT id, student_id, summary, summary_until_message_id, created_at, updated_at FROM latest_chat
+    UNION ALL
+    SELECT id, student_id, summary, summary_until_message_id, created_at, updated_at FROM new_chat
+),
+current_block AS (
+    SELECT id, topic_id, name, content_file_id, created_at, updated_at
+    FROM blocks
+    WHERE id = (
+        SELECT block_key::int
+        FROM student, jsonb_object_keys(student.current_block) AS block_key
+        WHERE block_key ~ '^[0-9]+$'
+        LIMIT 1
+    )
+),
+current_chapter AS (
+    SELECT id, topic_id, block_id, name, content_file_id, created_at, updated_at
+    FROM chapters
+    WHERE id = (
+        SELECT chapter_key::int
+        FROM student, jsonb_object_keys(student.current_chapter) AS chapter_key
+        WHERE chapter_key ~ '^[0-9]+$'
+        LIMIT 1
+    )
+),
+history AS (
+    SELECT id, chat_id, text, role, created_at, updated_at
+    FROM messages
+    WHERE chat_id = (SELECT id FROM chat)
+    ORDER BY id DESC
+    LIMIT :history_limit
+)
+SELECT json_build_object(
+    'student', (SELECT row_to_json(student) FROM student),
+    'chat', (SELECT row_to_json(chat) FROM chat),
+    'current_block', (SELECT row_to_json(current_block) FROM current_block),
+    'current_chapter', (SELECT row_to_json(current_chapter) FROM current_chapter),
+    'messages', (SELECT COALESCE(json_agg(history ORDER BY history.id ASC), '[]'::json) FROM history)
+) AS turn_context;
+"""
+
+# Партиции messages, границы в виде "FOR VALUES FROM (x) TO (y)"
+get_message_partitions = """
+SELECT
+    child.relname AS name,
+    pg_get_expr(child.relpartbound, child.oid) AS bound,
+    pg_inherits.inhdetachpending AS detach_pending
+FROM pg_inherits
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'messages'::regclass;
+"""
+
+get_last_message_id = """
+SELECT COALESCE(pg_sequence_last_value(pg_get_serial_sequence('messages', 'id')::regclass), 0) AS last_id;
+"""
+
+# Имена партиций и границы формирует ChatRepo, а не пользовательский ввод: DDL не принимает параметры.
+# Пустая таблица подключается ATTACH под SHARE UPDATE EXCLUSIVE и не блокирует запись в messages,
+# в отличие от CREATE TABLE ... PARTITION OF
+create_message_partition_table = """
+CREATE TABLE {name} (LIKE messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+"""
+
+attach_message_partition = """
+ALTER TABLE messages ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper});
+"""
+
+# Последняя строка партиции по первичному ключу, без сканирования по created_at
+get_message_partition_newest_created_at = """
+SELECT created_at FROM {name} ORDER BY id DESC LIMIT 1;
+"""
+
+detach_message_partition = """
+ALTER TABLE messages DETACH PARTITION {name} CONCURRENTLY;
+"""
+
+# Прерванный DETACH ... CONCURRENTLY оставляет партицию в состоянии detach pending
+finalize_detach_message_partition = """
+ALTER TABLE messages DETACH PARTITION {name} FINALIZE;
+"""
+
+create_message_archive_schema = """
+CREATE SCHEMA IF NOT EXISTS messages_archive;
+"""
+
+archive_message_partition = """
+ALTER TABLE {name} SET SCHEMA messages_archive;
+"""
@@ -1,11 +1,23 @@
+import re
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
 from opentelemetry.trace import SpanKind, Status, StatusCode
 
 from .query import *
 from internal import model
 from internal import interface
+from internal import common
+
+
+_PARTITION_BOUND_PATTERN = re.compile(r"FROM \((\w+)\) TO \((\w+)\)")
+
+# Ключ advisory lock: партиции messages обслуживает один процесс за раз
+MESSAGE_PARTITIONS_LOCK_KEY = 7_240_002
 
 
-class ChatRepo(interface.IChatRepo):
+class ChatRepo(interface.IChatRepo, interface.IMessagePartitionRepo):
     def __init__(self, tel: interface.ITelemetry, db: interface.IDB):
         self.db = db
         self.tracer = tel.tracer()
@@ -91,4 +103,248 @@ class ChatRepo(interface.IChatRepo):
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(StatusCode.ERROR, str(err))
-                raise err
\ No newline at end of file
+                raise err
+
+    async def get_recent_messages(
+            self,
+            chat_id: int,
+            limit: int,
+            before_id: int = common.MAX_MESSAGE_ID
+    ) -> list[model.Message]:
+        with self.tracer.start_as_current_span(
+                "ChatRepo.get_recent_messages",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "chat_id": chat_id,
+                    "limit": limit,
+                    "before_id": before_id,
+                }
+        ) as span:
+            try:
+                args = {'chat_id': chat_id, 'limit': limit, 'before_id': before_id}
+                rows = await self.db.select(get_recent_messages, args)
+                # Выборка идет от новых к старым, в историю отдаем в хронологическом порядке
+                result = model.Message.serialize(reversed(rows)) if rows else []
+
+                span.set_status(StatusCode.OK)
+                return result
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def get_messages_range(
+            self,
+            chat_id: int,
+            after_id: int,
+            before_id: int,
+            limit: int
+    ) -> list[model.Message]:
+        with self.tracer.start_as_current_span(
+                "ChatRepo.get_messages_range",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "chat_id": chat_id,
+                    "after_id": after_id,
+                    "before_id": before_id,
+                }
+        ) as span:
+            try:
+                args = {'chat_id': chat_id, 'after_id': after_id, 'before_id': before_id, 'limit': limit}
+                rows = await self.db.select(get_messages_range, args)
+                result = model.Message.serialize(rows) if rows else []
+
+                span.set_status(StatusCode.OK)
+                return result
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def update_chat_summary(self, chat_id: int, summary: str, summary_until_message_id: int):
+        with self.tracer.start_as_current_span(
+                "ChatRepo.update_chat_summary",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "chat_id": chat_id,
+                    "summary_until_message_id": summary_until_message_id,
+                }
+        ) as span:
+            try:
+                args = {
+                    'chat_id': chat_id,
+                    'summary': summary,
+                    'summary_until_message_id': summary_until_message_id,
+                }
+                await self.db.update(update_chat_summary, args)
+                span.set_status(StatusCode.OK)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def get_turn_context(self, student_id: int, history_limit: int) -> model.TurnContext | None:
+        with self.tracer.start_as_current_span(
+                "ChatRepo.get_turn_context",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "student_id": student_id,
+                    "history_limit": history_limit,
+                }
+        ) as span:
+            try:
+                args = {'student_id': student_id, 'history_limit': history_limit}
+                # insert, а не select: запрос создает чат, если у студента его еще нет
+                data = await self.db.insert(get_turn_context, args)
+
+                if data["student"] is None:
+                    span.set_status(StatusCode.OK)
+                    return None
+
+                turn_context = model.TurnContext(
+                    student=model.Student.serialize(self._rows([data["student"]]))[0],
+                    chat=model.Chat.serialize(self._rows([data["chat"]]))[0],
+                    current_block=next(iter(model.Block.serialize(self._rows([data["current_block"]]))), None),
+                    current_chapter=next(iter(model.Chapter.serialize(self._rows([data["current_chapter"]]))), None),
+                    messages=model.Message.serialize(self._rows(data["messages"])),
+                )
+
+                span.set_attribute("messages_count", len(turn_context.messages))
+                span.set_status(StatusCode.OK)
+                return turn_context
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    def lock_message_partitions(self) -> AbstractAsyncContextManager:
+        return self.db.advisory_lock(MESSAGE_PARTITIONS_LOCK_KEY)
+
+    async def ensure_message_partitions(self, partition_size: int, partitions_ahead: int) -> list[str]:
+        """Создает партиции так, чтобы впереди последнего id было не меньше partitions_ahead партиций"""
+        with self.tracer.start_as_current_span(
+                "ChatRepo.ensure_message_partitions",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "partition_size": partition_size,
+                    "partitions_ahead": partitions_ahead,
+                }
+        ) as span:
+            try:
+                partitions, last_id = await self._get_message_partitions()
+
+                created = []
+                # Пустой список — миграция партиционирования еще не применена,
+                # граница MAXVALUE — расти некуда
+                if partitions and all(partition.upper is not None for partition in partitions):
+                    upper = max(partition.upper for partition in partitions)
+                    target = last_id + partitions_ahead * partition_size
+
+                    while upper <= target:
+                        lower, upper = upper, upper + partition_size
+                        name = f"messages_p{lower}"
+                        upper_bound = "MAXVALUE" if upper > common.MAX_MESSAGE_ID else upper
+
+                        async with self.db.transaction():
+                            await self.db.update(create_message_partition_table.format(name=name), {})
+                            await self.db.update(
+                                attach_message_partition.format(name=name, lower=lower, upper=upper_bound),
+                                {}
+                            )
+                        created.append(name)
+
+                        if upper_bound == "MAXVALUE":
+                            break
+
+                span.set_attributes({"last_id": last_id, "partitions_created": len(created)})
+                span.set_status(StatusCode.OK)
+                return created
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def archive_message_partitions(self, retention_days: int) -> list[str]:
+        """Отключает партиции, все сообщения которых старше retention_days, и переносит их в messages_archive.
+
+        Данные не удаляются: архивную таблицу можно выгрузить и удалить отдельно.
+        """
+        with self.tracer.start_as_current_span(
+                "ChatRepo.archive_message_partitions",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "retention_days": retention_days,
+                }
+        ) as span:
+            try:
+                partitions, last_id = await self._get_message_partitions()
+                cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+
+                archived = []
+                for partition in partitions:
+                    if partition.detach_pending:
+                        await self.db.execute_outside_transaction(
+                            finalize_detach_message_partition.format(name=partition.name)
+                        )
+                    else:
+                        # Партиция, в которую еще идет запись, и все следующие остаются
+                        if partition.upper is None or partition.upper > last_id:
+                            continue
+
+                        rows = await self.db.select(
+                            get_message_partition_newest_created_at.format(name=partition.name),
+                            {}
+                        )
+                        if not rows or rows[0].created_at >= cutoff:
+                            continue
+
+                        # Без CONCURRENTLY отключение держало бы ACCESS EXCLUSIVE на всей messages
+                        await self.db.execute_outside_transaction(
+                            detach_message_partition.format(name=partition.name)
+                        )
+
+                    await self.db.update(create_message_archive_schema, {})
+                    await self.db.update(archive_message_partition.format(name=partition.name), {})
+                    archived.append(partition.name)
+
+                span.set_attribute("partitions_archived", len(archived))
+                span.set_status(StatusCode.OK)
+                return archived
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def _get_message_partitions(self) -> tuple[list[model.MessagePartition], int]:
+        # Читаем на primary: реплика может еще не видеть только что созданную партицию
+        async with self.db.transaction():
+            rows = await self.db.select(get_message_partitions, {})
+            last_id_rows = await self.db.select(get_last_message_id, {})
+
+        partitions = []
+        for row in rows:
+            match = _PARTITION_BOUND_PATTERN.search(row.bound)
+            lower, upper = match.groups()
+            partitions.append(model.MessagePartition(
+                name=row.name,
+                lower=int(lower) if lower.lstrip("-").isdigit() else None,
+                upper=int(upper) if upper.lstrip("-").isdigit() else None,
+                detach_pending=row.detach_pending,
+            ))
+
+        partitions.sort(key=lambda partition: partition.lower if partition.lower is not None else -1)
+        return partitions, last_id_rows[0].last_id
+
+    @staticmethod
+    def _rows(items: list[dict | None]) -> list[SimpleNamespace]:
+        """JSON-строки из row_to_json в объекты с доступом по атрибутам для model.*.serialize"""
+        rows = []
+        for item in items:
+            if item is None:
+                continue
+            row = dict(item)
+            for key in ("created_at", "updated_at"):
+                if isinstance(row.get(key), str):
+                    row[key] = datetime.fromisoformat(row[key])
+            rows.append(SimpleNamespace(**row))
+        return rows
@@ -42,14 +42,14 @@ SET
     learning_style = COALESCE(:learning_style, learning_style),
     lesson_duration = COALESCE(:lesson_duration, lesson_duration),
     preferred_difficulty = COALESCE(:preferred_difficulty, preferred_difficulty),
-    recommended_topics = COALESCE(:recommended_topics::jsonb, recommended_topics),
-    recommended_blocks = COALESCE(:recommended_blocks::jsonb, recommended_blocks),
-    approved_topics = COALESCE(:approved_topics::jsonb, approved_topics),
-    approved_blocks = COALESCE(:approved_blocks::jsonb, approved_blocks),
-    approved_chapters = COALESCE(:approved_chapters::jsonb, approved_chapters),
+    recommended_topics = COALESCE(CAST(:recommended_topics AS jsonb), recommended_topics),
+    recommended_blocks = COALESCE(CAST(:recommended_blocks AS jsonb), recommended_blocks),
+    approved_topics = COALESCE(CAST(:approved_topics AS jsonb), approved_topics),
+    approved_blocks = COALESCE(CAST(:approved_blocks AS jsonb), approved_blocks),
+    approved_chapters = COALESCE(CAST(:approved_chapters AS jsonb), approved_chapters),
     assessment_score = COALESCE(:assessment_score, assessment_score),
-    strong_areas = COALESCE(:strong_areas::jsonb, strong_areas),
-    weak_areas = COALESCE(:weak_areas::jsonb, weak_areas),
+    strong_areas = COALESCE(CAST(:strong_areas AS jsonb), strong_areas),
+    weak_areas = COALESCE(CAST(:weak_areas AS jsonb), weak_areas),
     updated_at = NOW()
 WHERE id = :student_id;
 """
@@ -63,7 +63,7 @@ WHERE id = :student_id;
 add_topic_to_approved = """
 UPDATE students
 SET 
-    approved_topics = COALESCE(approved_topics, '{}'::jsonb) || jsonb_build_object(:topic_id::text, :topic_name),
+    approved_topics = COALESCE(approved_topics, '{}'::jsonb) || jsonb_build_object(CAST(:topic_id AS text), CAST(:topic_name AS text)),
     updated_at = NOW()
 WHERE id = :student_id;
 """
@@ -71,7 +71,7 @@ WHERE id = :student_id;
 add_block_to_approved = """
 UPDATE students
 SET 
-    approved_blocks = COALESCE(approved_blocks, '{}'::jsonb) || jsonb_build_object(:block_id::text, :block_name),
+    approved_blocks = COALESCE(approved_blocks, '{}'::jsonb) || jsonb_build_object(CAST(:block_id AS text), CAST(:block_name AS text)),
     updated_at = NOW()
 WHERE id = :student_id;
 """
@@ -79,7 +79,37 @@ WHERE id = :student_id;
 add_chapter_to_approved = """
 UPDATE students
 SET 
-    approved_chapters = COALESCE(approved_chapters, '{}'::jsonb) || jsonb_build_object(:chapter_id::text, :chapter_name),
+    approved_chapters = COALESCE(approved_chapters, '{}'::jsonb) || jsonb_build_object(CAST(:chapter_id AS text), CAST(:chapter_name AS text)),
+    updated_at = NOW()
+WHERE id = :student_id;
+"""
+
+update_student_state = """
+UPDATE students
+SET 
+    current_expert = COALESCE(:current_expert, current_expert),
+    current_topic = COALESCE(CAST(:current_topic AS jsonb), current_topic),
+    current_block = COALESCE(CAST(:current_block AS jsonb), current_block),
+    current_chapter = COALESCE(CAST(:current_chapter AS jsonb), current_chapter),
+    programming_experience = COALESCE(:programming_experience, programming_experience),
+    education_background = COALESCE(:education_background, education_background),
+    learning_goals = COALESCE(:learning_goals, learning_goals),
+    career_goals = COALESCE(:career_goals, career_goals),
+    timeline = COALESCE(:timeline, timeline),
+    learning_style = COALESCE(:learning_style, learning_style),
+    lesson_duration = COALESCE(:lesson_duration, lesson_duration),
+    preferred_difficulty = COALESCE(:preferred_difficulty, preferred_difficulty),
+    recommended_topics = COALESCE(CAST(:recommended_topics AS jsonb), recommended_topics),
+    recommended_blocks = COALESCE(CAST(:recommended_blocks AS jsonb), recommended_blocks),
+    approved_topics = COALESCE(CAST(:approved_topics AS jsonb), approved_topics, '{}'::jsonb) 
+        || CAST(:new_approved_topics AS jsonb),
+    approved_blocks = COALESCE(CAST(:approved_blocks AS jsonb), approved_blocks, '{}'::jsonb) 
+        || CAST(:new_approved_blocks AS jsonb),
+    approved_chapters = COALESCE(CAST(:approved_chapters AS jsonb), approved_chapters, '{}'::jsonb) 
+        || CAST(:new_approved_chapters AS jsonb),
+    assessment_score = COALESCE(:assessment_score, assessment_score),
+    strong_areas = COALESCE(CAST(:strong_areas AS jsonb), strong_areas),
+    weak_areas = COALESCE(CAST(:weak_areas AS jsonb), weak_areas),
     updated_at = NOW()
 WHERE id = :student_id;
 """
\ No newline at end of file
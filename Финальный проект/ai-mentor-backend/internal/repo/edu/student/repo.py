@@ -59,32 +59,7 @@ class StudentRepo(interface.IStudentRepo):
                 }
         ) as span:
             try:
-                # Конвертируем JSON поля в строки для PostgreSQL
-                args = {
-                    'student_id': student_id,
-                    'programming_experience': background.get('programming_experience'),
-                    'education_background': background.get('education_background'),
-                    'learning_goals': background.get('learning_goals'),
-                    'career_goals': background.get('career_goals'),
-                    'timeline': background.get('timeline'),
-                    'learning_style': background.get('learning_style'),
-                    'lesson_duration': background.get('lesson_duration'),
-                    'preferred_difficulty': background.get('preferred_difficulty'),
-                    'recommended_topics': json.dumps(background.get('recommended_topics')) if background.get(
-                        'recommended_topics') else None,
-                    'recommended_blocks': json.dumps(background.get('recommended_blocks')) if background.get(
-                        'recommended_blocks') else None,
-                    'approved_topics': json.dumps(background.get('approved_topics')) if background.get(
-                        'approved_topics') else None,
-                    'approved_blocks': json.dumps(background.get('approved_blocks')) if background.get(
-                        'approved_blocks') else None,
-                    'approved_chapters': json.dumps(background.get('approved_chapters')) if background.get(
-                        'approved_chapters') else None,
-                    'assessment_score': background.get('assessment_score'),
-                    'strong_areas': json.dumps(background.get('strong_areas')) if background.get(
-                        'strong_areas') else None,
-                    'weak_areas': json.dumps(background.get('weak_areas')) if background.get('weak_areas') else None,
-                }
+                args = {'student_id': student_id, **self._background_args(background)}
 
                 await self.db.update(update_student_background, args)
                 span.set_status(StatusCode.OK)
@@ -178,4 +153,63 @@ class StudentRepo(interface.IStudentRepo):
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(StatusCode.ERROR, str(err))
-                raise err
\ No newline at end of file
+                raise err
+
+    async def update_student_state(self, student_id: int, state: model.StudentStateUpdate):
+        with self.tracer.start_as_current_span(
+                "StudentRepo.update_student_state",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "student_id": student_id,
+                }
+        ) as span:
+            try:
+                args = {
+                    'student_id': student_id,
+                    'current_expert': state.current_expert,
+                    'current_topic': self._current_item_arg(state.current_topic),
+                    'current_block': self._current_item_arg(state.current_block),
+                    'current_chapter': self._current_item_arg(state.current_chapter),
+                    **self._background_args(state.background),
+                    'new_approved_topics': json.dumps({str(k): v for k, v in state.approved_topics.items()}),
+                    'new_approved_blocks': json.dumps({str(k): v for k, v in state.approved_blocks.items()}),
+                    'new_approved_chapters': json.dumps({str(k): v for k, v in state.approved_chapters.items()}),
+                }
+                await self.db.update(update_student_state, args)
+                span.set_status(StatusCode.OK)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    @staticmethod
+    def _current_item_arg(item: tuple[int, str] | None) -> str | None:
+        if item is None:
+            return None
+        item_id, item_name = item
+        return json.dumps({str(item_id): item_name})
+
+    @staticmethod
+    def _background_args(background: dict) -> dict:
+        # Конвертируем JSON поля в строки для PostgreSQL
+        def to_json(key: str) -> str | None:
+            return json.dumps(background.get(key)) if background.get(key) else None
+
+        return {
+            'programming_experience': background.get('programming_experience'),
+            'education_background': background.get('education_background'),
+            'learning_goals': background.get('learning_goals'),
+            'career_goals': background.get('career_goals'),
+            'timeline': background.get('timeline'),
+            'learning_style': background.get('learning_style'),
+            'lesson_duration': background.get('lesson_duration'),
+            'preferred_difficulty': background.get('preferred_difficulty'),
+            'recommended_topics': to_json('recommended_topics'),
+            'recommended_blocks': to_json('recommended_blocks'),
+            'approved_topics': to_json('approved_topics'),
+            'approved_blocks': to_json('approved_blocks'),
+            'approved_chapters': to_json('approved_chapters'),
+            'assessment_score': background.get('assessment_score'),
+            'strong_areas': to_json('strong_areas'),
+            'weak_areas': to_json('weak_areas'),
+        }
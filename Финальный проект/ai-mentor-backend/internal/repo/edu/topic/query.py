@@ -87,21 +87,152 @@ SET name = :name, content_file_id = :content_file_id, updated_at = NOW()
 WHERE id = :chapter_id;
 """
 
+# Catalog version
+get_catalog_high_water_mark = """
+SELECT
+    GREATEST(
+        (SELECT MAX(updated_at) FROM topics),
+        (SELECT MAX(updated_at) FROM blocks),
+        (SELECT MAX(updated_at) FROM chapters)
+    ) AS updated_at,
+    (SELECT COUNT(*) FROM topics) + (SELECT COUNT(*) FROM blocks) + (SELECT COUNT(*) FROM chapters) AS total;
+"""
+
 # Student progress updates
 update_current_topic = """
 UPDATE students
-SET current_topic = jsonb_build_object(:topic_id::text, :topic_name), updated_at = NOW()
+SET current_topic = jsonb_build_object(CAST(:topic_id AS text), CAST(:topic_name AS text)), updated_at = NOW()
 WHERE id = :student_id;
 """
 
 update_current_block = """
 UPDATE students
-SET current_block = jsonb_build_object(:block_id::text, :block_name), updated_at = NOW()
+SET current_block = jsonb_build_object(CAST(:block_id AS text), CAST(:block_name AS text)), updated_at = NOW()
 WHERE id = :student_id;
 """
 
 update_current_chapter = """
 UPDATE students
-SET current_chapter = jsonb_build_object(:chapter_id::text, :chapter_name), updated_at = NOW()
+SET current_chapter = jsonb_build_object(CAST(:chapter_id AS text), CAST(:chapter_name AS text)), updated_at = NOW()
 WHERE id = :student_id;
-"""
\ No newline at end of file
+"""
+# Content objects
+get_content_object = """
+SELECT file_id
+FROM content_objects
+WHERE content_hash = :content_hash;
+"""
+
+# При гонке двух загрузок одинакового содержимого возвращается fid той, что записалась первой
+create_content_object = """
+INSERT INTO content_objects (content_hash, file_id, size, created_at)
+VALUES (:content_hash, :file_id, :size, NOW())
+ON CONFLICT (content_hash) DO UPDATE SET content_hash = EXCLUDED.content_hash
+RETURNING file_id;
+"""
+
+# Knowledge base ingestion
+get_content_sources = """
+SELECT source_path || '/intro.md' AS source_path, intro_hash AS content_hash, intro_file_id AS file_id
+FROM topics
+WHERE source_path IS NOT NULL
+UNION ALL
+SELECT source_path || '/edu-plan.md', edu_plan_hash, edu_plan_file_id
+FROM topics
+WHERE source_path IS NOT NULL
+UNION ALL
+SELECT source_path, content_hash, content_file_id
+FROM blocks
+WHERE source_path IS NOT NULL
+UNION ALL
+SELECT source_path, content_hash, content_file_id
+FROM chapters
+WHERE source_path IS NOT NULL;
+"""
+
+# Все строки каталога одним запросом: updated_at меняется только у строк с другим содержимым,
+# новые строки вставляются в порядке базы знаний, чтобы id совпадал с порядком изучения
+upsert_content_sources = """
+WITH topic_input AS (
+    SELECT *
+    FROM jsonb_to_recordset(CAST(:topics AS jsonb)) AS t(
+        position int, source_path text, name text, intro_file_id text, intro_hash text, edu_plan_file_id text, edu_plan_hash text
+    )
+),
+block_input AS (
+    SELECT *
+    FROM jsonb_to_recordset(CAST(:blocks AS jsonb)) AS b(
+        position int, topic_path text, source_path text, name text, content_file_id text, content_hash text
+    )
+),
+chapter_input AS (
+    SELECT *
+    FROM jsonb_to_recordset(CAST(:chapters AS jsonb)) AS c(
+        position int, block_path text, source_path text, name text, content_file_id text, content_hash text
+    )
+),
+upserted_topics AS (
+    INSERT INTO topics (name, intro_file_id, edu_plan_file_id, source_path, intro_hash, edu_plan_hash, created_at, updated_at)
+    SELECT name, intro_file_id, edu_plan_file_id, source_path, intro_hash, edu_plan_hash, NOW(), NOW()
+    FROM topic_input
+    ORDER BY position
+    ON CONFLICT (source_path) DO UPDATE
+    SET name = EXCLUDED.name,
+        intro_file_id = EXCLUDED.intro_file_id,
+        edu_plan_file_id = EXCLUDED.edu_plan_file_id,
+        intro_hash = EXCLUDED.intro_hash,
+        edu_plan_hash = EXCLUDED.edu_plan_hash,
+        updated_at = NOW()
+    WHERE (topics.name, topics.intro_file_id, topics.edu_plan_file_id, topics.intro_hash, topics.edu_plan_hash)
+        IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.intro_file_id, EXCLUDED.edu_plan_file_id, EXCLUDED.intro_hash, EXCLUDED.edu_plan_hash)
+    RETURNING id, source_path
+),
+topic_ids AS (
+    SELECT id, source_path FROM upserted_topics
+    UNION
+    SELECT id, source_path FROM topics WHERE source_path IN (SELECT source_path FROM topic_input)
+),
+upserted_blocks AS (
+    INSERT INTO blocks (topic_id, name, content_file_id, source_path, content_hash, created_at, updated_at)
+    SELECT topic_ids.id, block_input.name, block_input.content_file_id, block_input.source_path, block_input.content_hash, NOW(), NOW()
+    FROM block_input
+    JOIN topic_ids ON topic_ids.source_path = block_input.topic_path
+    ORDER BY block_input.position
+    ON CONFLICT (source_path) DO UPDATE
+    SET topic_id = EXCLUDED.topic_id,
+        name = EXCLUDED.name,
+        content_file_id = EXCLUDED.content_file_id,
+        content_hash = EXCLUDED.content_hash,
+        updated_at = NOW()
+    WHERE (blocks.topic_id, blocks.name, blocks.content_file_id, blocks.content_hash)
+        IS DISTINCT FROM (EXCLUDED.topic_id, EXCLUDED.name, EXCLUDED.content_file_id, EXCLUDED.content_hash)
+    RETURNING id, topic_id, source_path
+),
+block_ids AS (
+    SELECT id, topic_id, source_path FROM upserted_blocks
+    UNION
+    SELECT id, topic_id, source_path FROM blocks WHERE source_path IN (SELECT source_path FROM block_input)
+),
+upserted_chapters AS (
+    INSERT INTO chapters (topic_id, block_id, name, content_file_id, source_path, content_hash, created_at, updated_at)
+    SELECT block_ids.topic_id, block_ids.id, chapter_input.name, chapter_input.content_file_id,
+           chapter_input.source_path, chapter_input.content_hash, NOW(), NOW()
+    FROM chapter_input
+    JOIN block_ids ON block_ids.source_path = chapter_input.block_path
+    ORDER BY chapter_input.position
+    ON CONFLICT (source_path) DO UPDATE
+    SET topic_id = EXCLUDED.topic_id,
+        block_id = EXCLUDED.block_id,
+        name = EXCLUDED.name,
+        content_file_id = EXCLUDED.content_file_id,
+        content_hash = EXCLUDED.content_hash,
+        updated_at = NOW()
+    WHERE (chapters.topic_id, chapters.block_id, chapters.name, chapters.content_file_id, chapters.content_hash)
+        IS DISTINCT FROM (EXCLUDED.topic_id, EXCLUDED.block_id, EXCLUDED.name, EXCLUDED.content_file_id, EXCLUDED.content_hash)
+    RETURNING id
+)
+SELECT
+    (SELECT COUNT(*) FROM upserted_topics)
+    + (SELECT COUNT(*) FROM upserted_blocks)
+    + (SELECT COUNT(*) FROM upserted_chapters) AS changed_rows;
+"""
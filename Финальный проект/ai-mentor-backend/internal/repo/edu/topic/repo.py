@@ -1,10 +1,13 @@
 import io
+import json
+from datetime import datetime
 
 from opentelemetry.trace import SpanKind, Status, StatusCode
 
 from .query import *
 from internal import model
 from internal import interface
+from internal import common
 
 
 class TopicRepo(interface.ITopicRepo):
@@ -13,6 +16,9 @@ class TopicRepo(interface.ITopicRepo):
         self.storage = storage
         self.tracer = tel.tracer()
 
+        # Локальная версия каталога, растет при каждом create_* в этом процессе
+        self._catalog_version = 0
+
     # Topic methods
     async def get_topic_by_id(self, topic_id: int) -> list[model.Topic]:
         with self.tracer.start_as_current_span(
@@ -118,6 +124,26 @@ class TopicRepo(interface.ITopicRepo):
                 span.set_status(StatusCode.ERROR, str(err))
                 raise err
 
+    # Catalog version methods
+    def get_catalog_version(self) -> int:
+        return self._catalog_version
+
+    async def get_catalog_high_water_mark(self) -> tuple[datetime, int]:
+        with self.tracer.start_as_current_span(
+                "TopicRepo.get_catalog_high_water_mark",
+                kind=SpanKind.INTERNAL
+        ) as span:
+            try:
+                rows = await self.db.select(get_catalog_high_water_mark, {})
+                result = (rows[0].updated_at, rows[0].total)
+
+                span.set_status(StatusCode.OK)
+                return result
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
     # Student progress methods
     async def update_current_topic(self, student_id: int, topic_id: int, topic_name: str):
         with self.tracer.start_as_current_span(
@@ -198,6 +224,7 @@ class TopicRepo(interface.ITopicRepo):
                     'edu_plan_file_id': edu_plan_file_id
                 }
                 topic_id = await self.db.insert(create_topic, args)
+                self._catalog_version += 1
 
                 span.set_status(StatusCode.OK)
                 return topic_id
@@ -219,6 +246,7 @@ class TopicRepo(interface.ITopicRepo):
                     'content_file_id': content_file_id
                 }
                 block_id = await self.db.insert(create_block, args)
+                self._catalog_version += 1
 
                 span.set_status(StatusCode.OK)
                 return block_id
@@ -241,6 +269,7 @@ class TopicRepo(interface.ITopicRepo):
                     'content_file_id': content_file_id
                 }
                 chapter_id = await self.db.insert(create_chapter, args)
+                self._catalog_version += 1
 
                 span.set_status(StatusCode.OK)
                 return chapter_id
@@ -249,11 +278,118 @@ class TopicRepo(interface.ITopicRepo):
                 span.set_status(StatusCode.ERROR, str(err))
                 raise err
 
+    async def get_content_sources(self) -> dict[str, tuple[str, str]]:
+        with self.tracer.start_as_current_span(
+                "TopicRepo.get_content_sources",
+                kind=SpanKind.INTERNAL
+        ) as span:
+            try:
+                rows = await self.db.select(get_content_sources, {})
+                result = {row.source_path: (row.content_hash, row.file_id) for row in rows}
+
+                span.set_status(StatusCode.OK)
+                return result
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def upsert_content_sources(self, topics: list[model.TopicSource]) -> int:
+        with self.tracer.start_as_current_span(
+                "TopicRepo.upsert_content_sources",
+                kind=SpanKind.INTERNAL,
+                attributes={"topics": len(topics)}
+        ) as span:
+            try:
+                topic_rows, block_rows, chapter_rows = [], [], []
+                for topic in topics:
+                    topic_rows.append({
+                        "position": len(topic_rows),
+                        "source_path": topic.path,
+                        "name": topic.name,
+                        "intro_file_id": topic.intro.file_id if topic.intro else None,
+                        "intro_hash": topic.intro.content_hash if topic.intro else None,
+                        "edu_plan_file_id": topic.edu_plan.file_id if topic.edu_plan else None,
+                        "edu_plan_hash": topic.edu_plan.content_hash if topic.edu_plan else None,
+                    })
+                    for block in topic.blocks:
+                        block_rows.append({
+                            "position": len(block_rows),
+                            "topic_path": topic.path,
+                            "source_path": block.path,
+                            "name": block.name,
+                            "content_file_id": block.content.file_id,
+                            "content_hash": block.content.content_hash,
+                        })
+                        for chapter in block.chapters:
+                            chapter_rows.append({
+                                "position": len(chapter_rows),
+                                "block_path": block.path,
+                                "source_path": chapter.path,
+                                "name": chapter.name,
+                                "content_file_id": chapter.file_id,
+                                "content_hash": chapter.content_hash,
+                            })
+
+                args = {
+                    'topics': json.dumps(topic_rows, ensure_ascii=False),
+                    'blocks': json.dumps(block_rows, ensure_ascii=False),
+                    'chapters': json.dumps(chapter_rows, ensure_ascii=False),
+                }
+                changed_rows = await self.db.insert(upsert_content_sources, args)
+                if changed_rows:
+                    self._catalog_version += 1
+
+                span.set_attribute("changed_rows", changed_rows)
+                span.set_status(StatusCode.OK)
+                return changed_rows
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
 
     async def upload_file(self, file: io.BytesIO, file_name: str) -> str:
-        response = self.storage.upload(file, file_name)
-        return response.fid
+        """Загружает файл с адресацией по содержимому: одинаковые байты хранятся одним объектом"""
+        with self.tracer.start_as_current_span(
+                "TopicRepo.upload_file",
+                kind=SpanKind.INTERNAL,
+                attributes={"file_name": file_name}
+        ) as span:
+            try:
+                content = file.getvalue()
+                content_hash = common.content_hash(content)
+                span.set_attribute("content_hash", content_hash)
+
+                rows = await self.db.select(get_content_object, {'content_hash': content_hash})
+                if rows:
+                    span.set_attribute("deduplicated", True)
+                    span.set_status(StatusCode.OK)
+                    return rows[0].file_id
+
+                file.seek(0)
+                stored_file = await self.storage.upload(file, file_name)
+
+                args = {
+                    'content_hash': content_hash,
+                    'file_id': stored_file.fid,
+                    'size': len(content),
+                }
+                file_id = await self.db.insert(create_content_object, args)
+                if file_id != stored_file.fid:
+                    # Такое же содержимое параллельно загрузил другой запрос, наша копия не нужна
+                    await self.storage.delete(stored_file.fid, file_name)
+
+                span.set_attribute("deduplicated", file_id != stored_file.fid)
+                span.set_status(StatusCode.OK)
+                return file_id
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
 
     async def download_file(self, file_id: str, file_name: str) -> tuple[io.BytesIO, str]:
-        file, content_type = self.storage.download(file_id, file_name)
+        file, content_type = await self.storage.download(file_id, file_name)
         return file, content_type
+
+    async def open_file_stream(self, file_id: str, file_name: str, byte_range: str = None) -> common.FileStream:
+        return await self.storage.open_stream(file_id, file_name, byte_range)
@@ -0,0 +1,22 @@
+create_schema_migrations = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+"""
+
+get_applied_versions = """
+SELECT version
+FROM schema_migrations
+ORDER BY version;
+"""
+
+disable_statement_timeout = """
+SET LOCAL statement_timeout = 0;
+"""
+
+record_migration = """
+INSERT INTO schema_migrations (version, name, applied_at)
+VALUES (:version, :name, NOW());
+"""
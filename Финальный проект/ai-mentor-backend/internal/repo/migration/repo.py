@@ -0,0 +1,67 @@
+from contextlib import AbstractAsyncContextManager
+
+from opentelemetry.trace import SpanKind, StatusCode
+
+from .query import *
+from internal import model
+from internal import interface
+
+# Ключ advisory lock: одновременно миграции применяет только один запуск
+MIGRATIONS_LOCK_KEY = 7_240_001
+
+
+class MigrationRepo(interface.IMigrationRepo):
+    def __init__(self, tel: interface.ITelemetry, db: interface.IDB):
+        self.db = db
+        self.tracer = tel.tracer()
+
+    def lock(self) -> AbstractAsyncContextManager:
+        return self.db.advisory_lock(MIGRATIONS_LOCK_KEY)
+
+    async def get_applied_versions(self) -> set[int]:
+        with self.tracer.start_as_current_span(
+                "MigrationRepo.get_applied_versions",
+                kind=SpanKind.INTERNAL,
+        ) as span:
+            try:
+                await self.db.update(create_schema_migrations, {})
+                rows = await self.db.select(get_applied_versions, {})
+
+                span.set_status(StatusCode.OK)
+                return {row.version for row in rows}
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def apply(self, migration: model.Migration) -> None:
+        with self.tracer.start_as_current_span(
+                "MigrationRepo.apply",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "version": migration.version,
+                    "name": migration.name,
+                    "transactional": migration.transactional,
+                }
+        ) as span:
+            try:
+                args = {'version': migration.version, 'name': migration.name}
+
+                if migration.transactional:
+                    async with self.db.transaction():
+                        # Перестройка большой таблицы не должна обрываться лимитом для запросов API
+                        await self.db.update(disable_statement_timeout, {})
+                        for query in migration.queries:
+                            await self.db.update(query, {})
+                        await self.db.update(record_migration, args)
+                else:
+                    # После сбоя посередине версия не записана и выражения повторятся при следующем запуске
+                    for query in migration.queries:
+                        await self.db.execute_outside_transaction(query, statement_timeout=0)
+                    await self.db.update(record_migration, args)
+
+                span.set_status(StatusCode.OK)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
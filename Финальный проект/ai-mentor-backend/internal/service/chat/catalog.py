@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+from opentelemetry.trace import StatusCode, SpanKind
+
+from internal import interface
+from .topic_formatter import EducationDataFormatter
+
+
+class EduCatalogCache(interface.IEduCatalog):
+    """Кэш каталога обучающего материала внутри процесса.
+
+    Каталог загружается один раз и хранится уже отформатированным фрагментом промпта.
+    Перезагрузка происходит, если в этом процессе был вызван create_topic/create_block/create_chapter
+    или если раз в check_interval секунд high-water mark по updated_at показал изменения.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            topic_repo: interface.ITopicRepo,
+            check_interval: int,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.topic_repo = topic_repo
+        self.check_interval = check_interval
+
+        self._lock = asyncio.Lock()
+        self._content_metadata: str | None = None
+        self._local_version = -1
+        self._high_water_mark = None
+        self._checked_at = 0.0
+
+    async def get_content_metadata(self) -> str:
+        with self.tracer.start_as_current_span(
+                "EduCatalogCache.get_content_metadata",
+                kind=SpanKind.INTERNAL
+        ) as span:
+            try:
+                if self._is_fresh():
+                    span.set_attribute("cache.hit", True)
+                    span.set_status(StatusCode.OK)
+                    return self._content_metadata
+
+                async with self._lock:
+                    # Пока ждали блокировку, каталог мог обновить другой запрос
+                    if not self._is_fresh():
+                        await self._refresh()
+
+                span.set_attribute("cache.hit", False)
+                span.set_status(StatusCode.OK)
+                return self._content_metadata
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    def invalidate(self):
+        self._content_metadata = None
+
+    def _is_fresh(self) -> bool:
+        return (
+                self._content_metadata is not None
+                and self._local_version == self.topic_repo.get_catalog_version()
+                and time.monotonic() - self._checked_at < self.check_interval
+        )
+
+    async def _refresh(self):
+        local_version = self.topic_repo.get_catalog_version()
+        high_water_mark = await self.topic_repo.get_catalog_high_water_mark()
+
+        if (
+                self._content_metadata is not None
+                and local_version == self._local_version
+                and high_water_mark == self._high_water_mark
+        ):
+            self._checked_at = time.monotonic()
+            return
+
+        all_topic, all_block, all_chapter = await asyncio.gather(
+            self.topic_repo.get_all_topic(),
+            self.topic_repo.get_all_block(),
+            self.topic_repo.get_all_chapter(),
+        )
+
+        self._content_metadata = self._render(EducationDataFormatter(all_topic, all_block, all_chapter))
+        # Версии сняты до загрузки: изменения во время загрузки вызовут повторное обновление
+        self._local_version = local_version
+        self._high_water_mark = high_water_mark
+        self._checked_at = time.monotonic()
+
+        self.logger.info("Каталог обучающего материала перезагружен", {
+            "topics": len(all_topic),
+            "blocks": len(all_block),
+            "chapters": len(all_chapter),
+        })
+
+    @staticmethod
+    def _render(formatter: EducationDataFormatter) -> str:
+        flat_json = formatter.to_flat_json()
+        hierarchical_json = formatter.to_hierarchical_json()
+
+        return f"""СОДЕРЖАНИЕ ОБУЧАЮЩЕГО МАТЕРИАЛА{{
+            "flat": {flat_json},
+            "hierarchical": {hierarchical_json}
+        }}"""
@@ -0,0 +1,115 @@
+import time
+
+from opentelemetry.trace import StatusCode, SpanKind
+
+from internal import interface, common, model
+
+# Команды, которые может выполнять каждый эксперт
+EXPERT_COMMANDS = {
+    common.Experts.registrator: {"register_student", "login_student", "switch_to_next_expert"},
+    common.Experts.interview: {"update_student_background", "switch_to_next_expert"},
+    common.Experts.teacher: {"change_edu_content", "switch_to_next_expert"},
+    common.Experts.test: {"approve_topic", "approve_block", "approve_chapter", "switch_to_next_expert"},
+}
+
+
+class CommandExecutor(interface.ICommandExecutor):
+    """Выполняет команды из ответа LLM.
+
+    Все изменения состояния студента сначала собираются в model.StudentStateUpdate
+    и применяются одним UPDATE, т.е. одной транзакцией на ответ LLM.
+    Время обработки каждой команды пишется событием в span.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            student_repo: interface.IStudentRepo,
+            account_repo: interface.IAccountRepo,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.student_repo = student_repo
+        self.account_repo = account_repo
+
+    async def execute(self, student: model.Student, commands: list[common.Command]):
+        with self.tracer.start_as_current_span(
+                "CommandExecutor.execute",
+                kind=SpanKind.INTERNAL,
+                attributes={
+                    "student_id": student.id,
+                    "expert": student.current_expert,
+                    "commands_count": len(commands),
+                }
+        ) as span:
+            try:
+                allowed_commands = EXPERT_COMMANDS.get(student.current_expert, set())
+                state = model.StudentStateUpdate()
+
+                for command in commands:
+                    if command.name not in allowed_commands:
+                        continue
+
+                    start_time = time.perf_counter()
+                    await self._collect(state, command)
+                    span.add_event("command", {
+                        "command.name": command.name,
+                        "command.duration_ms": (time.perf_counter() - start_time) * 1000,
+                    })
+
+                if not state.is_empty():
+                    start_time = time.perf_counter()
+                    await self.student_repo.update_student_state(student.id, state)
+                    span.add_event("student_state_update", {
+                        "duration_ms": (time.perf_counter() - start_time) * 1000,
+                    })
+
+                span.set_status(StatusCode.OK)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def _collect(self, state: model.StudentStateUpdate, command: common.Command):
+        params = command.params
+
+        if command.name == "register_student":
+            await self._register_student(**params)
+
+        elif command.name == "login_student":
+            await self._login_student(**params)
+
+        elif command.name == "switch_to_next_expert":
+            state.current_expert = params.get("next_expert")
+
+        elif command.name == "update_student_background":
+            state.background.update(params)
+
+        elif command.name == "change_edu_content":
+            state.current_topic = (params["topic_id"], params["topic_name"])
+            state.current_block = (params["block_id"], params["block_name"])
+            state.current_chapter = (params["chapter_id"], params["chapter_name"])
+
+        elif command.name == "approve_topic":
+            state.approved_topics[params["topic_id"]] = params["topic_name"]
+
+        elif command.name == "approve_block":
+            state.approved_blocks[params["block_id"]] = params["block_name"]
+
+        elif command.name == "approve_chapter":
+            state.approved_chapters[params["chapter_id"]] = params["chapter_name"]
+
+    async def _register_student(self, login: str, password: str) -> tuple[int, int]:
+        account_id = await self.account_repo.create_account(login, password)
+        student_id = await self.student_repo.create_student(account_id)
+        return account_id, student_id
+
+    async def _login_student(self, login: str, password: str):
+        account = await self.account_repo.get_account_by_login(login)
+        if not account:
+            raise ValueError("Аккаунт не найден")
+
+        if account[0].password != password:
+            raise ValueError("Неверный пароль")
+
+        return account[0].id
@@ -0,0 +1,210 @@
+import asyncio
+import math
+import re
+from collections import OrderedDict
+
+from opentelemetry.trace import StatusCode, SpanKind
+
+from internal import interface, model, common
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Грубый стемминг: для русских словоформ общей основы обычно хватает первых символов слова
+STEM_LENGTH = 6
+MIN_TERM_LENGTH = 3
+
+
+def extract_terms(text: str) -> frozenset[str]:
+    return frozenset(
+        word[:STEM_LENGTH]
+        for word in _WORD_PATTERN.findall(text.lower())
+        if len(word) >= MIN_TERM_LENGTH
+    )
+
+
+class ContentStore(interface.IContentStore):
+    """Разобранные на разделы markdown файлы обучающего материала.
+
+    Файл скачивается из хранилища один раз на версию (fid + updated_at), делится на разделы
+    по заголовкам, для каждого раздела заранее считаются токены и термы.
+    Дальше на каждом ходе из памяти выбираются разделы, больше всего пересекающиеся
+    с вопросом студента, в пределах бюджета токенов.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            topic_repo: interface.ITopicRepo,
+            max_documents: int,
+            section_max_tokens: int = 400,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.topic_repo = topic_repo
+        self.max_documents = max_documents
+        self.section_max_tokens = section_max_tokens
+
+        # (fid, updated_at) -> разделы документа и idf его термов
+        self._documents: OrderedDict[tuple, tuple[list[model.ContentSection], dict[str, float]]] = OrderedDict()
+        self._loading: dict[tuple, asyncio.Task] = {}
+
+    async def select(
+            self,
+            content_file: common.ContentFile,
+            query: str,
+            token_budget: int
+    ) -> list[model.ContentSection]:
+        with self.tracer.start_as_current_span(
+                "ContentStore.select",
+                kind=SpanKind.INTERNAL,
+                attributes={"fid": content_file.fid, "token_budget": token_budget}
+        ) as span:
+            try:
+                key = (content_file.fid, content_file.updated_at)
+                document = self._documents.get(key)
+                span.set_attribute("cache.hit", document is not None)
+                if document is None:
+                    document = await self._load(key, content_file)
+                else:
+                    self._documents.move_to_end(key)
+
+                sections, idf = document
+                selected = self._select_sections(sections, idf, extract_terms(query), token_budget)
+
+                span.set_attributes({
+                    "content.sections": len(sections),
+                    "content.selected_sections": len(selected),
+                    "content.tokens": sum(section.token_count for section in selected),
+                })
+                span.set_status(StatusCode.OK)
+                return selected
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def _load(
+            self,
+            key: tuple,
+            content_file: common.ContentFile
+    ) -> tuple[list[model.ContentSection], dict[str, float]]:
+        # Параллельные ходы по одной главе ждут одну загрузку
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._ingest(content_file))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+
+        document = await asyncio.shield(task)
+
+        self._documents[key] = document
+        self._documents.move_to_end(key)
+        while len(self._documents) > self.max_documents:
+            self._documents.popitem(last=False)
+        return document
+
+    async def _ingest(self, content_file: common.ContentFile) -> tuple[list[model.ContentSection], dict[str, float]]:
+        file, _ = await self.topic_repo.download_file(content_file.fid, content_file.name)
+        text = file.getvalue().decode("utf-8", errors="replace")
+
+        sections = self.split_sections(text)
+
+        document_frequency: dict[str, int] = {}
+        for section in sections:
+            for term in section.terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        idf = {
+            term: math.log(1 + len(sections) / frequency)
+            for term, frequency in document_frequency.items()
+        }
+
+        self.logger.info("Файл обучающего материала разобран на разделы", {
+            "fid": content_file.fid,
+            "sections": len(sections),
+        })
+        return sections, idf
+
+    def split_sections(self, text: str) -> list[model.ContentSection]:
+        """Делит markdown по заголовкам, длинные разделы дробит по абзацам до section_max_tokens"""
+        sections = []
+        heading = ""
+        lines = []
+        in_fence = False
+
+        for line in text.splitlines():
+            if _FENCE_PATTERN.match(line):
+                in_fence = not in_fence
+            # Строки с # внутри блока кода не заголовки
+            match = None if in_fence else _HEADING_PATTERN.match(line)
+            if match:
+                self._append_section(sections, heading, lines)
+                heading = match.group(2)
+                lines = [line]
+            else:
+                lines.append(line)
+
+        self._append_section(sections, heading, lines)
+        return sections
+
+    def _append_section(self, sections: list[model.ContentSection], heading: str, lines: list[str]):
+        body = "\n".join(lines).strip()
+        if not body:
+            return
+
+        for part in self._split_paragraphs(body, heading):
+            sections.append(model.ContentSection(
+                position=len(sections),
+                heading=heading,
+                text=part,
+                token_count=common.estimate_tokens(part),
+                terms=extract_terms(part),
+            ))
+
+    def _split_paragraphs(self, body: str, heading: str) -> list[str]:
+        if common.estimate_tokens(body) <= self.section_max_tokens:
+            return [body]
+
+        parts = []
+        current = []
+        current_tokens = 0
+        for paragraph in body.split("\n\n"):
+            paragraph_tokens = common.estimate_tokens(paragraph)
+            if current and current_tokens + paragraph_tokens > self.section_max_tokens:
+                parts.append("\n\n".join(current))
+                # Продолжение раздела сохраняет заголовок, чтобы кусок был понятен отдельно
+                current = [f"({heading}, продолжение)"] if heading else []
+                current_tokens = sum(common.estimate_tokens(item) for item in current)
+            current.append(paragraph)
+            current_tokens += paragraph_tokens
+
+        if current:
+            parts.append("\n\n".join(current))
+        return parts
+
+    @staticmethod
+    def _select_sections(
+            sections: list[model.ContentSection],
+            idf: dict[str, float],
+            query_terms: frozenset[str],
+            token_budget: int
+    ) -> list[model.ContentSection]:
+        scores = {
+            section.position: sum(idf.get(term, 0) for term in query_terms & section.terms)
+            for section in sections
+        }
+
+        # Без пересечений с вопросом берем главу с начала
+        ranked = sorted(sections, key=lambda section: (-scores[section.position], section.position))
+
+        selected = []
+        token_count = 0
+        for section in ranked:
+            if token_count + section.token_count > token_budget:
+                continue
+            selected.append(section)
+            token_count += section.token_count
+
+        # В промпт разделы идут в порядке документа
+        return sorted(selected, key=lambda section: section.position)
@@ -0,0 +1,151 @@
+import asyncio
+
+from opentelemetry.trace import StatusCode, SpanKind
+
+from internal import interface, model, common
+
+SUMMARY_SYSTEM_PROMPT = """Ты ведешь краткий конспект диалога студента с AI-ментором.
+Тебе передают предыдущий конспект и новые сообщения диалога.
+Верни обновленный конспект: факты о студенте, изученные темы, договоренности, открытые вопросы.
+Пиши сжато, без приветствий и без JSON, не более 300 слов."""
+
+
+class ChatHistoryWindow(interface.IChatHistoryWindow):
+    """Окно истории чата в пределах бюджета токенов.
+
+    В LLM уходят только самые новые сообщения, которые помещаются в token_budget.
+    Более старые сообщения заменяются кратким содержанием из chats.summary,
+    которое обновляется в фоне, когда за пределами окна накопилось достаточно новых сообщений.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            llm_client: interface.ILLMClient,
+            chat_repo: interface.IChatRepo,
+            token_budget: int,
+            fetch_limit: int,
+            summary_refresh_min_messages: int,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.llm_client = llm_client
+        self.chat_repo = chat_repo
+        self.token_budget = token_budget
+        self.fetch_limit = fetch_limit
+        self.summary_refresh_min_messages = summary_refresh_min_messages
+
+        self._refreshing_chats: set[int] = set()
+        self._background_tasks: set[asyncio.Task] = set()
+
+    def assemble(self, turn_context: model.TurnContext) -> model.HistoryWindow:
+        with self.tracer.start_as_current_span(
+                "ChatHistoryWindow.assemble",
+                kind=SpanKind.INTERNAL,
+                attributes={"chat_id": turn_context.chat.id}
+        ) as span:
+            try:
+                chat = turn_context.chat
+                summary_tokens = common.estimate_tokens(chat.summary)
+                token_count = summary_tokens
+
+                # Идем от новых сообщений к старым, последнее сообщение берем всегда
+                window = []
+                for message in reversed(turn_context.messages):
+                    message_tokens = common.estimate_tokens(message.text) + common.MESSAGE_TOKEN_OVERHEAD
+                    if window and token_count + message_tokens > self.token_budget:
+                        break
+                    window.append(message)
+                    token_count += message_tokens
+                window.reverse()
+
+                if window:
+                    self._maybe_refresh_summary(turn_context, window[0].id)
+
+                span.set_attributes({
+                    "history.loaded_messages": len(turn_context.messages),
+                    "history.window_messages": len(window),
+                    "history.summary_tokens": summary_tokens,
+                    "history.tokens": token_count,
+                })
+                span.set_status(StatusCode.OK)
+                return model.HistoryWindow(
+                    messages=window,
+                    summary=chat.summary,
+                    token_count=token_count,
+                )
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    def _maybe_refresh_summary(self, turn_context: model.TurnContext, window_start_id: int):
+        chat = turn_context.chat
+        if chat.id in self._refreshing_chats:
+            return
+
+        unsummarized = [
+            message for message in turn_context.messages
+            if chat.summary_until_message_id < message.id < window_start_id
+        ]
+        # Выборка обрезана лимитом: до нее могут быть сообщения, еще не попавшие в конспект
+        history_truncated = (
+                len(turn_context.messages) >= self.fetch_limit
+                and turn_context.messages[0].id > chat.summary_until_message_id
+        )
+
+        if len(unsummarized) < self.summary_refresh_min_messages and not history_truncated:
+            return
+
+        self._refreshing_chats.add(chat.id)
+        task = asyncio.create_task(self._refresh_summary(chat, window_start_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _refresh_summary(self, chat: model.Chat, window_start_id: int):
+        with self.tracer.start_as_current_span(
+                "ChatHistoryWindow._refresh_summary",
+                kind=SpanKind.INTERNAL,
+                attributes={"chat_id": chat.id, "window_start_id": window_start_id}
+        ) as span:
+            try:
+                summary = chat.summary
+                summary_until_message_id = chat.summary_until_message_id
+
+                while True:
+                    messages = await self.chat_repo.get_messages_range(
+                        chat.id,
+                        summary_until_message_id,
+                        window_start_id,
+                        self.fetch_limit
+                    )
+                    if not messages:
+                        break
+
+                    summary = await self._summarize(summary, messages)
+                    summary_until_message_id = messages[-1].id
+
+                    await self.chat_repo.update_chat_summary(chat.id, summary, summary_until_message_id)
+
+                span.set_attribute("summary_until_message_id", summary_until_message_id)
+                span.set_status(StatusCode.OK)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                self.logger.warning(f"Не удалось обновить краткое содержание чата {chat.id}: {err}")
+            finally:
+                self._refreshing_chats.discard(chat.id)
+
+    async def _summarize(self, summary: str, messages: list[model.Message]) -> str:
+        transcript = "\n".join(f"{message.role}: {message.text}" for message in messages)
+        request = model.Message(
+            id=0,
+            chat_id=messages[0].chat_id,
+            role=common.Roles.user,
+            text=f"ПРЕДЫДУЩИЙ КОНСПЕКТ:\n{summary or 'Нет'}\n\nНОВЫЕ СООБЩЕНИЯ:\n{transcript}",
+        )
+        return await self.llm_client.generate(
+            history=[request],
+            system_prompt=SUMMARY_SYSTEM_PROMPT,
+            temperature=0.2
+        )
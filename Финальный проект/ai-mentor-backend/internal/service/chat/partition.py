@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from opentelemetry.trace import StatusCode, SpanKind
+
+from internal import interface
+
+
+class MessagePartitionMaintainer(interface.IMessagePartitionMaintainer):
+    """Обслуживание партиций messages по диапазонам id.
+
+    Впереди текущего id держится partitions_ahead пустых партиций, чтобы вставка
+    никогда не упиралась в отсутствующий диапазон. Партиции, все сообщения которых
+    старше retention_days, отключаются и переносятся в схему messages_archive,
+    retention_days = 0 отключает архивирование.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            partition_repo: interface.IMessagePartitionRepo,
+            partition_size: int,
+            partitions_ahead: int,
+            retention_days: int,
+            check_interval: int,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.partition_repo = partition_repo
+        self.partition_size = partition_size
+        self.partitions_ahead = partitions_ahead
+        self.retention_days = retention_days
+        self.check_interval = check_interval
+
+    async def maintain(self) -> tuple[list[str], list[str]]:
+        with self.tracer.start_as_current_span(
+                "MessagePartitionMaintainer.maintain",
+                kind=SpanKind.INTERNAL,
+        ) as span:
+            try:
+                start_time = time.perf_counter()
+
+                # Несколько воркеров запускают обслуживание одновременно, DDL выполняет один
+                async with self.partition_repo.lock_message_partitions():
+                    created = await self.partition_repo.ensure_message_partitions(
+                        self.partition_size,
+                        self.partitions_ahead
+                    )
+
+                    archived = []
+                    if self.retention_days > 0:
+                        archived = await self.partition_repo.archive_message_partitions(self.retention_days)
+
+                if created or archived:
+                    self.logger.info("Партиции messages обновлены", {
+                        "created": created,
+                        "archived": archived,
+                        "duration": time.perf_counter() - start_time,
+                    })
+
+                span.set_attributes({
+                    "partitions.created": len(created),
+                    "partitions.archived": len(archived),
+                })
+                span.set_status(StatusCode.OK)
+                return created, archived
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def run(self):
+        while True:
+            try:
+                await self.maintain()
+            except Exception as err:
+                # Ошибка обслуживания не должна останавливать цикл, следующая попытка через check_interval
+                self.logger.error(f"Ошибка обслуживания партиций messages: {err}")
+            await asyncio.sleep(self.check_interval)
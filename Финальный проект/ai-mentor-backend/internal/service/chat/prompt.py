@@ -1,29 +1,66 @@
+import asyncio
+import time
+from typing import Awaitable, TypeVar
+
+from opentelemetry import trace
 from opentelemetry.trace import Status, StatusCode, SpanKind
 
-from internal import interface
-from .topic_formatter import EducationDataFormatter
+from internal import interface, model, common
+from .template import PromptTemplate
+from .prompt_templates import REGISTRATOR_TEMPLATE, INTERVIEW_TEMPLATE, TEACHER_TEMPLATE, TEST_TEMPLATE
+
+T = TypeVar("T")
 
 
 class PromptGenerator(interface.IPromptGenerator):
     def __init__(
             self,
             tel: interface.ITelemetry,
-            student_repo: interface.IStudentRepo,
             topic_repo: interface.ITopicRepo,
+            edu_catalog: interface.IEduCatalog,
+            content_store: interface.IContentStore,
+            fetch_timeout: float,
+            content_token_budget: int,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
-        self.student_repo = student_repo
         self.topic_repo = topic_repo
-
-
-    async def _format_student_context(self, student_id: int) -> str:
-        students = await self.student_repo.get_by_id(student_id)
-        student = students[0] if students else None
-
-        if not student:
-            raise ValueError(f"Студент с ID {student_id} не найден")
-
+        self.edu_catalog = edu_catalog
+        self.content_store = content_store
+        self.fetch_timeout = fetch_timeout
+        self.content_token_budget = content_token_budget
+
+        # Последний полученный каталог: им отвечаем, если обновление не уложилось в fetch_timeout
+        self._content_metadata: str | None = None
+
+        # Шаблоны разбираются один раз, дальше в запросах заполняются только слоты
+        self.templates = {
+            common.Experts.registrator: PromptTemplate(common.Experts.registrator, REGISTRATOR_TEMPLATE),
+            common.Experts.interview: PromptTemplate(common.Experts.interview, INTERVIEW_TEMPLATE),
+            common.Experts.teacher: PromptTemplate(common.Experts.teacher, TEACHER_TEMPLATE),
+            common.Experts.test: PromptTemplate(common.Experts.test, TEST_TEMPLATE),
+        }
+        self.logger.info("Шаблоны промптов скомпилированы", self.get_prefix_hashes())
+
+    def get_prefix_hashes(self) -> dict[str, str]:
+        """Хэши статических префиксов промптов по экспертам, для мониторинга кэширования у провайдера"""
+        return {expert: template.prefix_hash for expert, template in self.templates.items()}
+
+    async def _fetch(self, name: str, aw: Awaitable[T], bounded: bool = True) -> T:
+        """Ожидает одну загрузку для промпта с таймаутом и пишет ее длительность событием в span"""
+        span = trace.get_current_span()
+        start_time = time.perf_counter()
+        try:
+            return await asyncio.wait_for(aw, self.fetch_timeout if bounded else None)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Загрузка {name} для промпта не уложилась в {self.fetch_timeout} с")
+        finally:
+            span.add_event("prompt_fetch", {
+                "fetch.name": name,
+                "fetch.duration_ms": (time.perf_counter() - start_time) * 1000,
+            })
+
+    def _format_student_context(self, student: model.Student) -> str:
         return f"""ПРОФИЛЬ СТУДЕНТА:
 - Текущий эксперт: {student.current_expert or 'Не указан'}
 - Текущая тема: {student.current_topic or 'Не указана'}
@@ -49,29 +86,43 @@ class PromptGenerator(interface.IPromptGenerator):
 """
 
     async def _format_all_content_metadata(self) -> str:
-        all_topic = await self.topic_repo.get_all_topic()
-        all_block = await self.topic_repo.get_all_block()
-        all_chapter = await self.topic_repo.get_all_chapter()
-
-        formatter = EducationDataFormatter(all_topic, all_block, all_chapter)
-
-        flat_json = formatter.to_flat_json()
-        hierarchical_json = formatter.to_hierarchical_json()
-
-        return f"""СОДЕРЖАНИЕ ОБУЧАЮЩЕГО МАТЕРИАЛА{{
-            "flat": {flat_json},
-            "hierarchical": {hierarchical_json}
-        }}"""
-
-    async def _get_current_content_context(self, student_id: int) -> str:
+        if self._content_metadata is None:
+            # Первый каталог подменить нечем, ждем его без таймаута
+            self._content_metadata = await self._fetch(
+                "catalog",
+                self.edu_catalog.get_content_metadata(),
+                bounded=False
+            )
+            return self._content_metadata
+
+        # Обновление каталога не отменяется по таймауту: его результат пригодится следующим ходам
+        refresh = asyncio.ensure_future(self.edu_catalog.get_content_metadata())
+        try:
+            self._content_metadata = await self._fetch("catalog", asyncio.shield(refresh))
+        except TimeoutError as err:
+            refresh.add_done_callback(self._store_refreshed_catalog)
+            self.logger.warning(f"{err}, используется предыдущий каталог")
+        return self._content_metadata
+
+    def _store_refreshed_catalog(self, refresh: asyncio.Future):
+        if refresh.cancelled():
+            return
+        if refresh.exception() is not None:
+            self.logger.warning(f"Ошибка обновления каталога: {refresh.exception()}")
+            return
+        self._content_metadata = refresh.result()
+
+    @staticmethod
+    def _content_query(turn_context: model.TurnContext) -> str:
+        # Короткие вопросы вроде "объясни подробнее" относятся к предыдущей реплике
+        if turn_context.messages:
+            return turn_context.messages[-1].text + "\n" + turn_context.query
+        return turn_context.query
+
+    async def _get_current_content_context(self, turn_context: model.TurnContext) -> str:
         """Получает контекст текущего изучаемого контента"""
         try:
-            students = await self.student_repo.get_by_id(student_id)
-            student = students[0] if students else None
-
-            if not student:
-                raise ValueError(f"Студент с ID {student_id} не найден")
-
+            student = turn_context.student
             context_parts = ["ТЕКУЩИЙ КОНТЕНТ:"]
 
             # Обработка текущей темы
@@ -83,46 +134,40 @@ class PromptGenerator(interface.IPromptGenerator):
             else:
                 context_parts.append("- Тема: Не выбрана")
 
-            # Обработка текущего блока
+            # Обработка текущего блока, строка уже загружена вместе с контекстом хода
             if student.current_block:
-                block_id = list(student.current_block.keys())[0]  # Используем keys()
-                try:
-                    blocks = await self.topic_repo.get_block_by_id(int(block_id))
-                    if blocks:
-                        block = blocks[0]
-                        context_parts.append(f"- Блок: {block.name}")
-                        context_parts.append(f"- ID Блока: {block.id}")
-                except Exception as e:
-                    self.logger.warning(f"Ошибка загрузки блока {block_id}: {e}")
-                    context_parts.append("- Блок: Ошибка загрузки")
+                block = turn_context.current_block
+                if block:
+                    context_parts.append(f"- Блок: {block.name}")
+                    context_parts.append(f"- ID Блока: {block.id}")
             else:
                 context_parts.append("- Блок: Не выбран")
 
             # Обработка текущей главы
             if student.current_chapter:
-                chapter_id = list(student.current_chapter.keys())[0]  # Используем keys()
-                try:
-                    chapters = await self.topic_repo.get_chapter_by_id(int(chapter_id))
-                    if chapters:
-                        chapter = chapters[0]
-                        context_parts.append(f"- Глава: {chapter.name}")
-                        context_parts.append(f"- ID Главы: {chapter.id}")
-
-                        # Безопасная загрузка содержимого главы
-                        if chapter.content_file_id:
-                            try:
-                                chapter_content, _ = await self.topic_repo.download_file(
-                                    chapter.content_file_id,
-                                    chapter.name,
-                                )
-                                if chapter_content:
-                                    context_parts.append(f"- Содержание главы доступно")
-                            except Exception as e:
-                                self.logger.warning(f"Ошибка загрузки содержимого главы: {e}")
-                                context_parts.append(f"- Содержание главы: Ошибка загрузки")
-                except Exception as e:
-                    self.logger.warning(f"Ошибка загрузки главы {chapter_id}: {e}")
-                    context_parts.append("- Глава: Ошибка загрузки")
+                chapter = turn_context.current_chapter
+                if chapter:
+                    context_parts.append(f"- Глава: {chapter.name}")
+                    context_parts.append(f"- ID Главы: {chapter.id}")
+
+                    # Разделы главы, относящиеся к вопросу студента, в пределах бюджета токенов
+                    if chapter.content_file_id:
+                        try:
+                            sections = await self._fetch("chapter_content", self.content_store.select(
+                                common.ContentFile(
+                                    fid=chapter.content_file_id,
+                                    name=chapter.name,
+                                    updated_at=chapter.updated_at,
+                                ),
+                                self._content_query(turn_context),
+                                self.content_token_budget,
+                            ))
+                            if sections:
+                                context_parts.append("- Содержание главы (фрагменты):")
+                                context_parts.append("\n\n".join(section.text for section in sections))
+                        except Exception as e:
+                            self.logger.warning(f"Ошибка загрузки содержимого главы: {e}")
+                            context_parts.append(f"- Содержание главы: Ошибка загрузки")
             else:
                 context_parts.append("- Глава: Не выбрана")
 
@@ -139,200 +184,34 @@ class PromptGenerator(interface.IPromptGenerator):
         ) as span:
             formatted_all_topic = await self._format_all_content_metadata()
             try:
-                prompt = f"""
-КТО ТЫ:
-Ты эксперт по приветствию и регистрации пользователя.
-Твоя главная задача - представиться и собрать информацию о новом студенте для регистрации и логина.
-
-В системе есть следующие эксперты:
-- Эксперт по регистрации (ты) - проводишь регистрацию и логин (registrator)
-- Эксперт по интервью - проводит первичное интервью и профилирование (interview_expert)
-- Преподаватель - объясняет материал и ведет обучение (teacher)
-- Эксперт по тестированию - проверяет знания и оценивает прогресс (test_expert)
-
-{formatted_all_topic}
-
-ФОРМАТ ТВОИХ ОТВЕТОВ:
-Ты должен возвращать ответ в специальном JSON формате с двумя полями:
-1. "user_message" - сообщение для студента (обычный дружелюбный текст)
-2. "metadata" - объект с командами и описанием действий
-
-ПРИМЕР ПРАВИЛЬНОГО ОТВЕТА:
-```json
-{{
-    "user_message": "Я зарегистрировал вас в системе, давайте пройдем интервью для составления личного плана обучения",
-    "metadata": {{
-        "commands": [
-            {{
-                "description": "Создаю Account и Student в БД",
-                "name": "register_user",
-                "params": {{"login": "student_login", "password": "student_password"}}
-            }}
-    ],
-    }}
-}}
-```
-
-ВАЖНО О МЕТАДАННЫХ:
-- ВСЕГДА включай поле "actions" с описанием и командами
-- Если переключаешься на другого эксперта, добавляй "next_expert"
-- В "description" объясняй, что ты делаешь понятным языком
-- Команды должны точно соответствовать системным требованиям
-
-ЗАПРЕЩЕНО:
-- Давать гарантии трудоустройства
-- Обещать конкретные сроки или результаты
-- Критиковать без конструктивных предложений
-- Торопить студента или пропускать этапы
-- Создавать нереалистичные планы обучения
-- Включать команды в user_message - только в metadata
-
-КОМАНДЫ, КОТОРЫЕ ТЫ МОЖЕШЬ ИСПОЛЬЗОВАТЬ:
-- register_student: 
-параметры:
-{{"login": "student_login", "password": "student_password"}}
-описание: "Когда собрали все данные с нового студента"
-- login_student: 
-параметры:
-{{"login": "student_login", "password": "student_password"}}
-описание: "если студент уже зарегистрирован в системе и собрали все данные"
-- switch_to_next_expert: 
-параметры:
-{{"next_expert": "expert_name"}}
-описание: "Когда необходимо переключиться на другого эксперта"
-
-ПОМНИ: Возвращай ТОЛЬКО валидный JSON без дополнительного текста!
-"""
+                template = self.templates[common.Experts.registrator]
+                span.set_attribute("prompt.prefix_hash", template.prefix_hash)
+                prompt = template.render(
+                    catalog=formatted_all_topic
+                )
                 return prompt
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(Status(StatusCode.ERROR, str(err)))
                 raise err
 
-    async def get_interview_expert_prompt(self, student_id: int) -> str:
+    async def get_interview_expert_prompt(self, turn_context: model.TurnContext) -> str:
         """Генерирует промпт для эксперта по интервью"""
         with self.tracer.start_as_current_span(
                 "EduPromptService.get_interview_expert_prompt",
                 kind=SpanKind.INTERNAL,
-                attributes={"student_id": student_id}
+                attributes={"student_id": turn_context.student.id}
         ) as span:
             try:
-                student_context = await self._format_student_context(student_id)
+                student_context = self._format_student_context(turn_context.student)
                 formatted_all_topic = await self._format_all_content_metadata()
 
-                prompt = f"""КТО ТЫ:
-Ты эксперт по проведению первичного интервью для персонализации обучения в системе AI-ментора.
-Твоя главная задача - собрать информацию о новом студенте для создания персонального плана обучения.
-
-В системе есть следующие эксперты:
-- Эксперт по регистрации - проводишь регистрацию и логин (registrator)
-- Эксперт по интервью (ты) - проводит первичное интервью и профилирование (interview_expert)
-- Преподаватель - объясняет материал и ведет обучение (teacher)
-- Эксперт по тестированию - проверяет знания и оценивает прогресс (test_expert)
-
-{student_context}
-
-{formatted_all_topic}
-
-ФОРМАТ ТВОИХ ОТВЕТОВ:
-Ты должен возвращать ответ в специальном JSON формате с двумя полями:
-1. "user_message" - сообщение для студента (обычный дружелюбный текст)
-2. "metadata" - объект с командами и описанием действий
-
-ПРИМЕР ПРАВИЛЬНОГО ОТВЕТА:
-```json
-{{
-    "user_message": "Я зарегистрировал вас в системе, давайте пройдем интервью для составления личного плана обучения",
-    "metadata": {{
-        "actions": [
-            {{
-               "description": "Создаю Account и Student в БД",
-                "name": "register_user",
-                "params": {{"login": "student_login", "password": "student_password"}}
-            }}
-    ],
-    }}
-}}
-```
-
-ЭТАПЫ ИНТЕРВЬЮ И КОМАНДЫ:
-1. WELCOME - Приветствие и знакомство
-2. BACKGROUND - Выяснение опыта программирования и образования
-3. GOALS - Определение целей обучения и карьерных планов
-4. PREFERENCES - Изучение предпочтений в обучении
-6. PLAN_GENERATION - Создание персонального плана обучения
-7. COMPLETE - Завершение интервью
-
-ПРИНЦИПЫ ПРОВЕДЕНИЯ ИНТЕРВЬЮ:
-- Задавай 1-2 вопроса за раз, не перегружай студента
-- Адаптируй вопросы под ответы студента
-- Будь дружелюбным, поддерживающим и терпеливым
-- В metadata указывай команды для сохранения информации после каждого ответа
-- Переходи к следующему этапу только после сбора достаточной информации
-- Уточняй неясные или неполные ответы
-
-ВАЖНО О МЕТАДАННЫХ:
-- ВСЕГДА включай поле "actions" с описанием и командами
-- Указывай текущий этап в "current_stage"
-- Если переключаешься на другого эксперта, добавляй "next_expert"
-- В "description" объясняй, что ты делаешь понятным языком
-- Команды должны точно соответствовать системным требованиям
-
-ЗАПРЕЩЕНО:
-- Давать гарантии трудоустройства
-- Обещать конкретные сроки или результаты
-- Критиковать без конструктивных предложений
-- Торопить студента или пропускать этапы
-- Создавать нереалистичные планы обучения
-- Включать команды в user_message - только в metadata
-
-КОМАНДЫ, КОТОРЫЕ ТЫ МОЖЕШЬ ИСПОЛЬЗОВАТЬ:
-- update_student_background
-Параметры:
-{{
-    "programming_experience": "Описание опыта ученика в программировании"
-    "education_background": "Описание образования ученика"
-
-    "learning_goals": "Цели обучения ученика"
-    "career_goals": "Карьерные цели ученика"
-    "timeline": "Ожидаемый срок обучения"
-
-    "learning_style": "Предпочтение в стиле обучения"
-    "lesson_duration": "Длительность урока"
-    "preferred_difficulty": "Ожидаемая сложность" 
-
-    "recommended_topics": {{
-        "topic_id1": "topic_name1",
-        "topic_id2": "topic_name2",
-    }}
-    "recommended_blocks": {{
-        "topic_id1": "topic_name1",
-        "topic_id2": "topic_name2",
-    }}
-    "approved_topics": {{
-        "topic_id1": "topic_name1",
-        "topic_id2": "topic_name2",
-    }}
-    "approved_blocks": {{
-        "topic_id1": "topic_name1",
-        "topic_id2": "topic_name2",
-    }}
-    "approved_chapters": {{
-        "topic_id1": "topic_name1",
-        "topic_id2": "topic_name2",
-    }}
-
-    strong_areas: "Описание сильных ученика"
-    weak_areas: "Описание слабых сторон ученика"
-}}
-Описание: "Вызывать, когда полностью можно сформировать параметры для обновление полей у студента в БД"
-
-- switch_to_next_expert: 
-Параметры: {{"next_expert": "expert_name"}}
-Описание: "Когда необходимо переключиться на другого эксперта"
-
-ПОМНИ: Возвращай ТОЛЬКО валидный JSON без дополнительного текста!
-"""
+                template = self.templates[common.Experts.interview]
+                span.set_attribute("prompt.prefix_hash", template.prefix_hash)
+                prompt = template.render(
+                    catalog=formatted_all_topic,
+                    student_context=student_context
+                )
 
                 span.set_status(Status(StatusCode.OK))
                 return prompt
@@ -342,94 +221,24 @@ class PromptGenerator(interface.IPromptGenerator):
                 span.set_status(Status(StatusCode.ERROR, str(err)))
                 raise err
 
-    async def get_teacher_prompt(self, student_id: int) -> str:
+    async def get_teacher_prompt(self, turn_context: model.TurnContext) -> str:
         """Генерирует промпт для преподавателя"""
         with self.tracer.start_as_current_span(
                 "EduPromptService.get_teacher_prompt",
                 kind=SpanKind.INTERNAL,
-                attributes={"student_id": student_id}
+                attributes={"student_id": turn_context.student.id}
         ) as span:
             try:
                 # Получаем контексты
-                student_context = await self._format_student_context(student_id)
-                content_context = await self._get_current_content_context(student_id)
-
-                prompt = f"""КТО ТЫ:
-Ты опытный преподаватель и ментор в системе AI-ментора.
-Ты помогаешь студентам изучать материал, объясняешь сложные концепции и направляешь в обучении.
-
-В системе есть следующие эксперты:
-- Эксперт по регистрации - проводишь регистрацию и логин (registrator)
-- Эксперт по интервью - проводит первичное интервью и профилирование (interview_expert)
-- Преподаватель (ты) - объясняет материал и ведет обучение (teacher)
-- Эксперт по тестированию - проверяет знания и оценивает прогресс (test_expert)
-
-{student_context}
-
-{content_context}
-
-ФОРМАТ ТВОИХ ОТВЕТОВ:
-Ты должен возвращать ответ в специальном JSON формате с двумя полями:
-1. "user_message" - сообщение для студента (обычный дружелюбный текст)
-2. "metadata" - объект с командами и описанием действий
-
-ПРИМЕР ПРАВИЛЬНОГО ОТВЕТА:
-```json
-{{
-    "user_message": "Я зарегистрировал вас в системе, давайте пройдем интервью для составления личного плана обучения",
-    "metadata": {{
-        "actions": [
-            {{
-                "description": "Создаю Account и Student в БД",
-                "name": "register_user",
-                "params": {{"login": "student_login", "password": "student_password"}}
-            }}
-    ],
-    }}
-}}
-```
-
-КОМАНДЫ, КОТОРЫЕ ТЫ МОЖЕШЬ ИСПОЛЬЗОВАТЬ:
-- change_edu_content
-Параметры: {{
-    "topic_id": "id темы",
-    "topic_name": "название темы"
-    "block_id: "id блока",
-    "block_name": "название блока",
-    "chapter_id": "id главы"
-    "chapter_name": "название главы"
-}}
-Описание: "Студент хочет перейти на другую тему, блок или главу"
-
-- switch_to_next_expert: 
-Параметры: {{"next_expert": "expert_name"}}
-Описание: "Когда необходимо переключиться на другого эксперта"
-
-ПРИМЕРЫ ОТВЕТОВ:
-
-ПРИНЦИПЫ ПРЕПОДАВАНИЯ:
-1. От простого к сложному
-2. Связь с уже изученным материалом
-3. Конкретные примеры из реальной жизни
-4. Проверка понимания через вопросы
-5. Поощрение вопросов от студента
-
-СТИЛЬ ОБЩЕНИЯ:
-- Терпеливый и понимающий
-- Поощряющий вопросы
-- Адаптирующийся под уровень студента
-- Мотивирующий при трудностях
-- Празднующий успехи
-- Визуализируй с помощью ------
-
-ЗАПРЕЩЕНО:
-- Критиковать без конструктива
-- Обещать быстрые результаты
-- Игнорировать стиль обучения студента
-- Перегружать информацией
-- Включать команды в user_message
-
-ПОМНИ: Возвращай ТОЛЬКО валидный JSON!"""
+                student_context = self._format_student_context(turn_context.student)
+                content_context = await self._get_current_content_context(turn_context)
+
+                template = self.templates[common.Experts.teacher]
+                span.set_attribute("prompt.prefix_hash", template.prefix_hash)
+                prompt = template.render(
+                    student_context=student_context,
+                    content_context=content_context
+                )
 
                 span.set_status(Status(StatusCode.OK))
                 return prompt
@@ -439,90 +248,25 @@ class PromptGenerator(interface.IPromptGenerator):
                 span.set_status(Status(StatusCode.ERROR, str(err)))
                 raise err
 
-    async def get_test_expert_prompt(self, student_id: int) -> str:
+    async def get_test_expert_prompt(self, turn_context: model.TurnContext) -> str:
         """Генерирует промпт для эксперта по тестированию"""
         with self.tracer.start_as_current_span(
                 "EduPromptService.get_test_expert_prompt",
                 kind=SpanKind.INTERNAL,
-                attributes={"student_id": student_id}
+                attributes={"student_id": turn_context.student.id}
         ) as span:
             try:
 
                 # Получаем контексты
-                student_context = await self._format_student_context(student_id)
-                content_context = await self._get_current_content_context(student_id)
-
-                prompt = f"""КТО ТЫ:
-Ты эксперт по тестированию знаний и оценке прогресса в системе AI-ментора.
-Ты создаешь тесты, проверяешь знания студентов и помогаешь выявить пробелы в обучении.
-
-В системе есть следующие эксперты:
-- Эксперт по регистрации - проводишь регистрацию и логин (registrator)
-- Эксперт по интервью - проводит первичное интервью и профилирование (interview_expert)
-- Преподаватель - объясняет материал и ведет обучение (teacher)
-- Эксперт по тестированию (ты) - проверяет знания и оценивает прогресс (test_expert)
-
-{student_context}
-
-{content_context}
-
-ПРИМЕР ПРАВИЛЬНОГО ОТВЕТА:
-```json
-{{
-    "user_message": "Я зарегистрировал вас в системе, давайте пройдем интервью для составления личного плана обучения",
-    "metadata": {{
-        "actions": [
-            {{
-                "description": "Создаю Account и Student в БД",
-                "name": "register_user",
-                "params": {{"login": "student_login", "password": "student_password"}}
-            }}
-    ],
-    }}
-}}
-```
-
-КРИТЕРИИ ОЦЕНКИ:
-- 90-100% - Отличное понимание материала
-- 75-89% - Хорошее понимание с небольшими пробелами
-- 60-74% - Удовлетворительное понимание, требуется повторение
-- 45-59% - Слабое понимание, необходимо переизучение
-- Менее 45% - Неудовлетворительно, требуется полное переизучение
-
-СТИЛЬ ОБЩЕНИЯ:
-- Объективный и справедливый
-- Четкий в формулировках
-- Поддерживающий при неудачах
-- Мотивирующий к улучшению
-- Конструктивный в критике
-
-ЗАПРЕЩЕНО:
-- Давать ответы заранее
-- Оценивать без объяснений
-- Критиковать личность студента
-- Создавать нереально сложные тесты
-- Игнорировать контекст обучения
-- Включать команды в user_message
-
-КОМАНДЫ, КОТОРЫЕ ТЫ МОЖЕШЬ ИСПОЛЬЗОВАТЬ:
-- approve_topic
-Параметры: {{"topic_id": "id тема", "topic_name": "имя топика"}}
-Описание: "Студент прошел тест по теме хотя бы на 60%"
-
-- approve_block
-Параметры: {{"block_id": "id блока", "block_name": "имя блока"}}
-Описание: "Студент прошел тест по блоку хотя бы на 60%"
-
-- approve_chapter
-Параметры: {{"chapter_id": "id главы", "topic_name": "имя главы"}}
-Описание: "Студент прошел тест по главе хотя бы на 60%"
-
-- switch_to_next_expert: 
-Параметры: {{"next_expert": "expert_name"}}
-Описание: "Когда необходимо переключиться на другого эксперта"
-
-
-ПОМНИ: Возвращай ТОЛЬКО валидный JSON!"""
+                student_context = self._format_student_context(turn_context.student)
+                content_context = await self._get_current_content_context(turn_context)
+
+                template = self.templates[common.Experts.test]
+                span.set_attribute("prompt.prefix_hash", template.prefix_hash)
+                prompt = template.render(
+                    student_context=student_context,
+                    content_context=content_context
+                )
 
                 span.set_status(Status(StatusCode.OK))
                 return prompt
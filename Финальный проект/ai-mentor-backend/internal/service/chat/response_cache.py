@@ -0,0 +1,168 @@
+import hashlib
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from internal import interface
+from internal import common
+
+NON_WORD_PATTERN = re.compile(r"[^\w\s]+")
+SPACES_PATTERN = re.compile(r"\s+")
+
+
+@dataclass
+class _CacheEntry:
+    expert: str
+    chapter_id: int
+    response: str
+    vector: dict[int, float]
+    expires_at: float
+
+
+class ResponseCache(interface.IResponseCache):
+    """Кэш ответов LLM на повторяющиеся вопросы к одной главе.
+
+    Ключ — (эксперт, id главы, нормализованный вопрос). Сначала ищется точное совпадение
+    по хэшу, затем самый похожий вопрос той же главы по косинусной близости
+    эмбеддингов из хэшированных символьных n-грамм. Записи живут ttl секунд,
+    при переполнении вытесняются давно не использованные.
+
+    Вопросы короче min_terms слов («да», «дальше», «4») не ищутся и не сохраняются:
+    их смысл задаёт предыдущая реплика диалога, а не глава.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            ttl: int,
+            max_entries: int,
+            similarity_threshold: float,
+            min_terms: int,
+            ngram_size: int = 3,
+            dimensions: int = 1024,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.min_terms = min_terms
+        self.ngram_size = ngram_size
+        self.dimensions = dimensions
+
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        # Векторный индекс: ключи записей по (эксперт, глава)
+        self._index: dict[tuple[str, int], set[str]] = {}
+
+        self.requests_counter = tel.meter().create_counter(
+            name=common.CHAT_RESPONSE_CACHE_REQUESTS_METRIC,
+            description="Total count of response cache lookups by result (exact, semantic, miss, skipped)",
+            unit="1"
+        )
+
+    def lookup(self, expert: str, chapter_id: int, question: str) -> str | None:
+        normalized = self._normalize(question)
+        if not self._is_cacheable(normalized):
+            self.requests_counter.add(1, {"result": "skipped", "expert": expert})
+            return None
+
+        key = self._key(expert, chapter_id, normalized)
+
+        entry = self._get_alive(key)
+        if entry is not None:
+            self.requests_counter.add(1, {"result": "exact", "expert": expert})
+            return entry.response
+
+        vector = self._embed(normalized)
+        best_key, best_similarity = None, 0.0
+        for candidate_key in list(self._index.get((expert, chapter_id), ())):
+            candidate = self._get_alive(candidate_key, touch=False)
+            if candidate is None:
+                continue
+
+            similarity = self._cosine(vector, candidate.vector)
+            if similarity > best_similarity:
+                best_key, best_similarity = candidate_key, similarity
+
+        if best_key is not None and best_similarity >= self.similarity_threshold:
+            self._entries.move_to_end(best_key)
+            self.requests_counter.add(1, {"result": "semantic", "expert": expert})
+            return self._entries[best_key].response
+
+        self.requests_counter.add(1, {"result": "miss", "expert": expert})
+        return None
+
+    def store(self, expert: str, chapter_id: int, question: str, response: str):
+        normalized = self._normalize(question)
+        if not self._is_cacheable(normalized):
+            return
+
+        key = self._key(expert, chapter_id, normalized)
+
+        self._entries[key] = _CacheEntry(
+            expert=expert,
+            chapter_id=chapter_id,
+            response=response,
+            vector=self._embed(normalized),
+            expires_at=time.monotonic() + self.ttl,
+        )
+        self._entries.move_to_end(key)
+        self._index.setdefault((expert, chapter_id), set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._unindex(evicted_key, evicted)
+
+    def _is_cacheable(self, normalized: str) -> bool:
+        return len(normalized.split()) >= self.min_terms
+
+    def _get_alive(self, key: str, touch: bool = True) -> _CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self._unindex(key, entry)
+            return None
+
+        if touch:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _unindex(self, key: str, entry: _CacheEntry):
+        bucket_key = (entry.expert, entry.chapter_id)
+        keys = self._index.get(bucket_key)
+        if keys is None:
+            return
+
+        keys.discard(key)
+        if not keys:
+            del self._index[bucket_key]
+
+    def _embed(self, normalized: str) -> dict[int, float]:
+        text = f" {normalized} "
+        vector: dict[int, float] = {}
+        for i in range(max(1, len(text) - self.ngram_size + 1)):
+            bucket = zlib.crc32(text[i:i + self.ngram_size].encode()) % self.dimensions
+            vector[bucket] = vector.get(bucket, 0.0) + 1.0
+
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        return {bucket: value / norm for bucket, value in vector.items()}
+
+    @staticmethod
+    def _cosine(a: dict[int, float], b: dict[int, float]) -> float:
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(value * b.get(bucket, 0.0) for bucket, value in a.items())
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        question = question.lower().replace("ё", "е")
+        question = NON_WORD_PATTERN.sub(" ", question)
+        return SPACES_PATTERN.sub(" ", question).strip()
+
+    @staticmethod
+    def _key(expert: str, chapter_id: int, normalized: str) -> str:
+        return hashlib.blake2b(f"{expert}:{chapter_id}:{normalized}".encode(), digest_size=16).hexdigest()
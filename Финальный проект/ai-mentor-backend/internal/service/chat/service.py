@@ -1,7 +1,11 @@
 import json
+import asyncio
+from typing import AsyncIterator
+
 from opentelemetry.trace import StatusCode, SpanKind
 
-from internal import interface, common
+from internal import interface, common, model
+from .stream_parser import UserMessageStreamParser
 
 
 class ChatService(interface.IChatService):
@@ -9,21 +13,25 @@ class ChatService(interface.IChatService):
     def __init__(
             self,
             tel: interface.ITelemetry,
+            db: interface.IDB,
             llm_client: interface.ILLMClient,
             prompt_generator: interface.IPromptGenerator,
-            student_repo: interface.IStudentRepo,
-            topic_repo: interface.ITopicRepo,
             chat_repo: interface.IChatRepo,
-            account_repo: interface.IAccountRepo,
+            history_window: interface.IChatHistoryWindow,
+            command_executor: interface.ICommandExecutor,
+            response_cache: interface.IResponseCache | None,
+            history_fetch_limit: int,
     ):
         self.tracer = tel.tracer()
         self.logger = tel.logger()
+        self.db = db
         self.llm_client = llm_client
         self.prompt_generator = prompt_generator
-        self.student_repo = student_repo
-        self.topic_repo = topic_repo
         self.chat_repo = chat_repo
-        self.account_repo = account_repo
+        self.history_window = history_window
+        self.command_executor = command_executor
+        self.response_cache = response_cache
+        self.history_fetch_limit = history_fetch_limit
 
     async def send_message_to_expert(self, student_id: int, text: str) -> tuple[str, list[common.Command]]:
         """Обработка сообщений для эксперта по регистрации"""
@@ -33,63 +41,211 @@ class ChatService(interface.IChatService):
                 attributes={"student_id": student_id, "text": text}
         ) as span:
             try:
-                student = (await self.student_repo.get_by_id(student_id))[0]
+                turn_context, system_prompt, history_window = await self._prepare_turn(student_id, text)
 
-                chat = await self.chat_repo.get_chat_by_student_id(student_id)
-                if not chat:
-                    _ = await self.chat_repo.create_chat(student_id)
-                    chat = await self.chat_repo.get_chat_by_student_id(student_id)
-                chat_id = chat[0].id
+                cache_scope = self._response_cache_scope(turn_context)
+                response_data = self._get_cached_response(cache_scope, text)
+                span.set_attribute("response_cache.hit", response_data is not None)
 
-                _ = await self.chat_repo.create_message(chat_id, common.Roles.user, text)
+                if response_data is None:
+                    # Получаем ответ от LLM
+                    llm_response = await self.llm_client.generate(
+                        history=history_window.messages,
+                        system_prompt=system_prompt,
+                        temperature=0.3
+                    )
+                    response_data = await self._parse_llm_response(llm_response)
+                    self._store_cached_response(cache_scope, text, response_data)
 
-                if student.current_expert == common.Experts.registrator:
-                    system_prompt = await self.prompt_generator.get_registrator_prompt()
+                user_message, commands = await self._finish_turn(turn_context, response_data)
 
-                if student.current_expert == common.Experts.interview:
-                    system_prompt = await self.prompt_generator.get_interview_expert_prompt(student_id)
+                span.set_status(StatusCode.OK)
+                return user_message, commands
 
-                if student.current_expert == common.Experts.teacher:
-                    system_prompt = await self.prompt_generator.get_teacher_prompt(student_id)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
 
-                if student.current_expert == common.Experts.test:
-                    system_prompt = await self.prompt_generator.get_test_expert_prompt(student_id)
+    async def send_message_to_expert_stream(self, student_id: int, text: str) -> AsyncIterator[common.StreamEvent]:
+        """Потоковая обработка сообщения: user_message отдается по мере генерации,
+        команды выполняются и ответ сохраняется после завершения потока"""
+        with self.tracer.start_as_current_span(
+                "ChatService.send_message_to_expert_stream",
+                kind=SpanKind.INTERNAL,
+                attributes={"student_id": student_id, "text": text}
+        ) as span:
+            try:
+                turn_context, system_prompt, history_window = await self._prepare_turn(student_id, text)
+
+                cache_scope = self._response_cache_scope(turn_context)
+                response_data = self._get_cached_response(cache_scope, text)
+                span.set_attribute("response_cache.hit", response_data is not None)
+
+                if response_data is not None:
+                    yield common.StreamEvent("token", {"text": response_data["user_message"]})
+                else:
+                    parser = UserMessageStreamParser()
+                    first_token = True
+                    async for chunk in self.llm_client.generate_stream(
+                            history=history_window.messages,
+                            system_prompt=system_prompt,
+                            temperature=0.3
+                    ):
+                        delta = parser.feed(chunk)
+                        if delta:
+                            if first_token:
+                                span.add_event("first_token")
+                                first_token = False
+                            yield common.StreamEvent("token", {"text": delta})
+
+                    response_data = await self._parse_llm_response(parser.raw())
+                    self._store_cached_response(cache_scope, text, response_data)
+                user_message, commands = await self._finish_turn(turn_context, response_data)
+
+                yield common.StreamEvent("message", {
+                    "user_message": user_message,
+                    "commands": [command.to_dict() for command in commands],
+                })
 
-                chat_history = await self.chat_repo.get_messages(chat_id)
+                span.set_status(StatusCode.OK)
 
-                # Получаем ответ от LLM
-                llm_response = await self.llm_client.generate(
-                    history=chat_history,
-                    system_prompt=system_prompt,
-                    temperature=0.3
-                )
-                response_data = await self._parse_llm_response(llm_response)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
 
-                user_message = response_data["user_message"]
-                commands = [common.Command(**command) for command in
-                            response_data.get("metadata", {}).get("commands", [])]
+    async def get_messages_page(self, chat_id: int, limit: int, cursor: str | None) -> model.MessagePage:
+        """Keyset-страница истории: limit сообщений перед курсором, от новых страниц к старым"""
+        with self.tracer.start_as_current_span(
+                "ChatService.get_messages_page",
+                kind=SpanKind.INTERNAL,
+                attributes={"chat_id": chat_id, "limit": limit}
+        ) as span:
+            try:
+                before_id = common.MAX_MESSAGE_ID
+                if cursor is not None:
+                    fields = common.decode_cursor(cursor)
+                    # Курсор от другого чата — ошибка клиента, а не пустая страница
+                    if fields.get("chat_id") != chat_id:
+                        raise ValueError(f"Курсор не относится к чату {chat_id}")
+
+                    # bool — подкласс int, а значение вне int4 уронит запрос в БД
+                    before_id = fields.get("before_id")
+                    if type(before_id) is not int or not 1 <= before_id <= common.MAX_MESSAGE_ID:
+                        raise ValueError("Некорректный курсор")
+
+                # Лишнее сообщение показывает, есть ли страница дальше, без отдельного COUNT
+                messages = await self.chat_repo.get_recent_messages(chat_id, limit + 1, before_id)
+
+                next_cursor = None
+                if len(messages) > limit:
+                    messages = messages[1:]
+                    next_cursor = common.encode_cursor({"chat_id": chat_id, "before_id": messages[0].id})
+
+                span.set_attribute("messages_count", len(messages))
+                span.set_status(StatusCode.OK)
+                return model.MessagePage(messages=messages, next_cursor=next_cursor)
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
 
-                _ = await self.chat_repo.create_message(chat_id, common.Roles.assistant, user_message)
+    async def _prepare_turn(
+            self,
+            student_id: int,
+            text: str
+    ) -> tuple[model.TurnContext, str, model.HistoryWindow]:
+        # Студент, чат, текущие блок/глава и последние сообщения приходят одним запросом
+        turn_context = await self.chat_repo.get_turn_context(student_id, self.history_fetch_limit)
+        if turn_context is None:
+            raise ValueError(f"Студент с ID {student_id} не найден")
 
-                if student.current_expert == common.Experts.registrator:
-                    await self._execute_registrator_commands(student_id, commands)
+        chat_id = turn_context.chat.id
+        turn_context.query = text
 
-                if student.current_expert == common.Experts.interview:
-                    await self._execute_interview_commands(student_id, commands)
+        # Сохранение сообщения и сборка промпта друг от друга не зависят
+        message_id, system_prompt = await asyncio.gather(
+            self.chat_repo.create_message(chat_id, common.Roles.user, text),
+            self._build_system_prompt(turn_context),
+        )
+        turn_context.messages.append(model.Message(
+            id=message_id,
+            chat_id=chat_id,
+            text=text,
+            role=common.Roles.user,
+        ))
 
-                if student.current_expert == common.Experts.teacher:
-                    await self._execute_teacher_commands(student_id, commands)
+        history_window = self.history_window.assemble(turn_context)
+        if history_window.summary:
+            system_prompt += f"\n\nКРАТКОЕ СОДЕРЖАНИЕ ПРЕДЫДУЩЕГО ДИАЛОГА:\n{history_window.summary}"
 
-                if student.current_expert == common.Experts.test:
-                    await self._execute_test_commands(student_id, commands)
+        return turn_context, system_prompt, history_window
 
-                span.set_status(StatusCode.OK)
-                return user_message, commands
+    async def _build_system_prompt(self, turn_context: model.TurnContext) -> str:
+        current_expert = turn_context.student.current_expert
 
-            except Exception as err:
-                span.record_exception(err)
-                span.set_status(StatusCode.ERROR, str(err))
-                raise err
+        if current_expert == common.Experts.registrator:
+            return await self.prompt_generator.get_registrator_prompt()
+
+        if current_expert == common.Experts.interview:
+            return await self.prompt_generator.get_interview_expert_prompt(turn_context)
+
+        if current_expert == common.Experts.teacher:
+            return await self.prompt_generator.get_teacher_prompt(turn_context)
+
+        if current_expert == common.Experts.test:
+            return await self.prompt_generator.get_test_expert_prompt(turn_context)
+
+        raise ValueError(f"Неизвестный эксперт: {current_expert}")
+
+    def _response_cache_scope(self, turn_context: model.TurnContext) -> tuple[str, int] | None:
+        """Эксперт и глава, для которых ответ можно взять из кэша, или None, если кэш не применим"""
+        if self.response_cache is None or turn_context.current_chapter is None:
+            return None
+
+        # Ответы test-эксперта оценивают ответ конкретного студента, делиться ими нельзя
+        expert = turn_context.student.current_expert
+        if expert != common.Experts.teacher:
+            return None
+
+        return expert, turn_context.current_chapter.id
+
+    def _get_cached_response(self, cache_scope: tuple[str, int] | None, text: str) -> dict | None:
+        if cache_scope is None:
+            return None
+
+        user_message = self.response_cache.lookup(*cache_scope, text)
+        if user_message is None:
+            return None
+
+        return {"user_message": user_message, "metadata": {"commands": []}}
+
+    def _store_cached_response(self, cache_scope: tuple[str, int] | None, text: str, response_data: dict):
+        # Ответы с командами меняют состояние студента, их повторять нельзя
+        if cache_scope is None or response_data.get("error") or response_data["metadata"]["commands"]:
+            return
+
+        self.response_cache.store(*cache_scope, text, response_data["user_message"])
+
+    async def _finish_turn(
+            self,
+            turn_context: model.TurnContext,
+            response_data: dict
+    ) -> tuple[str, list[common.Command]]:
+        student = turn_context.student
+        user_message = response_data["user_message"]
+        commands = [common.Command(**command) for command in
+                    response_data.get("metadata", {}).get("commands", [])]
+
+        # Ответ и изменения состояния от команд фиксируются вместе. Сообщение студента сохранено
+        # до вызова LLM: держать транзакцию и соединение открытыми на время генерации нельзя
+        async with self.db.transaction():
+            _ = await self.chat_repo.create_message(turn_context.chat.id, common.Roles.assistant, user_message)
+
+            await self.command_executor.execute(student, commands)
+
+        return user_message, commands
 
     async def _parse_llm_response(self, response: str) -> dict:
         try:
@@ -115,7 +271,8 @@ class ChatService(interface.IChatService):
                 self.logger.warning("Отсутствует поле 'user_message' в ответе LLM")
                 return {
                     "user_message": "Извините, произошла ошибка обработки ответа. Попробуйте еще раз.",
-                    "metadata": {"commands": []}
+                    "metadata": {"commands": []},
+                    "error": True
                 }
 
             # Проверяем структуру metadata
@@ -130,128 +287,13 @@ class ChatService(interface.IChatService):
             self.logger.error(f"Ошибка парсинга JSON от LLM: {e}, response: {response}")
             return {
                 "user_message": "Извините, произошла ошибка обработки ответа. Попробуйте переформулировать вопрос.",
-                "metadata": {"commands": []}
+                "metadata": {"commands": []},
+                "error": True
             }
         except Exception as e:
             self.logger.error(f"Неожиданная ошибка при обработке ответа LLM: {e}")
             return {
                 "user_message": "Произошла системная ошибка. Обратитесь к администратору.",
-                "metadata": {"commands": []}
+                "metadata": {"commands": []},
+                "error": True
             }
-
-    async def _execute_registrator_commands(self, student_id: int, commands: list[common.Command]):
-        for command in commands:
-            command_name = command.name
-            params = command.params
-
-            if command_name == "register_student":
-                await self._register_student(**params)
-            elif command_name == "login_student":
-                await self._login_student(**params)
-            elif command_name == "switch_to_next_expert":
-                await self._switch_expert(student_id, params.get("next_expert"))
-
-    async def _execute_interview_commands(self, student_id: int, commands: list[common.Command]):
-        for command in commands:
-            command_name = command.name
-            params = command.params
-
-            if command_name == "update_student_background":
-                background = params
-                await self._update_student_background(student_id, background)
-            elif command_name == "switch_to_next_expert":
-                next_expert = params["next_expert"]
-                await self._switch_expert(student_id, next_expert)
-
-    async def _execute_teacher_commands(self, student_id: int, commands: list[common.Command]):
-        for command in commands:
-            command_name = command.name
-            params = command.params
-
-            if command_name == "change_edu_content":
-                topic_id = params["topic_id"]
-                topic_name = params["topic_name"]
-                block_id = params["block_id"]
-                block_name = params["block_name"]
-                chapter_id = params["chapter_id"]
-                chapter_name = params["chapter_name"]
-                await self._change_edu_content(
-                    student_id,
-                    topic_id,
-                    topic_name,
-                    block_id,
-                    block_name,
-                    chapter_id,
-                    chapter_name,
-                )
-            elif command_name == "switch_to_next_expert":
-                next_expert = params["next_expert"]
-                await self._switch_expert(student_id, next_expert)
-
-    async def _execute_test_commands(self, student_id: int, commands: list[common.Command]):
-        for command in commands:
-            command_name = command.name
-            params = command.params
-
-            if command_name == "approve_topic":
-                topic_id = params["topic_id"]
-                topic_name = params["topic_name"]
-                await self._approve_topic(student_id, topic_id, topic_name)
-
-            elif command_name == "approve_block":
-                block_id = params["block_id"]
-                block_name = params["block_name"]
-                await self._approve_block(student_id, block_id, block_name)
-
-            elif command_name == "approve_chapter":
-                chapter_id = params["chapter_id"]
-                chapter_name = params["chapter_name"]
-                await self._approve_chapter(student_id, chapter_id, chapter_name)
-
-            elif command_name == "switch_to_next_expert":
-                await self._switch_expert(student_id, params.get("next_expert"))
-
-    # Методы для работы с данными
-    async def _register_student(self, login: str, password: str) -> tuple[int, int]:
-        account_id = await self.account_repo.create_account(login, password)
-        student_id = await self.student_repo.create_student(account_id)
-        return account_id, student_id
-
-    async def _login_student(self, login: str, password: str):
-        account = await self.account_repo.get_account_by_login(login)
-        if not account:
-            raise ValueError("Аккаунт не найден")
-
-        if account[0].password != password:
-            raise ValueError("Неверный пароль")
-
-        return account[0].id
-
-    async def _update_student_background(self, student_id: int, background: dict):
-        await self.student_repo.update_student_background(student_id, background)
-
-    async def _change_edu_content(
-            self,
-            student_id: int,
-            topic_id: int,
-            topic_name: str,
-            block_id: int,
-            block_name: str,
-            chapter_id: int,
-            chapter_name: str
-    ):
-        await self.topic_repo.update_current_topic(student_id, topic_id, topic_name)
-        await self.topic_repo.update_current_block(student_id, block_id, block_name)
-        await self.topic_repo.update_current_chapter(student_id, chapter_id, chapter_name)
-
-    async def _approve_topic(self, student_id: int, topic_id: int, topic_name: str):
-        await self.student_repo.add_topic_to_approved_topics(student_id, topic_id, topic_name)
-
-    async def _approve_block(self, student_id: int, block_id: int, block_name: str):
-        await self.student_repo.add_block_to_approved_blocks(student_id, block_id, block_name)
-
-    async def _approve_chapter(self, student_id: int, chapter_id: int, chapter_name: str):
-        await self.student_repo.add_chapter_to_approved_chapters(student_id, chapter_id, chapter_name)
-
-    async def _switch_expert(self, student_id: int, next_expert: str):
-        await self.student_repo.change_current_expert(student_id, next_expert)
@@ -0,0 +1,100 @@
+import json
+import re
+
+
+class UserMessageStreamParser:
+    """Инкрементальный парсер JSON ответа LLM.
+
+    Копит сырой ответ по мере прихода токенов и отдает уже декодированный
+    текст строкового поля (по умолчанию "user_message"), не дожидаясь конца JSON.
+    """
+
+    def __init__(self, field: str = "user_message"):
+        self._field_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._raw = ""
+        self._pos = 0
+        self._state = "search"  # search -> value -> done
+
+    def feed(self, chunk: str) -> str:
+        """Добавляет очередной кусок ответа и возвращает новый текст поля"""
+        self._raw += chunk
+
+        if self._state == "search":
+            match = self._field_pattern.search(self._raw, self._pos)
+            if not match:
+                return ""
+            self._pos = match.end()
+            self._state = "value"
+
+        if self._state == "value":
+            return self._read_value()
+
+        return ""
+
+    def raw(self) -> str:
+        """Полный сырой ответ LLM для финального парсинга"""
+        return self._raw
+
+    def is_done(self) -> bool:
+        return self._state == "done"
+
+    def _read_value(self) -> str:
+        decoded = []
+        raw = self._raw
+        pos = self._pos
+
+        while pos < len(raw):
+            char = raw[pos]
+
+            if char == '"':
+                self._state = "done"
+                pos += 1
+                break
+
+            if char != "\\":
+                decoded.append(char)
+                pos += 1
+                continue
+
+            # Escape-последовательность, ждем, пока она придет целиком
+            escape_len = self._escape_length(raw, pos)
+            if escape_len is None:
+                break
+
+            decoded.append(self._decode_escape(raw[pos:pos + escape_len]))
+            pos += escape_len
+
+        self._pos = pos
+        return "".join(decoded)
+
+    @staticmethod
+    def _escape_length(raw: str, pos: int) -> int | None:
+        if pos + 1 >= len(raw):
+            return None
+
+        if raw[pos + 1] != "u":
+            return 2
+
+        if pos + 6 > len(raw):
+            return None
+
+        # Суррогатную пару (\uD83D\uDE00) декодируем только целиком
+        try:
+            is_high_surrogate = 0xD800 <= int(raw[pos + 2:pos + 6], 16) <= 0xDBFF
+        except ValueError:
+            return 6
+
+        if is_high_surrogate:
+            if pos + 12 > len(raw):
+                return None
+            if raw[pos + 6:pos + 8] == "\\u":
+                return 12
+
+        return 6
+
+    @staticmethod
+    def _decode_escape(sequence: str) -> str:
+        try:
+            return json.loads('"' + sequence + '"').encode("utf-16", "surrogatepass").decode("utf-16")
+        except (json.JSONDecodeError, UnicodeError):
+            return "\ufffd"
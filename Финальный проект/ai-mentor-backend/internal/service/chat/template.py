@@ -0,0 +1,34 @@
+import hashlib
+import re
+
+SLOT_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+
+class PromptTemplate:
+    """Шаблон промпта, разобранный один раз при старте.
+
+    Текст делится на статические сегменты и слоты {{name}}, при рендере
+    сегменты только склеиваются со значениями слотов без повторного разбора.
+    """
+
+    def __init__(self, name: str, source: str):
+        parts = SLOT_PATTERN.split(source)
+
+        self.name = name
+        self.segments: list[str] = parts[0::2]
+        self.slots: list[str] = parts[1::2]
+
+        # Все, что до первого слота, одинаково для всех запросов к этому эксперту
+        self.static_prefix = self.segments[0]
+        self.prefix_hash = hashlib.sha256(self.static_prefix.encode()).hexdigest()[:16]
+
+    def render(self, **values: str) -> str:
+        missing = set(self.slots) - values.keys()
+        if missing:
+            raise KeyError(f"Шаблон {self.name}: не заполнены слоты {sorted(missing)}")
+
+        result = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            result.append(values[slot])
+            result.append(segment)
+        return "".join(result)
@@ -0,0 +1,105 @@
+import os
+import re
+
+from internal import model, common
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+_CHAPTER_PATTERN = re.compile(r"^Глава\s*\d+")
+_BLOCK_FILE_PATTERN = re.compile(r"^block-(\d+)\.md$")
+_TITLE_PREFIX_PATTERN = re.compile(r"^[^\w]+")
+
+INTRO_FILE = "intro.md"
+EDU_PLAN_FILE = "edu-plan.md"
+
+
+def parse_knowledge_base(root: str) -> list[model.TopicSource]:
+    """Разбирает базу знаний: каталог темы с intro.md, edu-plan.md и block-N.md.
+
+    Главы выделяются из блока по заголовкам "Глава N" вне блоков кода,
+    блок без таких заголовков становится одной главой.
+    """
+    topics = []
+    for topic_dir in sorted(os.listdir(root)):
+        topic_root = os.path.join(root, topic_dir)
+        if not os.path.isdir(topic_root):
+            continue
+
+        block_files = sorted(
+            (int(match.group(1)), name)
+            for name in os.listdir(topic_root)
+            if (match := _BLOCK_FILE_PATTERN.match(name))
+        )
+
+        topic = model.TopicSource(
+            path=topic_dir,
+            name=topic_dir,
+            intro=_read_optional(root, topic_dir, INTRO_FILE),
+            edu_plan=_read_optional(root, topic_dir, EDU_PLAN_FILE),
+        )
+        for _, block_file in block_files:
+            topic.blocks.append(_parse_block(root, f"{topic_dir}/{block_file}"))
+
+        topics.append(topic)
+    return topics
+
+
+def _read_optional(root: str, topic_dir: str, file_name: str) -> model.SourceFile | None:
+    path = f"{topic_dir}/{file_name}"
+    if not os.path.isfile(os.path.join(root, path)):
+        return None
+    return _source_file(path, f"{topic_dir} {file_name}", _read(root, path))
+
+
+def _parse_block(root: str, path: str) -> model.BlockSource:
+    content = _read(root, path)
+    lines = content.decode("utf-8", errors="replace").splitlines()
+
+    block_name = None
+    chapter_starts = []
+    in_fence = False
+    for index, line in enumerate(lines):
+        if _FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            continue
+        match = None if in_fence else _HEADING_PATTERN.match(line)
+        if not match:
+            continue
+
+        title = _clean_title(match.group(2))
+        if block_name is None and len(match.group(1)) == 1:
+            block_name = title
+        if _CHAPTER_PATTERN.match(title):
+            chapter_starts.append((index, title))
+
+    block_name = block_name or os.path.splitext(os.path.basename(path))[0]
+    block = model.BlockSource(
+        path=path,
+        name=block_name,
+        content=_source_file(path, block_name, content),
+    )
+
+    if not chapter_starts:
+        if content.strip():
+            block.chapters.append(_source_file(f"{path}#1", block_name, content))
+        return block
+
+    bounds = [start for start, _ in chapter_starts] + [len(lines)]
+    for number, (start, title) in enumerate(chapter_starts, start=1):
+        chapter_content = "\n".join(lines[start:bounds[number]]).encode("utf-8")
+        block.chapters.append(_source_file(f"{path}#{number}", title, chapter_content))
+    return block
+
+
+def _source_file(path: str, name: str, content: bytes) -> model.SourceFile:
+    return model.SourceFile(path=path, name=name, content=content, content_hash=common.content_hash(content))
+
+
+def _read(root: str, path: str) -> bytes:
+    with open(os.path.join(root, path), "rb") as file:
+        return file.read()
+
+
+def _clean_title(title: str) -> str:
+    # Заголовки начинаются с эмодзи, в названия они не попадают
+    return _TITLE_PREFIX_PATTERN.sub("", title).strip()[:255]
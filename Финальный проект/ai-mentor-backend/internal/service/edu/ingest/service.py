@@ -0,0 +1,103 @@
+import asyncio
+import io
+import time
+
+from opentelemetry.trace import StatusCode, SpanKind
+
+from internal import interface, model
+from .parser import parse_knowledge_base
+
+
+class EduContentIngestService(interface.IEduContentIngestService):
+    """Загрузка базы знаний в хранилище и таблицы topics/blocks/chapters.
+
+    Повторный запуск загружает только файлы, хэш которых изменился,
+    строки каталога пишутся одним запросом, то есть в одной транзакции.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            topic_repo: interface.ITopicRepo,
+            upload_concurrency: int,
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.topic_repo = topic_repo
+        self.upload_concurrency = upload_concurrency
+
+    async def ingest(self, root: str) -> model.IngestStats:
+        with self.tracer.start_as_current_span(
+                "EduContentIngestService.ingest",
+                kind=SpanKind.INTERNAL,
+                attributes={"root": root}
+        ) as span:
+            try:
+                start_time = time.perf_counter()
+                stats = model.IngestStats()
+
+                topics = await asyncio.to_thread(parse_knowledge_base, root)
+                files = self._collect_files(topics, stats)
+
+                # Файл с тем же хэшем уже лежит в хранилище, переиспользуем его fid
+                stored = await self.topic_repo.get_content_sources()
+                pending = []
+                for source_file in files:
+                    stored_hash, stored_file_id = stored.get(source_file.path, (None, None))
+                    if stored_file_id and stored_hash == source_file.content_hash:
+                        source_file.file_id = stored_file_id
+                    else:
+                        pending.append(source_file)
+
+                await self._upload_all(pending)
+
+                stats.files = len(files)
+                stats.uploaded_files = len(pending)
+                stats.skipped_files = len(files) - len(pending)
+                stats.uploaded_bytes = sum(len(source_file.content) for source_file in pending)
+                stats.changed_rows = await self.topic_repo.upsert_content_sources(topics)
+                stats.duration = time.perf_counter() - start_time
+
+                span.set_attributes({
+                    "ingest.files": stats.files,
+                    "ingest.uploaded_files": stats.uploaded_files,
+                    "ingest.changed_rows": stats.changed_rows,
+                })
+                span.set_status(StatusCode.OK)
+                return stats
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def _upload_all(self, source_files: list[model.SourceFile]):
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+
+        # Одинаковое содержимое (например, блок из одной главы) загружается один раз
+        by_hash: dict[str, list[model.SourceFile]] = {}
+        for source_file in source_files:
+            by_hash.setdefault(source_file.content_hash, []).append(source_file)
+
+        async def upload(same_content: list[model.SourceFile]):
+            async with semaphore:
+                file_id = await self.topic_repo.upload_file(
+                    io.BytesIO(same_content[0].content),
+                    same_content[0].name + ".md"
+                )
+            for source_file in same_content:
+                source_file.file_id = file_id
+
+        await asyncio.gather(*(upload(same_content) for same_content in by_hash.values()))
+
+    @staticmethod
+    def _collect_files(topics: list[model.TopicSource], stats: model.IngestStats) -> list[model.SourceFile]:
+        files = []
+        for topic in topics:
+            stats.topics += 1
+            files.extend(source_file for source_file in (topic.intro, topic.edu_plan) if source_file is not None)
+            for block in topic.blocks:
+                stats.blocks += 1
+                stats.chapters += len(block.chapters)
+                files.append(block.content)
+                files.extend(block.chapters)
+        return files
@@ -1,7 +1,6 @@
-import io
 from opentelemetry.trace import StatusCode, SpanKind
 
-from internal import interface
+from internal import interface, common
 
 
 class EduTopicService(interface.IEduTopicService):
@@ -14,9 +13,9 @@ class EduTopicService(interface.IEduTopicService):
         self.logger = tel.logger()
         self.topic_repo = topic_repo
 
-    async def download_topic_content(self, edu_content_type: str, topic_id: int) -> tuple[io.BytesIO, str]:
+    async def get_topic_content_file(self, edu_content_type: str, topic_id: int) -> common.ContentFile:
         with self.tracer.start_as_current_span(
-                "EduTopicService.download_topic_content",
+                "EduTopicService.get_topic_content_file",
                 kind=SpanKind.INTERNAL,
                 attributes={"edu_content_type": edu_content_type, "topic_id": topic_id}
         ) as span:
@@ -25,39 +24,57 @@ class EduTopicService(interface.IEduTopicService):
                 topic = (await self.topic_repo.get_topic_by_id(topic_id))[0]
 
                 if edu_content_type == "edu-plan":
-                    file, content_type = await self.topic_repo.download_file(
-                        topic.edu_plan_file_id,
-                        topic.name
-                    )
+                    fid = topic.edu_plan_file_id
                 else:
-                    file, content_type = await self.topic_repo.download_file(
-                        topic.intro_file_id,
-                        topic.name
-                    )
+                    fid = topic.intro_file_id
 
-                return file, content_type
+                span.set_status(StatusCode.OK)
+                return common.ContentFile(fid=fid, name=topic.name, updated_at=topic.updated_at)
 
             except Exception as err:
                 span.record_exception(err)
                 span.set_status(StatusCode.ERROR, str(err))
                 raise err
 
-    async def download_block_content(self, block_id: int) -> tuple[io.BytesIO, str]:
-            with self.tracer.start_as_current_span(
-                    "EduTopicService.download_block_content",
-                    kind=SpanKind.INTERNAL,
-                    attributes={"block_id": block_id}
-            ) as span:
-                try:
-                    block = (await self.topic_repo.get_block_by_id(block_id))[0]
-                    file, content_type = await self.topic_repo.download_file(
-                        block.content_file_id,
-                        block.name
-                    )
-
-                    return file, content_type
-
-                except Exception as err:
-                    span.record_exception(err)
-                    span.set_status(StatusCode.ERROR, str(err))
-                    raise err
+    async def get_block_content_file(self, block_id: int) -> common.ContentFile:
+        with self.tracer.start_as_current_span(
+                "EduTopicService.get_block_content_file",
+                kind=SpanKind.INTERNAL,
+                attributes={"block_id": block_id}
+        ) as span:
+            try:
+                block = (await self.topic_repo.get_block_by_id(block_id))[0]
+
+                span.set_status(StatusCode.OK)
+                return common.ContentFile(fid=block.content_file_id, name=block.name, updated_at=block.updated_at)
+
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
+
+    async def open_content_stream(
+            self,
+            content_file: common.ContentFile,
+            byte_range: str = None
+    ) -> common.FileStream:
+        with self.tracer.start_as_current_span(
+                "EduTopicService.open_content_stream",
+                kind=SpanKind.INTERNAL,
+                attributes={"fid": content_file.fid, "byte_range": byte_range or ""}
+        ) as span:
+            try:
+                file_stream = await self.topic_repo.open_file_stream(
+                    content_file.fid,
+                    content_file.name,
+                    byte_range
+                )
+
+                span.set_attribute("http.status_code", file_stream.status_code)
+                span.set_status(StatusCode.OK)
+                return file_stream
+
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
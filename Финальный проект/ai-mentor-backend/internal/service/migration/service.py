@@ -0,0 +1,53 @@
+import time
+
+from opentelemetry.trace import StatusCode, SpanKind
+
+from internal import interface, model
+
+
+class MigrationService(interface.IMigrationService):
+    """Применяет по порядку версии из migrations (model.build_migrations), которых нет в schema_migrations"""
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            migration_repo: interface.IMigrationRepo,
+            migrations: list[model.Migration],
+    ):
+        self.tracer = tel.tracer()
+        self.logger = tel.logger()
+        self.migration_repo = migration_repo
+        self.migrations = migrations
+
+    async def migrate(self) -> list[model.Migration]:
+        with self.tracer.start_as_current_span(
+                "MigrationService.migrate",
+                kind=SpanKind.INTERNAL,
+        ) as span:
+            try:
+                # Версии читаются под блокировкой: параллельный запуск ждет и видит уже примененные
+                async with self.migration_repo.lock():
+                    applied_versions = await self.migration_repo.get_applied_versions()
+
+                    applied = []
+                    for migration in sorted(self.migrations, key=lambda migration: migration.version):
+                        if migration.version in applied_versions:
+                            continue
+
+                        start_time = time.perf_counter()
+                        await self.migration_repo.apply(migration)
+
+                        applied.append(migration)
+                        self.logger.info("Миграция применена", {
+                            "version": migration.version,
+                            "name": migration.name,
+                            "duration": time.perf_counter() - start_time,
+                        })
+
+                span.set_attribute("migrations.applied", len(applied))
+                span.set_status(StatusCode.OK)
+                return applied
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(StatusCode.ERROR, str(err))
+                raise err
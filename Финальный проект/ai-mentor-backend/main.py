@@ -2,21 +2,36 @@ import uvicorn
 
 # External dependencies
 from infrastructure.pg.pg import PG
+from infrastructure.pg.raw_pg import RawPG
 from infrastructure.weedfs.weedfs import Weed
+from infrastructure.weedfs.disk_cache import DiskCachedStorage
+from infrastructure.redis_client.redis_client import RedisClient
 from pkg.client.external.openai.client import GPTClient
+from pkg.client.external.openai.limiter import AdmissionController
 from infrastructure.telemetry.telemetry import Telemetry, AlertManager
 
 # Repositories
 from internal.repo.account.repo import AccountRepo
 from internal.repo.edu.student.repo import StudentRepo
 from internal.repo.chat.repo import ChatRepo
+from internal.repo.chat.cache import LRUChatHistoryCache, RedisChatHistoryCache
+from internal.repo.chat.cached_repo import CachedChatRepo
 from internal.repo.edu.topic.repo import TopicRepo
+from internal.repo.migration.repo import MigrationRepo
 
 # Services
 from internal.service.edu.student.service import EduStudentService
 from internal.service.edu.topic.service import EduTopicService
 from internal.service.chat.service import ChatService
+from internal.service.edu.ingest.service import EduContentIngestService
+from internal.service.migration.service import MigrationService
 from internal.service.chat.prompt import PromptGenerator
+from internal.service.chat.catalog import EduCatalogCache
+from internal.service.chat.history import ChatHistoryWindow
+from internal.service.chat.command import CommandExecutor
+from internal.service.chat.response_cache import ResponseCache
+from internal.service.chat.content_store import ContentStore
+from internal.service.chat.partition import MessagePartitionMaintainer
 
 # Controllers
 from internal.controller.http.handler.chat.handler import ChatController
@@ -26,9 +41,12 @@ from internal.controller.http.middlerware.middleware import HttpMiddleware
 
 # App
 from internal.app.http.app import NewHTTP
+from internal.app.parse_edu_content.app import RunParseEduContent
+from internal.app.migrate.app import RunMigrate
 
 # Config
 from internal.config.config import Config
+from internal.model.sql_model import build_migrations
 
 # Инициализация конфигурации
 cfg = Config()
@@ -58,52 +76,206 @@ tel = Telemetry(
 )
 
 # Инициализация базы данных
-db = PG(
+if cfg.db_backend == "asyncpg":
+    db = RawPG(
+        tel,
+        cfg.db_user,
+        cfg.db_pass,
+        cfg.db_host,
+        cfg.db_port,
+        cfg.db_name,
+        cfg.db_pool_size,
+        cfg.db_max_overflow,
+        cfg.db_pool_recycle,
+        cfg.db_pool_timeout,
+        cfg.db_statement_timeout,
+        cfg.db_prepared_statement_cache_size,
+        cfg.db_replica_host,
+        cfg.db_replica_port,
+        cfg.db_replica_retry_interval
+    )
+else:
+    db = PG(
+        tel,
+        cfg.db_user,
+        cfg.db_pass,
+        cfg.db_host,
+        cfg.db_port,
+        cfg.db_name,
+        cfg.db_pool_size,
+        cfg.db_max_overflow,
+        cfg.db_pool_recycle,
+        cfg.db_pool_timeout,
+        cfg.db_pool_pre_ping,
+        cfg.db_statement_timeout,
+        cfg.db_prepared_statement_cache_size,
+        cfg.db_replica_host,
+        cfg.db_replica_port,
+        cfg.db_replica_retry_interval
+    )
+
+storage = Weed(
     tel,
-    cfg.db_user,
-    cfg.db_pass,
-    cfg.db_host,
-    cfg.db_port,
-    cfg.db_name
+    cfg.weed_master_host,
+    cfg.weed_master_port,
+    cfg.weed_location_cache_ttl,
+    cfg.weed_max_connections
 )
-
-storage = Weed(cfg.weed_master_host, cfg.weed_master_port)
+if cfg.weed_disk_cache_dir:
+    storage = DiskCachedStorage(
+        tel,
+        storage,
+        cfg.weed_disk_cache_dir,
+        cfg.weed_disk_cache_max_bytes,
+        cfg.weed_disk_cache_max_file_bytes
+    )
 
 # Инициализация LLM клиента
+llm_limiter = AdmissionController(
+    tel,
+    cfg.llm_max_concurrency,
+    cfg.llm_rate_limit_rps,
+    cfg.llm_rate_limit_burst,
+    cfg.llm_queue_timeout
+)
+
 llm_client = GPTClient(
     tel,
-    cfg.openai_api_key
+    cfg.openai_api_key,
+    llm_limiter,
+    cfg.llm_max_connections,
+    cfg.llm_max_keepalive_connections,
+    cfg.llm_keepalive_expiry,
+    cfg.llm_http2,
+    cfg.llm_connect_timeout,
+    cfg.llm_read_timeout,
+    cfg.llm_retry_attempts,
+    cfg.llm_retry_base_delay,
+    cfg.llm_retry_max_delay,
+    cfg.llm_hedging_enabled,
+    cfg.llm_hedge_quantile,
+    cfg.llm_hedge_min_delay
 )
 
 # Инициализация репозиториев
 account_repo = AccountRepo(tel, db)
 student_repo = StudentRepo(tel, db)
-chat_repo = ChatRepo(tel, db)
 edu_topic_repo = TopicRepo(tel, db, storage)
+migration_repo = MigrationRepo(tel, db)
+
+if cfg.chat_history_cache_backend == "redis":
+    chat_history_cache = RedisChatHistoryCache(
+        RedisClient(
+            cfg.chat_history_cache_redis_host,
+            cfg.chat_history_cache_redis_port,
+            cfg.chat_history_cache_redis_db,
+            cfg.chat_history_cache_redis_password
+        ),
+        cfg.chat_history_cache_ttl,
+        cfg.chat_history_cache_max_messages
+    )
+else:
+    chat_history_cache = LRUChatHistoryCache(
+        cfg.chat_history_cache_max_chats,
+        cfg.chat_history_cache_max_messages
+    )
+
+message_repo = ChatRepo(tel, db)
+
+chat_repo = CachedChatRepo(
+    tel,
+    db,
+    message_repo,
+    chat_history_cache,
+    cfg.chat_history_cache_max_messages
+)
 
 # Инициализация сервисов
+edu_catalog = EduCatalogCache(
+    tel,
+    edu_topic_repo,
+    cfg.edu_catalog_check_interval
+)
+
+content_store = ContentStore(
+    tel,
+    edu_topic_repo,
+    cfg.chapter_content_max_documents
+)
+
 prompt_generator = PromptGenerator(
+    tel,
+    edu_topic_repo,
+    edu_catalog,
+    content_store,
+    cfg.prompt_fetch_timeout,
+    cfg.chapter_content_token_budget
+)
+
+history_window = ChatHistoryWindow(
+    tel,
+    llm_client,
+    chat_repo,
+    cfg.chat_history_token_budget,
+    cfg.chat_history_fetch_limit,
+    cfg.chat_summary_refresh_min_messages
+)
+
+command_executor = CommandExecutor(
     tel,
     student_repo,
-    edu_topic_repo
+    account_repo
 )
 
+response_cache = None
+if cfg.chat_response_cache_enabled:
+    response_cache = ResponseCache(
+        tel,
+        cfg.chat_response_cache_ttl,
+        cfg.chat_response_cache_max_entries,
+        cfg.chat_response_cache_similarity,
+        cfg.chat_response_cache_min_terms
+    )
+
 chat_service = ChatService(
     tel,
+    db,
     llm_client,
     prompt_generator,
-    student_repo,
-    edu_topic_repo,
     chat_repo,
-    account_repo
+    history_window,
+    command_executor,
+    response_cache,
+    cfg.chat_history_fetch_limit
 )
 
 edu_topic_service = EduTopicService(tel, edu_topic_repo)
 edu_student_service = EduStudentService(tel, student_repo)
+edu_content_ingest_service = EduContentIngestService(
+    tel,
+    edu_topic_repo,
+    cfg.edu_content_upload_concurrency
+)
+
+migration_service = MigrationService(
+    tel,
+    migration_repo,
+    build_migrations(cfg.messages_partition_size)
+)
+
+message_partition_maintainer = MessagePartitionMaintainer(
+    tel,
+    message_repo,
+    cfg.messages_partition_size,
+    cfg.messages_partitions_ahead,
+    cfg.messages_retention_days,
+    cfg.messages_partition_check_interval
+)
 
 # Инициализация middleware
 http_middleware = HttpMiddleware(
     tel,
+    db,
     cfg.prefix
 )
 
@@ -130,18 +302,24 @@ if __name__ == '__main__':
     parser.add_argument(
         'app',
         type=str,
-        help='Option: "http, parse_edu_content"'
+        help='Option: "http, parse_edu_content, migrate"'
+    )
+    parser.add_argument(
+        '--path',
+        type=str,
+        default=cfg.edu_content_root,
+        help='Каталог базы знаний для parse_edu_content'
     )
     args = parser.parse_args()
 
     if args.app == "http":
         # Создание HTTP приложения
         http_app = NewHTTP(
-            db,
             chat_controller,
             edu_student_controller,
             edu_topic_controller,
             http_middleware,
+            message_partition_maintainer,
             cfg.prefix
         )
 
@@ -153,3 +331,7 @@ if __name__ == '__main__':
             loop='asyncio',
             access_log=False
         )
+    elif args.app == "parse_edu_content":
+        RunParseEduContent(edu_content_ingest_service, args.path)
+    elif args.app == "migrate":
+        RunMigrate(migration_service, message_partition_maintainer)
@@ -1,22 +1,60 @@
+import time
+from typing import AsyncIterator
+
 import httpx
 
 import openai
 from opentelemetry.trace import Status, StatusCode, SpanKind
+from tenacity import AsyncRetrying, stop_after_attempt
 
 from internal import interface
 from internal import model
+from .limiter import AdmissionController
+from .resilience import LatencyTracker, hedged, retry_if_retryable_error, wait_decorrelated_jitter
 
 
 class GPTClient(interface.ILLMClient):
     def __init__(
             self,
             tel: interface.ITelemetry,
-            api_key: str
+            api_key: str,
+            limiter: AdmissionController,
+            max_connections: int = 20,
+            max_keepalive_connections: int = 10,
+            keepalive_expiry: float = 30,
+            http2: bool = False,
+            connect_timeout: float = 5,
+            read_timeout: float = 60,
+            retry_attempts: int = 3,
+            retry_base_delay: float = 0.5,
+            retry_max_delay: float = 8,
+            hedging_enabled: bool = False,
+            hedge_quantile: float = 0.95,
+            hedge_min_delay: float = 1,
     ):
         self.tracer = tel.tracer()
+        self.limiter = limiter
+        self.retry_attempts = retry_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedging_enabled = hedging_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
         self.client = openai.AsyncOpenAI(
             api_key=api_key,
-            http_client=httpx.AsyncClient()
+            http_client=httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            # Повторы делает generate, встроенные повторы SDK отключены
+            max_retries=0,
         )
 
     async def generate(
@@ -25,41 +63,35 @@ class GPTClient(interface.ILLMClient):
             system_prompt: str = "",
             temperature: float = 0.5,
             llm_model: str = "gpt-4o-mini",
-            base64img: str = None
+            base64img: str = None,
+            timeout: float = None,
     ) -> str:
         with self.tracer.start_as_current_span(
                 "GPTClient.generate",
                 kind=SpanKind.CLIENT,
         ) as span:
             try:
-                if system_prompt != "":
-                    system_prompt = [{"role": "system", "content": system_prompt}]
-
-                history = [
-                    *system_prompt,
-                    *[
-                        {"role": message.role, "content": message.text}
-                        for message in history
-                    ]
-                ]
-
-                if base64img is not None:
-                    history[-1]["content"] = [
-                        {
-                            "type": "text",
-                            "text": history[-1]["content"],
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{base64img}"},
-                        },
-                    ]
-
-                response = await self.client.chat.completions.create(
-                    model=llm_model,
-                    messages=history,
-                    temperature=temperature,
+                history = self._build_messages(history, system_prompt, base64img)
+                hedges_count = 0
+                span.set_attribute("llm.hedges", hedges_count)
+
+                async def create():
+                    return await self._create_completion(span, llm_model, history, temperature, timeout)
+
+                retrying = AsyncRetrying(
+                    stop=stop_after_attempt(self.retry_attempts),
+                    wait=wait_decorrelated_jitter(self.retry_base_delay, self.retry_max_delay),
+                    retry=retry_if_retryable_error,
+                    reraise=True,
                 )
+                async for attempt in retrying:
+                    with attempt:
+                        span.set_attribute("llm.retries", attempt.retry_state.attempt_number - 1)
+                        response, hedge_sent = await hedged(create, self._hedge_delay())
+                        if hedge_sent:
+                            hedges_count += 1
+                            span.set_attribute("llm.hedges", hedges_count)
+
                 llm_response = response.choices[0].message.content
 
                 span.set_status(Status(StatusCode.OK))
@@ -69,3 +101,116 @@ class GPTClient(interface.ILLMClient):
                 span.record_exception(err)
                 span.set_status(Status(StatusCode.ERROR, str(err)))
                 raise
+
+    async def _create_completion(
+            self,
+            span,
+            llm_model: str,
+            messages: list[dict],
+            temperature: float,
+            timeout: float | None,
+    ):
+        async with self.limiter.slot() as queue_wait:
+            span.set_attribute("llm.queue_wait_ms", queue_wait * 1000)
+
+            start_time = time.perf_counter()
+            response = await self.client.chat.completions.create(
+                model=llm_model,
+                messages=messages,
+                temperature=temperature,
+                **self._timeout_kwargs(timeout),
+            )
+            self.latency.observe(time.perf_counter() - start_time)
+            return response
+
+    def _hedge_delay(self) -> float | None:
+        """Задержка перед хеджирующим запросом: квантиль длительности недавних запросов"""
+        if not self.hedging_enabled:
+            return None
+
+        latency = self.latency.quantile(self.hedge_quantile)
+        if latency is None:
+            return None
+
+        return max(latency, self.hedge_min_delay)
+
+    async def generate_stream(
+            self,
+            history: list[model.Message],
+            system_prompt: str = "",
+            temperature: float = 0.5,
+            llm_model: str = "gpt-4o-mini",
+            timeout: float = None,
+    ) -> AsyncIterator[str]:
+        with self.tracer.start_as_current_span(
+                "GPTClient.generate_stream",
+                kind=SpanKind.CLIENT,
+        ) as span:
+            try:
+                history = self._build_messages(history, system_prompt)
+
+                # Место в лимитере занято, пока поток не дочитан
+                async with self.limiter.slot() as queue_wait:
+                    span.set_attribute("llm.queue_wait_ms", queue_wait * 1000)
+                    stream = await self.client.chat.completions.create(
+                        model=llm_model,
+                        messages=history,
+                        temperature=temperature,
+                        stream=True,
+                        **self._timeout_kwargs(timeout),
+                    )
+
+                    chunks_count = 0
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            chunks_count += 1
+                            yield delta
+
+                span.set_attribute("llm.stream.chunks", chunks_count)
+                span.set_status(Status(StatusCode.OK))
+
+            except Exception as err:
+                span.record_exception(err)
+                span.set_status(Status(StatusCode.ERROR, str(err)))
+                raise
+
+    @staticmethod
+    def _timeout_kwargs(timeout: float | None) -> dict:
+        # Без явного таймаута действует таймаут http-клиента
+        return {"timeout": timeout} if timeout is not None else {}
+
+    @staticmethod
+    def _build_messages(
+            history: list[model.Message],
+            system_prompt: str = "",
+            base64img: str = None
+    ) -> list[dict]:
+        system_messages = []
+        if system_prompt != "":
+            system_messages = [{"role": "system", "content": system_prompt}]
+
+        messages = [
+            *system_messages,
+            *[
+                {"role": message.role, "content": message.text}
+                for message in history
+            ]
+        ]
+
+        if base64img is not None:
+            messages[-1]["content"] = [
+                {
+                    "type": "text",
+                    "text": messages[-1]["content"],
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {"url": f"data:image/png;base64,{base64img}"},
+                },
+            ]
+
+        return messages
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from internal import interface
+from internal import common
+
+
+class TokenBucket:
+    """Ограничение частоты запросов: rate запросов в секунду с запасом burst"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Ожидающие проходят по очереди через lock, поэтому порядок FIFO
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdmissionController:
+    """Общий на процесс допуск запросов к LLM.
+
+    Не больше max_concurrency запросов одновременно и, если задан rate_per_second,
+    не чаще rate_per_second запусков в секунду. Запрос, который ждал допуска дольше
+    queue_timeout, завершается TimeoutError, а не висит в очереди бесконечно.
+    """
+
+    def __init__(
+            self,
+            tel: interface.ITelemetry,
+            max_concurrency: int,
+            rate_per_second: float,
+            burst: int,
+            queue_timeout: float,
+    ):
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_second, burst) if rate_per_second > 0 else None
+
+        meter = tel.meter()
+        self.in_flight = meter.create_up_down_counter(
+            name=common.LLM_IN_FLIGHT_REQUESTS_METRIC,
+            description="Number of LLM requests in flight",
+            unit="1"
+        )
+        self.queued = meter.create_up_down_counter(
+            name=common.LLM_QUEUED_REQUESTS_METRIC,
+            description="Number of LLM requests waiting for admission",
+            unit="1"
+        )
+        self.queue_wait = meter.create_histogram(
+            name=common.LLM_QUEUE_WAIT_METRIC,
+            description="Time LLM requests spend waiting for admission",
+            unit="s"
+        )
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[float]:
+        """Занимает место для одного запроса, отдает время ожидания в секундах"""
+        start_time = time.perf_counter()
+        self.queued.add(1)
+        try:
+            await asyncio.wait_for(self._admit(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Запрос к LLM ждал в очереди дольше {self.queue_timeout} с")
+        finally:
+            self.queued.add(-1)
+
+        wait_time = time.perf_counter() - start_time
+        self.queue_wait.record(wait_time)
+
+        self.in_flight.add(1)
+        try:
+            yield wait_time
+        finally:
+            self.in_flight.add(-1)
+            self._semaphore.release()
+
+    async def _admit(self):
+        await self._semaphore.acquire()
+        if self._bucket is None:
+            return
+
+        try:
+            await self._bucket.acquire()
+        except BaseException:
+            self._semaphore.release()
+            raise
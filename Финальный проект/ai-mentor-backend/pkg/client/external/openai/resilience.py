@@ -0,0 +1,79 @@
+import asyncio
+import random
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+import openai
+from tenacity import RetryCallState, retry_if_exception_type
+from tenacity.wait import wait_base
+
+T = TypeVar("T")
+
+# Ошибки, после которых повтор запроса имеет смысл
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+retry_if_retryable_error = retry_if_exception_type(RETRYABLE_ERRORS)
+
+
+class wait_decorrelated_jitter(wait_base):
+    """Decorrelated jitter: следующая пауза случайна в [base, 3 * предыдущая пауза], но не больше cap"""
+
+    def __init__(self, base: float, cap: float):
+        self.base = base
+        self.cap = cap
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        # upcoming_sleep до вызова хранит паузу перед предыдущей попыткой
+        previous = max(retry_state.upcoming_sleep, self.base)
+        return min(self.cap, random.uniform(self.base, previous * 3))
+
+
+class LatencyTracker:
+    """Скользящее окно длительностей успешных запросов для расчета задержки хеджирования"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, duration: float):
+        self._samples.append(duration)
+
+    def quantile(self, q: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_delay: float | None) -> tuple[T, bool]:
+    """Запускает call и, если он не завершился за hedge_delay, параллельно второй такой же.
+
+    Возвращает результат первого успешного запроса и признак того, что был отправлен хедж.
+    Оставшийся запрос отменяется. Если упали оба, пробрасывается ошибка последнего.
+    """
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        if hedge_delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                tasks.append(asyncio.ensure_future(call()))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), len(tasks) > 1
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()